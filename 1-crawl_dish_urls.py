@@ -4,15 +4,35 @@ import pandas as pd
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+import argparse
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+from http_cache import add_cache_arguments, cache_from_args
 
 BASE_URL = "https://www.dienmayxanh.com"
 HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
 
-def get_categories():
+# Endpoint AJAX mà nút "Xem thêm" (.seemore-cook) gọi tới. Nếu nút có thuộc tính
+# data-url thì dùng nó, không thì dùng giá trị này (đổi bằng --seemore-endpoint).
+SEEMORE_ENDPOINT = "/vao-bep/aj/Cook/ViewMoreArticle"
+MAX_SEEMORE_PAGES = 1000
+
+# Selenium: thời gian chờ danh sách dài thêm sau mỗi lần click, và tổng thời gian cho 1 category
+CLICK_TIMEOUT = 10
+CATEGORY_TIMEOUT = 600
+
+def get_categories(cache=None):
     """Lấy danh sách categories"""
-    response = requests.get(f"{BASE_URL}/vao-bep/", headers=HEADERS)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    if cache is not None:
+        content = cache.get(f"{BASE_URL}/vao-bep/", headers=HEADERS)
+    else:
+        content = requests.get(f"{BASE_URL}/vao-bep/", headers=HEADERS).content
+    soup = BeautifulSoup(content, 'html.parser')
     
     categories = []
     menu_div = soup.find('div', class_='menu-cooking topmenu')
@@ -31,67 +51,229 @@ def get_categories():
                         })
     return categories
 
-def get_all_articles(category_url):
-    """Lấy tất cả URLs từ 1 category (click nút Xem thêm)"""
-    try:
+def extract_article_urls(soup, fragment=False):
+    """Lấy URLs bài viết trong ul.cate-cook (fragment=True: các li của response AJAX)"""
+    article_list = soup.find('ul', class_='cate-cook')
+    if article_list:
+        items = article_list.find_all('li')
+    elif fragment:
+        items = soup.find_all('li')
+    else:
+        items = []
+    
+    articles = []
+    for li in items:
+        link = li.find('a')
+        if link and link.get('href'):
+            articles.append(BASE_URL + link['href'])
+    return articles
+
+def get_all_articles_http(category_url, endpoint=SEEMORE_ENDPOINT):
+    """Lấy tất cả URLs từ 1 category bằng HTTP, gọi thẳng endpoint của nút Xem thêm"""
+    with requests.Session() as session:
+        session.headers.update(HEADERS)
+        response = session.get(category_url, timeout=10)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.content, 'html.parser')
+        
+        articles = extract_article_urls(soup)
+        btn = soup.find(class_='seemore-cook')
+        if btn is None:
+            # Không có nút "Xem thêm" -> trang đầu đã đủ
+            return articles
+        
+        # Tham số phân trang lấy từ các thuộc tính data-* của nút
+        params = {k[len('data-'):]: v for k, v in btn.attrs.items() if k.startswith('data-')}
+        url = urljoin(BASE_URL, params.pop('url', None) or endpoint)
+        ajax_headers = {'X-Requested-With': 'XMLHttpRequest', 'Referer': category_url}
+        
+        seen = set(articles)
+        for page in range(1, MAX_SEEMORE_PAGES + 1):
+            params['pageIndex'] = page
+            response = session.post(url, data=params, headers=ajax_headers, timeout=10)
+            response.raise_for_status()
+            new_articles = [a for a in extract_article_urls(BeautifulSoup(response.content, 'html.parser'), fragment=True)
+                            if a not in seen]
+            if not new_articles:
+                if page == 1:
+                    # Nút vẫn còn mà endpoint không trả gì -> endpoint không đúng
+                    raise RuntimeError(f"endpoint {url} không trả về bài viết nào")
+                break
+            articles.extend(new_articles)
+            seen.update(new_articles)
+        
+        return articles
+
+class DriverPool:
+    """Pool Chrome headless dùng lại giữa các category, tối đa `size` driver"""
+    def __init__(self, size):
+        self.size = size
+        self.idle = []
+        self.created = 0
+        # Báo cho worker đang chờ khi có driver rảnh hoặc khi có chỗ để tạo driver mới
+        self.changed = threading.Condition()
+    
+    @staticmethod
+    def new_driver():
         chrome_options = Options()
         chrome_options.add_argument('--headless')
         chrome_options.add_argument('--disable-gpu')
         chrome_options.add_argument('--no-sandbox')
-        
-        driver = webdriver.Chrome(options=chrome_options)
+        return webdriver.Chrome(options=chrome_options)
+    
+    def acquire(self):
+        with self.changed:
+            while not self.idle and self.created >= self.size:
+                self.changed.wait()
+            if self.idle:
+                return self.idle.pop()
+            self.created += 1
+        try:
+            return self.new_driver()
+        except Exception:
+            self._give_up_slot()
+            raise
+    
+    def _give_up_slot(self):
+        """Bỏ 1 chỗ chưa có driver: worker đang chờ sẽ tự tạo driver mới"""
+        with self.changed:
+            self.created -= 1
+            self.changed.notify()
+    
+    def release(self, driver, broken=False):
+        """Trả driver về pool; driver bị lỗi thì đóng hẳn và tạo driver khác thay thế"""
+        if broken:
+            try:
+                driver.quit()
+            except Exception as e:
+                # Chrome đã chết / treo: quit lỗi cũng không được làm pool mất 1 chỗ
+                print(f"  Cảnh báo: đóng driver lỗi ({e})")
+            try:
+                driver = self.new_driver()
+            except Exception as e:
+                print(f"  Cảnh báo: không tạo được driver thay thế ({e}), sẽ thử lại khi cần")
+                self._give_up_slot()
+                return
+        with self.changed:
+            self.idle.append(driver)
+            self.changed.notify()
+    
+    def close(self):
+        with self.changed:
+            drivers, self.idle = self.idle, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                # Vẫn đóng các Chrome còn lại
+                print(f"  Cảnh báo: đóng driver lỗi ({e})")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def count_articles(driver):
+    return len(driver.find_elements(By.CSS_SELECTOR, 'ul.cate-cook li'))
+
+def visible_seemore(driver):
+    """Nút "Xem thêm" còn hiển thị thì trả về nút, không thì None"""
+    for btn in driver.find_elements(By.CLASS_NAME, 'seemore-cook'):
+        if btn.is_displayed():
+            return btn
+    return None
+
+def get_all_articles(category_url, pool, timeout=CATEGORY_TIMEOUT):
+    """Lấy tất cả URLs từ 1 category (click nút Xem thêm)"""
+    try:
+        driver = pool.acquire()
+    except Exception as e:
+        print(f"  Lỗi: {e}")
+        return []
+    
+    try:
         driver.get(category_url)
+        deadline = time.monotonic() + timeout
         
-        # Click "Xem thêm" đến hết
+        # Click "Xem thêm" đến hết, mỗi lần chờ tới khi danh sách dài thêm hoặc nút biến mất
         while True:
+            btn = visible_seemore(driver)
+            if btn is None:
+                break
+            if time.monotonic() > deadline:
+                print(f"  Cảnh báo: quá {timeout}s, dừng click ở {count_articles(driver)} bài ({category_url})")
+                break
+            
+            before = count_articles(driver)
+            driver.execute_script("arguments[0].scrollIntoView(); arguments[0].click();", btn)
             try:
-                btn = driver.find_element(By.CLASS_NAME, 'seemore-cook')
-                driver.execute_script("arguments[0].scrollIntoView();", btn)
-                time.sleep(0.5)
-                btn.click()
-                time.sleep(0.5)
-            except:
+                WebDriverWait(driver, CLICK_TIMEOUT).until(
+                    lambda d: count_articles(d) > before or visible_seemore(d) is None
+                )
+            except TimeoutException:
+                print(f"  Cảnh báo: danh sách không dài thêm sau {CLICK_TIMEOUT}s, dừng ở {before} bài ({category_url})")
                 break
         
         # Lấy URLs
         soup = BeautifulSoup(driver.page_source, 'html.parser')
-        driver.quit()
-        
-        articles = []
-        article_list = soup.find('ul', class_='cate-cook')
-        if article_list:
-            for li in article_list.find_all('li'):
-                link = li.find('a')
-                if link and link.get('href'):
-                    articles.append(BASE_URL + link['href'])
+        pool.release(driver)
         
-        return articles
+        return extract_article_urls(soup)
     
     except Exception as e:
         print(f"  Lỗi: {e}")
+        pool.release(driver, broken=True)
         return []
 
+def list_category(category, listing, endpoint, pool):
+    """Lấy URLs của 1 category: HTTP trước, lỗi hoặc không có bài nào thì quay về Selenium"""
+    if listing == 'http':
+        try:
+            articles = get_all_articles_http(category['url'], endpoint)
+            if articles:
+                return articles
+            # Trang đổi layout / endpoint đoán sai: đừng lặng lẽ bỏ cả category
+            print(f"  [{category['name']}] HTTP listing không thấy bài viết nào, chuyển sang Selenium")
+        except Exception as e:
+            print(f"  [{category['name']}] HTTP listing lỗi ({e}), chuyển sang Selenium")
+    return get_all_articles(category['url'], pool)
+
 def main():
+    parser = argparse.ArgumentParser(description="Thu thập URLs các bài viết trên dienmayxanh")
+    parser.add_argument("--listing", choices=["http", "selenium"], default="http",
+                        help="Cách lấy danh sách bài viết: gọi thẳng endpoint 'Xem thêm' hoặc click bằng Selenium (default: http)")
+    parser.add_argument("--seemore-endpoint", default=SEEMORE_ENDPOINT,
+                        help=f"Endpoint AJAX của nút Xem thêm (default: {SEEMORE_ENDPOINT})")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Số category lấy song song, cũng là số Chrome tối đa trong pool (default: 4)")
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+    
     print("Bắt đầu crawl URLs...")
     
     # Lấy categories
-    categories = get_categories()
+    cache = cache_from_args(args)
+    categories = get_categories(cache)
+    if cache is not None:
+        cache.close()
     print(f"Tìm thấy {len(categories)} categories")
     categories = categories[6:]  
-    # Lấy tất cả URLs
+    # Lấy tất cả URLs (song song theo category, ghi CSV theo đúng thứ tự category)
     all_data = []
-    for i, category in enumerate(categories, 1):
-        print(f"[{i}/{len(categories)}] {category['name']}")
-        articles = get_all_articles(category['url'])
-        
-        for url in articles:
-            all_data.append({
-                'category': category['name'],
-                'url': url
-            })
-        
-        print(f"  -> {len(articles)} bài viết")
-        pd.DataFrame(all_data).to_csv('recipe_urls.csv', index=False, encoding='utf-8-sig')
+    with DriverPool(args.workers) as pool, ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = executor.map(lambda c: list_category(c, args.listing, args.seemore_endpoint, pool), categories)
+        for i, (category, articles) in enumerate(zip(categories, results), 1):
+            print(f"[{i}/{len(categories)}] {category['name']}")
+            
+            for url in articles:
+                all_data.append({
+                    'category': category['name'],
+                    'url': url
+                })
+            
+            print(f"  -> {len(articles)} bài viết")
+            pd.DataFrame(all_data).to_csv('recipe_urls.csv', index=False, encoding='utf-8-sig')
 
     
     # Lưu CSV
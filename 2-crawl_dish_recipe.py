@@ -1,131 +1,395 @@
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
+import argparse
+import asyncio
 import json
-import re
+import os
+import random
 import time
+from urllib.parse import urljoin, urlparse, urlunparse
 
+import aiohttp
+
+from http_cache import AsyncHttpCache, add_cache_arguments, cache_from_args
+from recipe_parser import parse_pages, parse_recipe
+
+BASE_URL = "https://www.dienmayxanh.com"
 HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
 
-def parse_dish_name_and_servings(h2_tag):
-    """Lấy dish_name và servings từ h2 tag"""
-    # Lấy text trực tiếp của h2 (không bao gồm children)
-    dish_name = h2_tag.find(text=True, recursive=False)
-    if dish_name:
-        dish_name = dish_name.strip()
-        # Bỏ "Nguyên liệu làm"
-        dish_name = re.sub(r'^Nguyên\s+liệu\s+làm\s+', '', dish_name, flags=re.IGNORECASE).strip()
-    else:
-        dish_name = ""
-    
-    # Lấy servings từ small tag
-    servings = None
-    small = h2_tag.find('small')
-    if small:
-        match = re.search(r'(\d+)', small.text)
-        if match:
-            servings = int(match.group(1))
-    
-    return dish_name, servings
-
-def parse_quantity_unit(amount_text):
-    """Tách quantity và unit từ text"""
-    if not amount_text:
-        return None, None
-    
-    amount_text = amount_text.strip()
-    
-    # "500 gram" -> 500, "gram"
-    match = re.match(r'^(\d+(?:[.,]\d+)?)\s+(.+)$', amount_text)
-    if match:
-        return float(match.group(1).replace(',', '.')), match.group(2).strip()
-    
-    # "1/2 kg" -> 0.5, "kg"
-    match = re.match(r'^(\d+)/(\d+)\s+(.+)$', amount_text)
-    if match:
-        return float(match.group(1)) / float(match.group(2)), match.group(3).strip()
-    
-    # "500" -> 500, None
-    match = re.match(r'^(\d+(?:[.,]\d+)?)$', amount_text)
-    if match:
-        return float(match.group(1).replace(',', '.')), None
-    
-    # "ít" -> None, "ít"
-    return None, amount_text
-
-def crawl_recipe(url):
+# Các status nên thử lại (bị giới hạn tốc độ hoặc lỗi phía server)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def fetch_recipe(url, cache=None):
+    """Tải và parse 1 recipe, để lỗi nổi lên cho người gọi"""
+    if cache is not None:
+        return parse_recipe(cache.get(url, headers=HEADERS, timeout=10), url)
+    response = requests.get(url, headers=HEADERS, timeout=10)
+    response.raise_for_status()
+    return parse_recipe(response.content, url)
+
+def crawl_recipe(url, cache=None):
     """Crawl 1 recipe"""
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        staple_div = soup.find('div', class_='staple')
-        if not staple_div:
-            return None
-        
-        # Parse h2
-        h2 = staple_div.find('h2')
-        dish_name, servings = parse_dish_name_and_servings(h2) if h2 else ("", None)
-        
-        # Parse ingredients
-        ingredients = []
-        for span in staple_div.find_all('span'):
-            # Lấy tên nguyên liệu (text trực tiếp, không bao gồm small và em)
-            ingredient_name_parts = []
-            for text in span.find_all(text=True, recursive=False):
-                ingredient_name_parts.append(text.strip())
-            ingredient_name = ' '.join(ingredient_name_parts).strip()
-            
-            # Lấy quantity từ small
-            small = span.find('small')
-            amount_text = small.text.strip() if small else ""
-            
-            # Parse quantity và unit
-            quantity, unit = parse_quantity_unit(amount_text)
-            
-            if ingredient_name:
-                ingredients.append({
-                    'name': ingredient_name,
-                    'quantity': quantity,
-                    'unit': unit
-                })
-        
-        return {
-            'dish_name': dish_name,
-            'url': url,
-            'servings': servings,
-            'ingredients': ingredients
-        }
+        return fetch_recipe(url, cache)
     
     except Exception as e:
         print(f"  Lỗi: {e}")
         return None
 
-def main():
+# ===== DEDUPE URL =====
+def canonicalize_url(url):
+    """Chuẩn hoá URL bài viết: bỏ query string, fragment và dấu / cuối, host viết thường"""
+    parts = urlparse(urljoin(BASE_URL, url.strip()))
+    path = parts.path.rstrip('/') or '/'
+    return urlunparse((parts.scheme.lower(), parts.netloc.lower(), path, '', '', ''))
+
+def group_rows(rows):
+    """Gộp các dòng (category, url) cùng 1 bài viết: mỗi URL chuẩn hoá 1 dòng, giữ mọi category"""
+    grouped = {}
+    for row in rows:
+        url = canonicalize_url(row['url'])
+        if url not in grouped:
+            grouped[url] = {'url': url, 'category': row['category'], 'categories': []}
+        if row['category'] not in grouped[url]['categories']:
+            grouped[url]['categories'].append(row['category'])
+    return list(grouped.values())
+
+# ===== CRAWL JOURNAL =====
+class CrawlJournal:
+    """Journal JSONL append-only: mỗi URL crawl xong ghi ngay 1 dòng
     
-    # Đọc CSV
-    df = pd.read_csv('recipe_urls.csv')
+    status: 'ok' (có recipe), 'empty' (trang không có div.staple), 'error' (kèm error class)
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = None
     
-    recipes = []
-    for i in range(len(df)):
-        row = df.iloc[i]
+    def load_status(self):
+        """Trạng thái mới nhất của từng URL (đã chuẩn hoá) trong journal: url -> status
+        
+        Journal cũ có thể ghi URL chưa chuẩn hoá: chuẩn hoá lúc đọc để không crawl lại.
+        """
+        status = {}
+        if not os.path.exists(self.path):
+            return status
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dòng cuối bị cắt dở khi crash -> bỏ qua, URL sẽ được crawl lại
+                    continue
+                status[canonicalize_url(record['url'])] = record['status']
+        return status
+    
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Dòng cuối bị cắt dở -> xuống dòng để bản ghi mới không dính vào nó
+        truncated = False
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                truncated = f.read(1) != b'\n'
+        self.file = open(self.path, 'a', encoding='utf-8')
+        if truncated:
+            self.file.write('\n')
+        return self
+    
+    def __exit__(self, *exc):
+        self.file.close()
+        self.file = None
+    
+    def append(self, row, recipe=None, error=None):
+        record = {'url': row['url'], 'category': row['category'], 'categories': row['categories'],
+                  'crawled_at': round(time.time(), 3)}
+        if error is not None:
+            record.update(status='error', error=type(error).__name__, message=str(error))
+        elif recipe is None:
+            record['status'] = 'empty'
+        else:
+            recipe['category'] = row['category']
+            recipe['categories'] = row['categories']
+            record.update(status='ok', recipe=recipe)
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+        return record['status']
+
+def compact_journal(journal_path, output_path):
+    """Gộp journal thành recipes_detail.json (bản ghi mới nhất của mỗi URL thắng)
+    
+    URL được chuẩn hoá (journal cũ có URL chưa chuẩn hoá, chưa có content_hash): mỗi bài
+    chỉ còn 1 bản. Các bài có cùng content_hash của div.staple chỉ giữ bản đầu tiên,
+    categories được gộp lại.
+    Đọc journal 2 lượt để không phải giữ toàn bộ recipes trong RAM.
+    """
+    latest = {}
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            url = canonicalize_url(record['url'])
+            if record['status'] != 'ok':
+                latest[url] = None
+                continue
+            recipe = record['recipe']
+            categories = recipe.get('categories') or [recipe.get('category')]
+            previous = latest.get(url)
+            if previous is not None:
+                # Cùng bài ghi dưới URL khác: giữ category của các bản trước
+                categories = previous[2] + [c for c in categories if c not in previous[2]]
+            latest[url] = (line_no, recipe.get('content_hash'), categories)
+    
+    # line_no -> categories đã gộp của các bản trùng nội dung
+    keep = {}
+    first_by_hash = {}
+    for line_no, content_hash, categories in sorted(v for v in latest.values() if v is not None):
+        if content_hash in first_by_hash:
+            merged = keep[first_by_hash[content_hash]]
+            merged.extend(c for c in categories if c not in merged)
+            continue
+        keep[line_no] = list(categories)
+        if content_hash:
+            first_by_hash[content_hash] = line_no
+    
+    count = 0
+    tmp_path = output_path + '.tmp'
+    with open(journal_path, 'r', encoding='utf-8') as f, open(tmp_path, 'w', encoding='utf-8') as out:
+        out.write('[')
+        for line_no, line in enumerate(f):
+            if line_no not in keep:
+                continue
+            recipe = json.loads(line)['recipe']
+            if recipe.get('url'):
+                recipe['url'] = canonicalize_url(recipe['url'])
+            recipe['categories'] = keep[line_no]
+            out.write(',\n' if count else '\n')
+            out.write(json.dumps(recipe, ensure_ascii=False, indent=2))
+            count += 1
+        out.write('\n]' if count else ']')
+    os.replace(tmp_path, output_path)
+    return count
+
+# ===== ASYNC CRAWL =====
+class TokenBucket:
+    """Token bucket: tối đa `rate` request/giây, cho phép burst `capacity` request"""
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HostRateLimiter:
+    """Mỗi host có 1 token bucket riêng"""
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+    
+    async def acquire(self, url):
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        await self.buckets[host].acquire()
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """Exponential backoff có jitter"""
+    return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+def parse_retry_after(value):
+    """Đọc header Retry-After (chỉ hỗ trợ dạng số giây)"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+async def fetch_html(session, limiter, url, retries, cache=None):
+    """GET 1 URL, thử lại với backoff khi gặp 429/5xx hoặc lỗi mạng (cache: AsyncHttpCache)"""
+    request_headers = {}
+    if cache is not None:
+        body = await cache.cached_body(url)
+        if body is not None:
+            return body
+        request_headers = await cache.conditional_headers(url)
+    
+    attempt = 0
+    while True:
+        await limiter.acquire(url)
+        delay = None
+        try:
+            async with session.get(url, headers=request_headers) as response:
+                if response.status == 304 and cache is not None:
+                    body = await cache.revalidated(url, response.headers)
+                    if body is not None:
+                        return body
+                    # Body trong cache đã bị xoá: tải lại không kèm header điều kiện
+                    request_headers = {}
+                    continue
+                if response.status not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    body = await response.read()
+                    if cache is not None:
+                        await cache.store(url, body, response.headers)
+                    return body
+                delay = parse_retry_after(response.headers.get('Retry-After'))
+                error = aiohttp.ClientResponseError(
+                    response.request_info, response.history,
+                    status=response.status, message=response.reason
+                )
+        except aiohttp.ClientResponseError:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = e
+        
+        if attempt >= retries:
+            raise error
+        await asyncio.sleep(delay if delay is not None else backoff_delay(attempt))
+        attempt += 1
+
+async def crawl_recipe_async(session, limiter, url, retries, cache=None):
+    """Crawl 1 recipe (async), dùng chung parse_recipe với bản sync"""
+    content = await fetch_html(session, limiter, url, retries, cache)
+    return await asyncio.to_thread(parse_recipe, content, url)
+
+async def crawl_all_async(rows, journal, concurrency, rps, retries, timeout, cache=None):
+    """Crawl danh sách (category, url) với session keep-alive dùng chung"""
+    limiter = HostRateLimiter(rps)
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency, ttl_dns_cache=300)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    pending = iter(rows)
+    done = 0
+    async_cache = AsyncHttpCache(cache) if cache is not None else None
+    
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=client_timeout) as session:
+        async def worker():
+            nonlocal done
+            for row in pending:
+                try:
+                    recipe = await crawl_recipe_async(session, limiter, row['url'], retries, async_cache)
+                    status = journal.append(row, recipe)
+                except Exception as e:
+                    status = journal.append(row, error=e)
+                    print(f"  Lỗi [{row['url']}]: {e!r}")
+                done += 1
+                print(f"[{done}/{len(rows)}] {status:5} {row['url'].split('/')[-1][:60]}")
+        
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            if async_cache is not None:
+                async_cache.close()
+
+def crawl_all_sync(rows, journal, cache=None):
+    """Crawl tuần tự bằng requests (cách cũ)"""
+    for i, row in enumerate(rows):
         url = row['url']
         
-        print(f"\n[{i+1}/{len(df)}] {url.split('/')[-1][:60]}")
+        print(f"\n[{i+1}/{len(rows)}] {url.split('/')[-1][:60]}")
         
-        recipe = crawl_recipe(url)
-        if recipe:
-            recipe['category'] = row['category']
-            recipes.append(recipe)
+        fresh_before = cache.stats['fresh'] if cache is not None else 0
+        try:
+            journal.append(row, fetch_recipe(url, cache))
+        except Exception as e:
+            journal.append(row, error=e)
+            print(f"  Lỗi: {e}")
         
-        time.sleep(0.5)
+        # Trang lấy thẳng từ cache (không gửi request) thì không cần chờ
+        if cache is None or cache.stats['fresh'] == fresh_before:
+            time.sleep(0.5)
+
+def reparse_from_cache(rows, journal, cache, workers):
+    """Parse lại HTML đã có trong cache bằng process pool, không truy cập mạng"""
+    cached = [row for row in rows if cache.lookup(row['url'])]
+    if len(cached) < len(rows):
+        print(f"  {len(rows) - len(cached)} URL chưa có trong cache, bỏ qua")
+    
+    pages = ((cache.read(row['url']), row['url']) for row in cached)
+    for i, (row, result) in enumerate(zip(cached, parse_pages(pages, workers)), 1):
+        if isinstance(result, Exception):
+            journal.append(row, error=result)
+        else:
+            journal.append(row, result)
+        if i % 500 == 0:
+            print(f"[{i}/{len(cached)}] đã parse")
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl chi tiết công thức từ recipe_urls.csv")
+    parser.add_argument("--input", default="recipe_urls.csv", help="CSV (category, url) (default: recipe_urls.csv)")
+    parser.add_argument("--output", default="data/recipes_detail.json", help="File JSON kết quả (default: data/recipes_detail.json)")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Crawl song song bằng aiohttp thay vì tuần tự")
+    parser.add_argument("--concurrency", type=int, default=8, help="Số request đồng thời tối đa (default: 8)")
+    parser.add_argument("--rps", type=float, default=2.0, help="Số request/giây tối đa cho mỗi host (default: 2.0)")
+    parser.add_argument("--retries", type=int, default=3, help="Số lần thử lại khi gặp 429/5xx (default: 3)")
+    parser.add_argument("--timeout", type=float, default=10, help="Timeout mỗi request, giây (default: 10)")
+    parser.add_argument("--journal", default="data/recipes_detail.jsonl",
+                        help="Journal JSONL, dùng để resume (default: data/recipes_detail.jsonl)")
+    parser.add_argument("--only-failed", action="store_true", help="Chỉ crawl lại các URL bị lỗi trong journal")
+    parser.add_argument("--compact-only", action="store_true", help="Không crawl, chỉ gộp journal thành --output")
+    parser.add_argument("--no-compact", action="store_true", help="Không gộp journal sau khi crawl")
+    parser.add_argument("--reparse-cache", action="store_true",
+                        help="Không crawl, parse lại HTML trong cache HTTP bằng process pool (cả các URL đã xong trong journal)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Số process cho --reparse-cache (default: số CPU)")
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+    
+    journal = CrawlJournal(args.journal)
+    
+    if not args.compact_only:
+        # Đọc CSV, bỏ các URL đã xong trong journal
+        # (--reparse-cache parse lại mọi bài, bản ghi mới trong journal thắng khi gộp)
+        df = pd.read_csv(args.input)
+        rows = group_rows(df[['category', 'url']].to_dict('records'))
+        print(f"Gộp {len(df)} dòng (category, url) thành {len(rows)} bài viết")
+        status = journal.load_status()
+        if args.only_failed:
+            rows = [row for row in rows if status.get(row['url']) == 'error']
+        elif not args.reparse_cache:
+            rows = [row for row in rows if status.get(row['url']) not in ('ok', 'empty')]
+        print(f"Journal: {len(status)} URL đã có, còn {len(rows)} URL cần {'parse lại' if args.reparse_cache else 'crawl'}")
+        
+        cache = cache_from_args(args)
+        with journal:
+            if args.reparse_cache:
+                if cache is None:
+                    parser.error("--reparse-cache cần cache HTTP (bỏ --no-cache)")
+                reparse_from_cache(rows, journal, cache, args.workers)
+            elif args.use_async:
+                asyncio.run(crawl_all_async(rows, journal, args.concurrency, args.rps, args.retries, args.timeout, cache))
+            else:
+                crawl_all_sync(rows, journal, cache)
+        if cache is not None:
+            print(cache.summary())
+            cache.close()
+    
+    if args.no_compact:
+        return
     
-    # Lưu kết quả test
-    with open('data/recipes_detail.json', 'w', encoding='utf-8') as f:
-        json.dump(recipes, f, ensure_ascii=False, indent=2)
+    # Gộp journal -> recipes_detail.json
+    if not os.path.exists(args.journal):
+        print(f"Chưa có journal {args.journal}, không có gì để gộp")
+        return
+    count = compact_journal(args.journal, args.output)
+    failed = sum(1 for s in journal.load_status().values() if s == 'error')
     
     print("\n" + "=" * 60)
-    print(f"✓ Đã test {len(recipes)} món")
+    print(f"✓ Đã lưu {count} món vào {args.output}")
+    if failed:
+        print(f"✗ {failed} URL lỗi, chạy lại với --only-failed")
     print("=" * 60)
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+"""
+Trích xuất nguyên liệu và món ăn (unique + tần suất) từ recipes trong 1 lượt đọc
+
+Thay cho 3-extract_ingredients.py và 4-extract_dishes.py: đọc recipes từng bản ghi
+một (recipe_stream), RAM chỉ phụ thuộc số tên unique chứ không phụ thuộc số recipe.
+"""
+import argparse
+import json
+from collections import Counter
+
+from recipe_stream import iter_recipes
+
+def extract_names(recipes):
+    """Đếm trong 1 lượt: số recipe dùng mỗi nguyên liệu, số lần lặp của mỗi tên món"""
+    ingredient_counts = Counter()
+    dish_counts = Counter()
+    total = 0
+    
+    for recipe in recipes:
+        total += 1
+        
+        # Mỗi nguyên liệu chỉ tính 1 lần trong 1 recipe
+        names = {ingredient['name'].strip().lower() for ingredient in recipe['ingredients']}
+        names.discard('')
+        ingredient_counts.update(names)
+        
+        dish_name = recipe['dish_name'].strip()
+        if dish_name:
+            dish_counts[dish_name] += 1
+    
+    return total, ingredient_counts, dish_counts
+
+def save_json(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Trích xuất nguyên liệu và món ăn unique từ recipes")
+    parser.add_argument("--input", default="data/recipes_detail.json",
+                        help="recipes_detail.json hoặc file .jsonl (default: data/recipes_detail.json)")
+    parser.add_argument("--output-dir", default="data", help="Thư mục lưu kết quả (default: data)")
+    args = parser.parse_args()
+    
+    total, ingredient_counts, dish_counts = extract_names(iter_recipes(args.input))
+    print(f"Đọc được {total} món ăn")
+    print(f"Tìm thấy {len(ingredient_counts)} nguyên liệu unique")
+    print(f"Tìm thấy {len(dish_counts)} món ăn unique")
+    
+    # Danh sách unique giữ format cũ: nguyên liệu sort theo tên, món ăn theo thứ tự xuất hiện
+    save_json(sorted(ingredient_counts), f"{args.output_dir}/unique_ingredients.json")
+    save_json(list(dish_counts), f"{args.output_dir}/unique_dishes.json")
+    
+    # Tần suất: sort giảm dần theo số lần
+    save_json(dict(ingredient_counts.most_common()), f"{args.output_dir}/ingredient_frequency.json")
+    save_json(dict(dish_counts.most_common()), f"{args.output_dir}/dish_frequency.json")
+    
+    print(f"\nĐã lưu unique_ingredients.json, unique_dishes.json, ingredient_frequency.json, dish_frequency.json vào {args.output_dir}/")
+
+if __name__ == "__main__":
+    main()
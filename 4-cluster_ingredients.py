@@ -0,0 +1,54 @@
+"""
+Gom các tên nguyên liệu chỉ khác nhau về khoảng trắng / Unicode / dấu câu thành cụm
+
+Chạy giữa bước 3 và bước 5, 6: bước 5, 6 đọc data/ingredient_clusters.json và chỉ gọi
+LLM 1 lần cho mỗi cụm (xem ingredient_clusters.py). In ra số lần gọi model tiết kiệm được.
+
+Usage:
+    python 4-cluster_ingredients.py
+    python 4-cluster_ingredients.py --input ingredient_knowledge_base.json --output /tmp/clusters.json
+"""
+import argparse
+import json
+import os
+
+from ingredient_clusters import CLUSTERS_FILE, cluster_names, save_clusters
+
+# Số lần gọi LLM cho mỗi tên: synonyms (bước 5), translate + classify (bước 6)
+LLM_CALLS_PER_NAME = 3
+
+def load_names(path):
+    """Danh sách tên từ unique_ingredients.json (list tên) hoặc KB (list record có name_vi)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return [item['name_vi'] if isinstance(item, dict) else item for item in data]
+
+def main():
+    parser = argparse.ArgumentParser(description="Gom các tên nguyên liệu tương đương thành cụm")
+    parser.add_argument("--input", default="data/unique_ingredients.json",
+                        help="unique_ingredients.json hoặc ingredient KB (default: data/unique_ingredients.json)")
+    parser.add_argument("--frequency", default="data/ingredient_frequency.json",
+                        help="Tần suất nguyên liệu từ bước 3, để chọn tên đại diện (default: data/ingredient_frequency.json)")
+    parser.add_argument("--output", default=CLUSTERS_FILE, help=f"File cụm (default: {CLUSTERS_FILE})")
+    args = parser.parse_args()
+
+    names = load_names(args.input)
+    frequency = {}
+    if os.path.exists(args.frequency):
+        with open(args.frequency, 'r', encoding='utf-8') as f:
+            frequency = json.load(f)
+
+    clusters = cluster_names(names, frequency)
+    save_clusters(clusters, args.output)
+
+    merged = [cluster for cluster in clusters if len(cluster['members']) > 1]
+    saved = len(names) - len(clusters)
+    print(f"{len(names)} tên -> {len(clusters)} cụm ({len(merged)} cụm có từ 2 tên trở lên)")
+    print(f"Tiết kiệm {saved} tên x {LLM_CALLS_PER_NAME} = {saved * LLM_CALLS_PER_NAME} lần gọi model "
+          f"({saved / len(names):.1%})")
+    for cluster in sorted(merged, key=lambda cluster: -len(cluster['members']))[:10]:
+        print(f"  - {cluster['canonical']}: {cluster['members']}")
+    print(f"\nĐã lưu {args.output}")
+
+if __name__ == "__main__":
+    main()
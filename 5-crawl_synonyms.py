@@ -1,24 +1,32 @@
 """
 Generate synonyms cho nguyên liệu sử dụng Qwen model
 """
+import argparse
 import json
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch
+import sys
 from tqdm import tqdm
 
-# ===== LOAD MODEL =====
-print("Loading Qwen model...")
-tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen2.5-3B-Instruct")
-model = AutoModelForCausalLM.from_pretrained(
-    "Qwen/Qwen2.5-3B-Instruct",
-    device_map="auto",
-    torch_dtype=torch.float16
-)
-print("Model loaded.\n")
+from ingredient_clusters import CLUSTERS_FILE, group_by_canonical, load_canonical_map
+from llm_cache import add_llm_cache_arguments, llm_cache_from_args
+from llm_backends import add_backend_arguments, backend_from_args
+from shards import add_shard_arguments, load_shards, merge_in_order, remove_shards, run_workers, select_shard, shard_path
 
-def get_synonyms(ingredient_name):
-    """Generate 3 synonyms using Qwen"""
-    prompt = f"""Cho từ "{ingredient_name}", hãy liệt kê 0-3 từ đồng nghĩa hoặc cách gọi khác trong tiếng Việt.
+# ===== MODEL =====
+MODEL_NAME = "Qwen/Qwen2.5-3B-Instruct"
+# llm_backends: transformers / gguf / stub; model được load ở lần đầu cần generate,
+# chạy lại mà mọi kết quả đã có trong cache thì không load model
+backend = None
+
+SYNONYMS_GEN = {'max_new_tokens': 50, 'temperature': 0.7, 'do_sample': True}
+# Đổi nội dung prompt thì tăng version để cache LLM không trả kết quả cũ
+SYNONYMS_TEMPLATE_VERSION = 2
+
+# Cache kết quả LLM (llm_cache.LLMCache), None = không cache
+llm_cache = None
+
+def synonyms_prompt(ingredient_name):
+    # Từ cần tìm ở dòng cuối để phần trước đó dùng chung KV cache (PromptPrefix)
+    return f"""Hãy liệt kê 0-3 từ đồng nghĩa hoặc cách gọi khác trong tiếng Việt của từ cho ở dòng cuối.
         Lưu ý: chỉ lấy những từ liên quan đến nguyên liệu của món ăn và có độ liên quan cao.
 
         Ví dụ:
@@ -26,21 +34,21 @@ def get_synonyms(ingredient_name):
         - cà chua -> cà, tomato, quả cà chua
         - thịt heo -> thịt lợn, heo, lợn
 
-        Với từ "{ingredient_name}", hãy trả lời theo format: từ1, từ2, từ3"""
+        Hãy trả lời theo format: từ1, từ2, từ3
+        Từ: "{ingredient_name}\""""
 
-    messages = [{"role": "user", "content": prompt}]
-    text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-    inputs = tokenizer([text], return_tensors="pt").to(model.device)
-    
-    with torch.no_grad():
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=50,
-            temperature=0.7,
-            do_sample=True
-        )
-    
-    response = tokenizer.decode(outputs[0][len(inputs.input_ids[0]):], skip_special_tokens=True)
+def generate_synonyms(ingredient_names):
+    """Câu trả lời thô của model cho từng nguyên liệu"""
+    return [backend.generate([synonyms_prompt(name)], template=synonyms_prompt, **SYNONYMS_GEN)[0]
+            for name in ingredient_names]
+
+def get_synonyms(ingredient_name):
+    """Generate 3 synonyms using Qwen"""
+    if llm_cache is None:
+        response = generate_synonyms([ingredient_name])[0]
+    else:
+        response = llm_cache.cached(backend.cache_id, 'synonyms', SYNONYMS_TEMPLATE_VERSION, SYNONYMS_GEN,
+                                    [ingredient_name], generate_synonyms)[0]
     
     # Parse response
     response = response.strip()
@@ -56,40 +64,84 @@ def get_synonyms(ingredient_name):
     
     return synonyms
 
-def main():
-    # Đọc danh sách nguyên liệu
-    with open('data/unique_ingredients.json', 'r', encoding='utf-8') as f:
-        ingredients = json.load(f)
-    
-    # Có thể giới hạn range để test hoặc chia nhỏ
-    ingredients = ingredients[0:10]
-    
-    print(f"Generating synonyms for {len(ingredients)} ingredients...\n")
+def crawl_synonyms(ingredients, output_path, canonical_map=None, shard=None):
+    """Generate synonyms cho list nguyên liệu, ghi ra output_path
+
+    canonical_map (tên -> tên đại diện của cụm, bước 4): chỉ generate 1 lần cho mỗi cụm,
+    kết quả chép cho mọi nguyên liệu trong cụm.
+    shard=(i, N): chỉ làm các cụm của shard i (gom cụm trước rồi mới chia shard).
+    """
+    groups = select_shard(group_by_canonical(ingredients, canonical_map or {}).items(), shard)
+    selected = {ingredient for _, members in groups for ingredient in members}
+    ingredients = [ingredient for ingredient in ingredients if ingredient in selected]
+    print(f"Generating synonyms for {len(ingredients)} ingredients ({len(groups)} clusters)...\n")
     
-    results = []
+    synonyms_of = {}
     
-    for ingredient in tqdm(ingredients, desc="Processing"):
+    for canonical, members in tqdm(groups, desc="Processing"):
         try:
-            synonyms = get_synonyms(ingredient)
-            
-            results.append({
-                'ingredient': ingredient,
-                'synonyms': synonyms
-            })
-            
+            synonyms = get_synonyms(canonical)
         except Exception as e:
-            tqdm.write(f"Error [{ingredient}]: {e}")
-            results.append({
-                'ingredient': ingredient,
-                'synonyms': ["", "", ""]
-            })
+            tqdm.write(f"Error [{canonical}]: {e}")
+            synonyms = ["", "", ""]
+        for ingredient in members:
+            synonyms_of[ingredient] = synonyms
+    
+    # Giữ thứ tự của input
+    results = [{'ingredient': ingredient, 'synonyms': synonyms_of[ingredient]} for ingredient in ingredients]
     
     # Lưu kết quả
-    with open('data/ingredients_synonyms_qwen.json', 'w', encoding='utf-8') as f:
+    with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(results, f, ensure_ascii=False, indent=2)
     
     print(f"\nCompleted: {len(results)} ingredients")
-    print("Saved to: data/ingredients_synonyms_qwen.json")
+    print(f"Saved to: {output_path}")
+    if llm_cache is not None:
+        print(llm_cache.summary())
+
+def merge_synonyms(output_path, count, ingredients):
+    """Gộp output của N shard về đúng thứ tự của input"""
+    results = merge_in_order(load_shards(output_path, count), ingredients, key=lambda item: item['ingredient'])
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    remove_shards(output_path, count)
+    print(f"Merged {count} shards: {len(results)} ingredients -> {output_path}")
+
+def main():
+    global backend, llm_cache
+    parser = argparse.ArgumentParser(description="Generate synonyms cho nguyên liệu")
+    parser.add_argument("--input", default="data/unique_ingredients.json",
+                        help="Danh sách nguyên liệu (default: data/unique_ingredients.json)")
+    parser.add_argument("--output", default="data/ingredients_synonyms_qwen.json",
+                        help="File kết quả (default: data/ingredients_synonyms_qwen.json)")
+    parser.add_argument("--limit", type=int, help="Chỉ lấy N nguyên liệu đầu tiên (để chạy thử)")
+    parser.add_argument("--clusters", default=CLUSTERS_FILE,
+                        help=f"File cụm tên nguyên liệu từ bước 4, bỏ qua nếu chưa có (default: {CLUSTERS_FILE})")
+    parser.add_argument("--no-clusters", action="store_true", help="Không gom cụm, generate cho từng tên")
+    add_backend_arguments(parser, MODEL_NAME)
+    add_llm_cache_arguments(parser)
+    add_shard_arguments(parser)
+    args = parser.parse_args()
+    
+    # Đọc danh sách nguyên liệu
+    with open(args.input, 'r', encoding='utf-8') as f:
+        ingredients = json.load(f)[:args.limit]
+    
+    if args.merge:
+        merge_synonyms(args.output, args.merge, ingredients)
+        return
+    if args.workers > 1:
+        failed = run_workers(__file__, sys.argv[1:], args.workers)
+        if failed:
+            raise SystemExit(f"Shard lỗi: {failed}, chạy lại các shard đó với --shard i/{args.workers} rồi --merge {args.workers}")
+        merge_synonyms(args.output, args.workers, ingredients)
+        return
+    
+    backend = backend_from_args(args)
+    llm_cache = llm_cache_from_args(args)
+    
+    canonical_map = {} if args.no_clusters else load_canonical_map(args.clusters)
+    crawl_synonyms(ingredients, shard_path(args.output, args.shard), canonical_map, args.shard)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,44 +1,75 @@
+import argparse
 import json
-from unidecode import unidecode
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch
+import math
+import os
+import sys
 from tqdm import tqdm
 
-# ===== LOAD MODELS =====
-print("Loading classification model...")
-tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen2.5-7B-Instruct")
-model = AutoModelForCausalLM.from_pretrained(
-    "Qwen/Qwen2.5-7B-Instruct",
-    device_map="auto",
-    torch_dtype=torch.float16
-)
-print("Models loaded.\n")
-
-# ===== CATEGORIES =====
-CATEGORIES = {
-    'rau-thom': 'rau thơm như húng, ngò, rau mùi, thì là, lá',
-    'rau-cu': 'rau củ như cà chua, bí, củ cải, khoai, su hào, đậu, bắp, măng',
-    'trai-cay': 'trái cây như chuối, táo, cam, xoài, dứa, đu đủ, bưởi, nho',
-    'thit-ca': 'thịt và hải sản như thịt gà, heo, bò, cá, tôm, mực, sườn, tép, ghẹ',
-    'gia-vi': 'gia vị như muối, đường, bột, nước mắm, tương, hạt nêm, tiêu, ớt, tỏi, gừng, hành, me, sả',
-    'ngu-coc': 'ngũ cốc như gạo, bột mì, nui, miến, bún, phở, bánh mì, yến mạch',
-    'hat-dau': 'các loại hạt và đậu như đậu phộng, đậu nành, đậu đỏ, đậu xanh, hạt điều, óc chó',
-    'sua-trung': 'sữa, trứng và sản phẩm từ sữa như sữa tươi, sữa đặc, phô mai, bơ, trứng gà, trứng vịt',
-    'do-kho': 'đồ khô như nấm, mộc nhĩ, hải sâm, tôm khô, mực khô, cá khô',
-    'nuoc-cham': 'nước chấm và sốt như nước mắm pha, tương ớt, mayonnaise, sốt cà chua',
-    'dau-mo': 'dầu và mỡ như dầu ăn, dầu olive, mỏ heo, bơ thực vật',
-    'khac': 'các loại khác'
-}
+from ingredient_categories import CATEGORIES, LexicalClassifier, keyword_category
+from ingredient_clusters import CLUSTERS_FILE, group_by_canonical, load_canonical_map
+from llm_cache import add_llm_cache_arguments, llm_cache_from_args
+from llm_backends import add_backend_arguments, make_backend
+from shards import add_shard_arguments, load_shards, remove_shards, run_workers, select_shard, shard_path
+from text_normalize import normalize
 
-# ===== FUNCTIONS =====
-def normalize_text(text):
-    """Bỏ dấu tiếng Việt"""
-    return unidecode(text).lower()
+# ===== MODEL =====
+MODEL_NAME = "Qwen/Qwen2.5-7B-Instruct"
+# llm_backends: transformers / gguf / stub; model chỉ được load ở lần gọi đầu tiên
+backend = None
 
-def translate_vi_to_en(text):
-    """Dịch tiếng Việt sang tiếng Anh bằng Qwen"""
-    try:
-        prompt = f"""Translate the Vietnamese ingredient name to English. Only return the English name, nothing else.
+# Tham số generate dùng chung cho bản từng item và bản batch
+TRANSLATE_GEN = {'max_new_tokens': 30, 'temperature': 0.1}
+CLASSIFY_GEN = {'max_new_tokens': 15, 'temperature': 0.1}
+
+# 'generate': sinh text rồi parse; 'score': chấm log-likelihood của từng category (1 forward, không decode)
+CLASSIFY_MODE = 'generate'
+
+# Version của prompt template, đổi nội dung prompt thì tăng lên để cache LLM không trả kết quả cũ
+TRANSLATE_TEMPLATE_VERSION = 1
+CLASSIFY_TEMPLATE_VERSION = 2
+
+# Cache kết quả LLM (llm_cache.LLMCache), None = không cache
+llm_cache = None
+
+# Tầng 1 của classify (ingredient_categories.LexicalClassifier), None = mọi tên đều hỏi model
+lexical = None
+# Confidence tối thiểu để nhận nhãn của tầng 1, xem benchmarks/eval_lexical_classifier.py
+LEXICAL_THRESHOLD = 0.6
+LEXICON_FILE = "ingredient_knowledge_base.json"
+# Số tên được phân loại bởi tầng 1 / bởi model
+classify_stats = {'lexical': 0, 'llm': 0}
+
+def init_model(model_name=MODEL_NAME, greedy=False, classify_mode='generate', cache=None, prefix_reuse=True,
+               backend_name='transformers', threads=None, lexicon=None, lexical_threshold=LEXICAL_THRESHOLD):
+    """Cấu hình model; greedy=True thì decode tất định (bản batch cho kết quả giống hệt bản từng item)
+
+    Model chỉ được load ở lần đầu cần gọi, chạy lại mà mọi kết quả đã có trong cache
+    thì không load model. prefix_reuse: dùng lại KV cache của phần đầu cố định của prompt.
+    lexicon: KB có sẵn để học bộ phân loại theo từ vựng; tên có confidence >= lexical_threshold
+    không cần gọi model để phân loại (None = tắt).
+    """
+    global backend, CLASSIFY_MODE, llm_cache, lexical, LEXICAL_THRESHOLD
+    backend = make_backend(backend_name, model_name, prefix_reuse, threads)
+    CLASSIFY_MODE = classify_mode
+    llm_cache = cache
+    lexical = LexicalClassifier.from_kb(lexicon) if lexicon else None
+    if lexicon and lexical is None:
+        print(f"Chưa có {lexicon}, không dùng bộ phân loại theo từ vựng (mọi tên đều hỏi model)")
+    LEXICAL_THRESHOLD = lexical_threshold
+    if greedy:
+        for gen in (TRANSLATE_GEN, CLASSIFY_GEN):
+            gen.pop('temperature', None)
+            gen['do_sample'] = False
+
+def cached_llm(template, version, params, inputs, compute):
+    """Gọi compute(list input) qua cache LLM (nếu bật)"""
+    if llm_cache is None:
+        return compute(inputs)
+    return llm_cache.cached(backend.cache_id, template, version, params, inputs, compute)
+
+# ===== FUNCTIONS =====
+def translate_prompt(text):
+    return f"""Translate the Vietnamese ingredient name to English. Only return the English name, nothing else.
 
         Examples:
         - Cà chua -> Tomato
@@ -48,39 +79,34 @@ def translate_vi_to_en(text):
         
         Translate: {text} ->"""
 
-        messages = [{"role": "user", "content": prompt}]
-        text_input = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-        inputs = tokenizer([text_input], return_tensors="pt").to(model.device)
-        
-        with torch.no_grad():
-            outputs = model.generate(
-                **inputs,
-                max_new_tokens=30,
-                temperature=0.1
-            )
-        
-        response = tokenizer.decode(outputs[0][len(inputs.input_ids[0]):], skip_special_tokens=True)
-        return response.strip()
+def translate_batch(texts):
+    """Dịch 1 batch tên nguyên liệu, 1 lần generate (chỉ cho các tên chưa có trong cache)"""
+    def compute(missing):
+        return backend.generate([translate_prompt(t) for t in missing], template=translate_prompt, **TRANSLATE_GEN)
+
+    responses = cached_llm('translate', TRANSLATE_TEMPLATE_VERSION, TRANSLATE_GEN, texts, compute)
+    return [response.strip() for response in responses]
+
+def translate_vi_to_en(text):
+    """Dịch tiếng Việt sang tiếng Anh bằng Qwen"""
+    try:
+        return translate_batch([text])[0]
     
     except Exception as e:
         return ""
 
-def classify_category(ingredient_name):
-    """Phân loại nguyên liệu bằng Qwen model"""
+def classify_prompt(ingredient_name):
+    # Tên nguyên liệu ở dòng cuối để phần trước đó dùng chung KV cache (llm_utils.PromptPrefix)
     categories_text = '\n'.join([f"- {k}: {v}" for k, v in CATEGORIES.items()])
     
-    prompt = f"""Hãy phân loại nguyên liệu "{ingredient_name}" vào MỘT trong các nhóm sau:
+    return f"""Hãy phân loại nguyên liệu vào MỘT trong các nhóm sau:
 {categories_text}
 
-    Trả lời chỉ MỘT từ khóa ví dụ: rau-thom, gia-vi, thit-ca, ..."""
-
-    messages = [{"role": "user", "content": prompt}]
-    text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-    inputs = tokenizer([text], return_tensors="pt").to(model.device)
-
-    outputs = model.generate(**inputs, max_new_tokens=15, temperature=0.1)
-    response = tokenizer.decode(outputs[0][len(inputs.input_ids[0]):], skip_special_tokens=True)
+    Trả lời chỉ MỘT từ khóa ví dụ: rau-thom, gia-vi, thit-ca, ...
+    Nguyên liệu: "{ingredient_name}\""""
 
+def parse_category(response, ingredient_name):
+    """Lấy category từ câu trả lời của model, không được thì đoán theo từ khóa"""
     # Parse response
     response = response.strip().lower()
     for cat in CATEGORIES.keys():
@@ -88,62 +114,250 @@ def classify_category(ingredient_name):
             return cat
     
     # Fallback: keyword matching
-    name_lower = ingredient_name.lower()
-    if any(k in name_lower for k in ['húng', 'ngò', 'rau', 'lá', 'mùi', 'thì']):
-        return 'rau-thom'
-    if any(k in name_lower for k in ['muối', 'đường', 'bột', 'tương', 'ớt', 'tỏi', 'gừng', 'hành']):
-        return 'gia-vi'
-    if any(k in name_lower for k in ['thịt', 'gà', 'heo', 'bò', 'cá', 'tôm', 'mực']):
-        return 'thit-ca'
-    if any(k in name_lower for k in ['cà', 'bí', 'củ', 'khoai', 'cải', 'đậu', 'bắp']):
-        return 'rau-cu'
-    if any(k in name_lower for k in ['gạo', 'bột', 'mì', 'nui', 'miến', 'bún', 'phở']):
-        return 'ngu-coc'
+    return keyword_category(ingredient_name)
+
+def score_category(ingredient_name):
+    """Chọn category có log-likelihood cao nhất sau prompt, kèm độ tin cậy (softmax trên 12 nhãn)"""
+    labels = list(CATEGORIES.keys())
+    scores = backend.score(classify_prompt(ingredient_name), labels, template=classify_prompt)
+    best = max(range(len(labels)), key=lambda i: scores[i])
+    total = sum(math.exp(score - scores[best]) for score in scores)
+    return labels[best], 1.0 / total
+
+def classify_batch(ingredient_names):
+    """Phân loại 1 batch nguyên liệu: tầng 1 theo từ vựng, các tên còn lại 1 lần gọi model"""
+    labels = [None] * len(ingredient_names)
+    if lexical is not None:
+        for i, name in enumerate(ingredient_names):
+            label, confidence = lexical.classify(name)
+            if label is not None and confidence >= LEXICAL_THRESHOLD:
+                labels[i] = label
+    uncertain = [i for i, label in enumerate(labels) if label is None]
+    if uncertain:
+        for i, label in zip(uncertain, llm_classify_batch([ingredient_names[i] for i in uncertain])):
+            labels[i] = label
+    classify_stats['lexical'] += len(labels) - len(uncertain)
+    classify_stats['llm'] += len(uncertain)
+    return labels
+
+def llm_classify_batch(ingredient_names):
+    """Phân loại 1 batch nguyên liệu bằng model, 1 lần generate"""
+    if CLASSIFY_MODE == 'score':
+        # Cache cả [label, confidence]; không phụ thuộc tham số generate
+        scored = cached_llm('classify-score', CLASSIFY_TEMPLATE_VERSION, {}, ingredient_names,
+                            lambda missing: [list(score_category(name)) for name in missing])
+        return [label for label, _ in scored]
+
+    def compute(missing):
+        return backend.generate([classify_prompt(n) for n in missing], template=classify_prompt, **CLASSIFY_GEN)
+
+    responses = cached_llm('classify-generate', CLASSIFY_TEMPLATE_VERSION, CLASSIFY_GEN, ingredient_names, compute)
+    return [parse_category(response, name) for response, name in zip(responses, ingredient_names)]
+
+def classify_category(ingredient_name):
+    """Phân loại nguyên liệu bằng Qwen model"""
+    return classify_batch([ingredient_name])[0]
+
+def make_record(idx, ingredient, name_en, category, synonyms_map):
+    return {
+        "id": f"ingre{idx:05d}",
+        "name_vi": ingredient,
+        "name_normalized": normalize(ingredient),
+        "name_en": name_en,
+        "category": category,
+        "synonyms": synonyms_map.get(ingredient, []),
+        "type": "ingredient"
+    }
+
+def process_batch(batch, synonyms_map):
+    """Tạo record cho 1 batch cụm (tên đại diện, [(idx, ingredient)]); batch lỗi thì làm lại từng cụm
+
+    LLM chỉ chạy cho tên đại diện, kết quả được chép cho mọi nguyên liệu trong cụm.
+    """
+    names = [canonical for canonical, _ in batch]
+    try:
+        results = zip(translate_batch(names), classify_batch(names))
+        return [make_record(idx, ingredient, en, cat, synonyms_map)
+                for (_, members), (en, cat) in zip(batch, results) for idx, ingredient in members]
+    except Exception as e:
+        if len(batch) > 1:
+            tqdm.write(f"ERROR batch [{names[0]} .. {names[-1]}]: {e}, chạy lại từng item")
     
-    return 'gia-vi'  # Default
+    records = []
+    for canonical, members in batch:
+        try:
+            en, cat = translate_vi_to_en(canonical), classify_category(canonical)
+        except Exception as e:
+            tqdm.write(f"ERROR [{canonical}]: {e}")
+            continue
+        records.extend(make_record(idx, ingredient, en, cat, synonyms_map) for idx, ingredient in members)
+    return records
+
+class KBCheckpoint:
+    """Checkpoint JSONL append-only của build_kb: mỗi record xong ghi ngay 1 dòng
+
+    Crash chỉ mất record đang ghi dở; chạy lại thì bỏ qua các id đã có trong checkpoint.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def load(self):
+        """Các record đã xong: id -> record"""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dòng cuối bị cắt dở khi crash -> bỏ qua, nguyên liệu đó được làm lại
+                    continue
+                records[record['id']] = record
+        return records
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Dòng cuối bị cắt dở -> xuống dòng để record mới không dính vào nó
+        truncated = False
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                truncated = f.read(1) != b'\n'
+        self.file = open(self.path, 'a', encoding='utf-8')
+        if truncated:
+            self.file.write('\n')
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+        self.file = None
 
-def build_kb():
-    """Build knowledge base"""
+    def append(self, records):
+        for record in records:
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+def checkpoint_path_for(output_path):
+    return os.path.splitext(output_path)[0] + '.checkpoint.jsonl'
+
+def build_kb(input_path='data/unique_ingredients.json', synonyms_path='data/ingredients_synonyms.json',
+             output_path='data/ingredient_knowledge_base.json', batch_size=1, checkpoint_path=None, restart=False,
+             shard=None, clusters_path=CLUSTERS_FILE):
+    """Build knowledge base
+
+    Record được ghi dần vào checkpoint JSONL (mặc định <output>.checkpoint.jsonl); chạy lại
+    sau khi bị dừng giữa chừng thì tiếp tục từ các id chưa xong, id ingreNNNNN giữ nguyên
+    theo thứ tự trong input. File KB chỉ được ghi 1 lần ở cuối, sau đó checkpoint bị xoá.
+    shard=(i, N): chỉ làm các cụm của shard i (gom cụm trước rồi mới chia, mọi tên của 1 cụm
+    cùng 1 shard), ghi ra file riêng của shard (id vẫn theo cả input).
+    clusters_path: file cụm của bước 4, LLM chỉ chạy 1 lần cho mỗi cụm (None = không gom).
+    """
+    output_path = shard_path(output_path, shard)
     # Load data
-    with open('data/unique_ingredients.json', 'r', encoding='utf-8') as f:
+    with open(input_path, 'r', encoding='utf-8') as f:
         ingredients = json.load(f)
 
-    with open('data/ingredients_synonyms.json', 'r', encoding='utf-8') as f:
+    with open(synonyms_path, 'r', encoding='utf-8') as f:
         synonyms_data = json.load(f)
         synonyms_map = {item['ingredient']: item['synonyms'] for item in synonyms_data}
     
-    print(f"Processing {len(ingredients)} ingredients...\n")
+    checkpoint = KBCheckpoint(shard_path(checkpoint_path, shard) if checkpoint_path else checkpoint_path_for(output_path))
+    if restart and os.path.exists(checkpoint.path):
+        os.remove(checkpoint.path)
+    done = checkpoint.load()
+
+    canonical_map = load_canonical_map(clusters_path)
+    clusters = group_by_canonical(enumerate(ingredients, 1), canonical_map, name=lambda item: item[1])
+    items = sorted(item for _, members in select_shard(clusters.items(), shard) for item in members)
+    ids = [f"ingre{idx:05d}" for idx, _ in items]
+    for key, (_, ingredient) in zip(ids, items):
+        if key in done and done[key]['name_vi'] != ingredient:
+            raise SystemExit(f"Checkpoint {checkpoint.path} không khớp input ({key}: "
+                             f"{done[key]['name_vi']} != {ingredient}), chạy lại với --restart")
+    todo = [item for key, item in zip(ids, items) if key not in done]
+    groups = list(group_by_canonical(todo, canonical_map, name=lambda item: item[1]).items())
+
+    print(f"Processing {len(ingredients)} ingredients...")
+    if len(todo) < len(items):
+        print(f"Resume từ {checkpoint.path}: {len(items) - len(todo)} đã xong, còn {len(todo)}")
+    if len(groups) < len(todo):
+        print(f"Gom cụm: gọi LLM cho {len(groups)} tên đại diện thay vì {len(todo)} nguyên liệu")
+    print()
     
-    kb = []
-    for idx, ingredient in enumerate(tqdm(ingredients, desc="Building KB"), 1):
-        try:
-            # Generate fields
-            record = {
-                "id": f"ingre{idx:05d}",
-                "name_vi": ingredient,
-                "name_normalized": normalize_text(ingredient),
-                "name_en": translate_vi_to_en(ingredient),
-                "category": classify_category(ingredient),
-                "synonyms": synonyms_map.get(ingredient, []),
-                "type": "ingredient"
-            }
-            
-            kb.append(record)
-            
-            # Save every 20 items
-            if idx % 20 == 0:
-                with open('data/ingredient_knowledge_base.json', 'w', encoding='utf-8') as f:
-                    json.dump(kb, f, ensure_ascii=False, indent=2)
-        
-        except Exception as e:
-            tqdm.write(f"ERROR [{ingredient}]: {e}")
-            continue
+    with checkpoint, tqdm(total=len(todo), desc="Building KB") as pbar:
+        for start in range(0, len(groups), batch_size):
+            batch = groups[start:start + batch_size]
+            records = process_batch(batch, synonyms_map)
+            checkpoint.append(records)
+            done.update((record['id'], record) for record in records)
+            pbar.update(sum(len(members) for _, members in batch))
     
-    # Final save
-    with open('data/ingredient_knowledge_base.json', 'w', encoding='utf-8') as f:
+    # Final save: theo thứ tự id, 1 lần
+    kb = [done[key] for key in ids if key in done]
+    with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(kb, f, ensure_ascii=False, indent=2)
+    os.remove(checkpoint.path)
     
     print(f"\nCompleted: {len(kb)} ingredients")
+    if lexical is not None:
+        print(f"Classify: {classify_stats['lexical']} tên theo từ vựng, {classify_stats['llm']} tên hỏi model")
+    if llm_cache is not None:
+        print(llm_cache.summary())
+
+def merge_kb(output_path, count):
+    """Gộp KB của N shard theo thứ tự id"""
+    kb = sorted((record for output in load_shards(output_path, count) for record in output),
+                key=lambda record: record['id'])
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(kb, f, ensure_ascii=False, indent=2)
+    remove_shards(output_path, count)
+    print(f"Merged {count} shards: {len(kb)} ingredients -> {output_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Xây dựng knowledge base nguyên liệu")
+    parser.add_argument("--input", default="data/unique_ingredients.json",
+                        help="Danh sách nguyên liệu (default: data/unique_ingredients.json)")
+    parser.add_argument("--synonyms", default="data/ingredients_synonyms.json",
+                        help="File synonyms từ bước 5 (default: data/ingredients_synonyms.json)")
+    parser.add_argument("--output", default="data/ingredient_knowledge_base.json",
+                        help="File KB kết quả (default: data/ingredient_knowledge_base.json)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Số nguyên liệu mỗi lần generate (default: 1)")
+    parser.add_argument("--greedy", action="store_true",
+                        help="Decode tất định (do_sample=False) thay vì temperature=0.1")
+    parser.add_argument("--classify-mode", choices=["generate", "score"], default=CLASSIFY_MODE,
+                        help="generate: sinh text rồi parse; score: chấm điểm 12 category, lấy argmax (default: generate)")
+    parser.add_argument("--lexicon", default=LEXICON_FILE,
+                        help=f"KB có sẵn để học bộ phân loại theo từ vựng, bỏ qua nếu chưa có (default: {LEXICON_FILE})")
+    parser.add_argument("--lexical-threshold", type=float, default=LEXICAL_THRESHOLD,
+                        help=f"Confidence tối thiểu để không hỏi model khi phân loại (default: {LEXICAL_THRESHOLD})")
+    parser.add_argument("--no-lexical", action="store_true", help="Không dùng bộ phân loại theo từ vựng, hỏi model mọi tên")
+    parser.add_argument("--checkpoint", help="File checkpoint JSONL (default: <output>.checkpoint.jsonl)")
+    parser.add_argument("--restart", action="store_true", help="Bỏ checkpoint cũ, làm lại từ đầu")
+    parser.add_argument("--clusters", default=CLUSTERS_FILE,
+                        help=f"File cụm tên nguyên liệu từ bước 4, bỏ qua nếu chưa có (default: {CLUSTERS_FILE})")
+    parser.add_argument("--no-clusters", action="store_true", help="Không gom cụm, gọi LLM cho từng tên")
+    add_backend_arguments(parser, MODEL_NAME)
+    add_llm_cache_arguments(parser)
+    add_shard_arguments(parser)
+    args = parser.parse_args()
+    
+    if args.merge:
+        merge_kb(args.output, args.merge)
+        return
+    if args.workers > 1:
+        failed = run_workers(__file__, sys.argv[1:], args.workers)
+        if failed:
+            raise SystemExit(f"Shard lỗi: {failed}, chạy lại các shard đó với --shard i/{args.workers} rồi --merge {args.workers}")
+        merge_kb(args.output, args.workers)
+        return
+    
+    init_model(args.model, args.greedy, args.classify_mode, llm_cache_from_args(args), not args.no_prefix_reuse,
+               args.backend, args.threads, None if args.no_lexical else args.lexicon, args.lexical_threshold)
+    build_kb(args.input, args.synonyms, args.output, args.batch_size, args.checkpoint, args.restart, args.shard,
+             None if args.no_clusters else args.clusters)
 
 if __name__ == "__main__":
-    build_kb()
+    main()
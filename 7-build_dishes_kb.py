@@ -1,54 +1,24 @@
+import argparse
 import json
-import re
-
-# Load files
-with open('ingredient_knowledge_base.json', 'r', encoding='utf-8') as f:
-    ingredients = json.load(f)
-
-with open('data/recipes_detail.json', 'r', encoding='utf-8') as f:
-    recipes = json.load(f)
-
-# Tạo mapping dictionary: name_vi -> {id, category, name_en}
-ingredient_map = {}
-for ing in ingredients:
-    name = ing['name_vi'].lower().strip()
-    ingredient_map[name] = {
-        'id': ing['id'],
-        'category': ing.get('category', ''),
-        'name_en': ing.get('name_en', '')
-    }
+import os
+from datetime import datetime, timezone
 
-# Normalize Vietnamese text
-def normalize(text):
-    text = text.lower().strip()
-    replacements = {
-        'à|á|ạ|ả|ã|â|ầ|ấ|ậ|ẩ|ẫ|ă|ằ|ắ|ặ|ẳ|ẵ': 'a',
-        'è|é|ẹ|ẻ|ẽ|ê|ề|ế|ệ|ể|ễ': 'e',
-        'ì|í|ị|ỉ|ĩ': 'i',
-        'ò|ó|ọ|ỏ|õ|ô|ồ|ố|ộ|ổ|ỗ|ơ|ờ|ớ|ợ|ở|ỡ': 'o',
-        'ù|ú|ụ|ủ|ũ|ư|ừ|ứ|ự|ử|ữ': 'u',
-        'ỳ|ý|ỵ|ỷ|ỹ': 'y',
-        'đ': 'd'
-    }
-    for pattern, replacement in replacements.items():
-        text = re.sub(pattern, replacement, text)
-    return text
+from ingredient_clusters import cluster_key
+from ingredient_linker import LINK_THRESHOLD, IngredientLinker
+from kb_parquet import load_records, save_records
+from recipe_stream import iter_recipes
+from text_normalize import normalize, normalize_many
 
-# Process recipes
-dishes = []
-seen_dishes = set()  # Track các món đã thêm
+REGISTRY_FILE = "data/dish_ids.json"
 
-for idx, recipe in enumerate(recipes, start=1):
-    dish_name = recipe['dish_name'].lower().strip()
-    
-    # Skip nếu món này đã có
-    if dish_name in seen_dishes:
-        continue
-    
-    seen_dishes.add(dish_name)
-    
+def dish_key(name):
+    """Key của 1 món: 2 tên cùng key (chỉ khác hoa thường, khoảng trắng, dấu câu) là 1 món"""
+    return cluster_key(name)
+
+def make_dish(recipe, dish_id, linker):
+    """Record của 1 món; nguyên liệu được nối với KB qua linker (ingredient_linker.IngredientLinker)"""
     dish = {
-        "id": f"dish{str(len(dishes) + 1).zfill(4)}",
+        "id": dish_id,
         "name_vi": recipe['dish_name'],
         "name_normalized": normalize(recipe['dish_name']),
         "category": normalize(recipe.get('category', '')),
@@ -56,25 +26,174 @@ for idx, recipe in enumerate(recipes, start=1):
         "type": "dish"
     }
     
-    for ing in recipe['ingredients']:
-        ing_name = ing['name'].lower().strip()
-        ingredient_data = ingredient_map.get(ing_name, None)
+    names_normalized = normalize_many([ing['name'] for ing in recipe['ingredients']])
+    for ing, name_normalized in zip(recipe['ingredients'], names_normalized):
+        ingredient_data, score = linker.link(ing['name'])
         
         dish['ingredients'].append({
             "ingredient_id": ingredient_data['id'] if ingredient_data else "unknown",
             "name_vi": ing['name'],
-            "name_en": ingredient_data['name_en'] if ingredient_data else "",
+            "name_en": ingredient_data.get('name_en', '') if ingredient_data else "",
             "quantity": ing.get('quantity', 0),
             "unit": ing.get('unit', ''),
             "required": True,
-            "category": ingredient_data['category'] if ingredient_data else "",
-            "name_normalized": normalize(ing['name'])
+            "category": ingredient_data.get('category', '') if ingredient_data else "",
+            "name_normalized": name_normalized,
+            "match_score": round(score, 3)
         })
+    return dish
+
+def build_dishes(recipes, linker):
+    """Process recipes, id theo thứ tự xuất hiện"""
+    dishes = []
+    seen_dishes = set()  # Track các món đã thêm
     
-    dishes.append(dish)
+    for recipe in recipes:
+        key = dish_key(recipe['dish_name'])
+        
+        # Skip nếu món này đã có
+        if key in seen_dishes:
+            continue
+        
+        seen_dishes.add(key)
+        dishes.append(make_dish(recipe, f"dish{str(len(dishes) + 1).zfill(4)}", linker))
+    
+    return dishes
+
+def id_number(dish_id):
+    return int(dish_id[len("dish"):])
+
+class DishIdRegistry:
+    """dish_key -> id của món; id đã cấp không bao giờ đổi hay bị dùng lại (kể cả món đã xoá)"""
+    def __init__(self, path, existing=()):
+        self.path = path
+        self.ids = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.ids = json.load(f)
+        else:
+            # Lần đầu: lấy id từ KB đang có
+            for dish in existing:
+                self.ids.setdefault(dish_key(dish['name_vi']), dish['id'])
+        self.next_number = max(map(id_number, self.ids.values()), default=0) + 1
+
+    def id_for(self, key):
+        if key not in self.ids:
+            self.ids[key] = f"dish{str(self.next_number).zfill(4)}"
+            self.next_number += 1
+        return self.ids[key]
+
+    def save(self):
+        # Ghi file tạm rồi rename: bị ngắt giữa chừng thì file id cũ vẫn nguyên vẹn
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.ids, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+def same_dish(old, new):
+    """old và new giống nhau, bỏ qua field mà old chưa có (KB tạo trước khi thêm field, vd. match_score)"""
+    old_ingredients, new_ingredients = old.get('ingredients', []), new.get('ingredients', [])
+    if len(old_ingredients) != len(new_ingredients):
+        return False
+    filled = {**new, **old,
+              'ingredients': [{**n, **o} for o, n in zip(old_ingredients, new_ingredients)]}
+    return filled == new
 
-# Save output
-with open('dish_knowledge_base.json', 'w', encoding='utf-8') as f:
-    json.dump(dishes, f, ensure_ascii=False, indent=2)
+def merge_dishes(existing, recipes, linker, registry, delta=False):
+    """Gộp recipes vào KB đang có, id giữ nguyên: (KB mới theo thứ tự id, changelog)
+
+    Changelog: list {'op': 'add' | 'update' | 'remove', 'id', 'record'} (remove không có record).
+    delta=False: recipes là toàn bộ dữ liệu, món không còn trong recipes bị xoá;
+    delta=True: recipes chỉ gồm món mới / đã sửa (vd. 1 lần crawl thêm), không xoá món nào.
+    """
+    current = {dish['id']: dish for dish in existing}
+    merged = dict(current)
+    changes = []
+    seen_ids = set()
+    
+    for recipe in recipes:
+        dish_id = registry.id_for(dish_key(recipe['dish_name']))
+        if dish_id in seen_ids:
+            continue
+        seen_ids.add(dish_id)
+        
+        dish = make_dish(recipe, dish_id, linker)
+        if dish_id not in current:
+            changes.append({'op': 'add', 'id': dish_id, 'record': dish})
+        elif not same_dish(current[dish_id], dish):
+            changes.append({'op': 'update', 'id': dish_id, 'record': dish})
+        merged[dish_id] = dish
+    
+    if not delta:
+        for dish_id in current:
+            if dish_id not in seen_ids:
+                changes.append({'op': 'remove', 'id': dish_id})
+                del merged[dish_id]
+    
+    return sorted(merged.values(), key=lambda dish: id_number(dish['id'])), changes
+
+def changelog_path_for(output_path):
+    return os.path.splitext(output_path)[0] + '.changelog.jsonl'
+
+def save_changelog(changes, path, run_id):
+    """Ghi thêm vào cuối changelog, mỗi dòng 1 thay đổi (theo thứ tự id) kèm run_id của lần chạy
+
+    Không ghi đè: consumer bỏ lỡ vài lần chạy vẫn đọc được mọi thay đổi sau run_id cuối
+    cùng nó đã xử lý.
+    """
+    with open(path, 'a', encoding='utf-8') as f:
+        for change in sorted(changes, key=lambda change: id_number(change['id'])):
+            f.write(json.dumps({'run': run_id, **change}, ensure_ascii=False) + '\n')
+
+def main():
+    parser = argparse.ArgumentParser(description="Xây dựng knowledge base món ăn")
+    parser.add_argument("--ingredients", default="ingredient_knowledge_base.json",
+                        help="KB nguyên liệu, .json hoặc .parquet (default: ingredient_knowledge_base.json)")
+    parser.add_argument("--recipes", default="data/recipes_detail.json",
+                        help="Recipes từ bước 2, .json/.jsonl/.parquet (default: data/recipes_detail.json)")
+    parser.add_argument("--output", default="dish_knowledge_base.json",
+                        help="File KB kết quả, .json hoặc .parquet (default: dish_knowledge_base.json)")
+    parser.add_argument("--link-threshold", type=float, default=LINK_THRESHOLD,
+                        help=f"Điểm tối thiểu để nối 1 nguyên liệu không khớp chính xác với KB (default: {LINK_THRESHOLD})")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Gộp vào --output đang có, id món giữ nguyên, ghi changelog")
+    parser.add_argument("--delta", action="store_true",
+                        help="Với --incremental: --recipes chỉ gồm món mới / đã sửa, không xoá món nào")
+    parser.add_argument("--registry", default=REGISTRY_FILE,
+                        help=f"Registry tên món -> id cho --incremental (default: {REGISTRY_FILE})")
+    parser.add_argument("--changelog", help="Changelog JSONL của --incremental (default: <output>.changelog.jsonl)")
+    args = parser.parse_args()
+    
+    # Load files (KB nguyên liệu chỉ cần vài cột)
+    ingredients = load_records(args.ingredients,
+                               columns=['id', 'name_vi', 'name_normalized', 'category', 'name_en', 'synonyms'])
+    recipes = iter_recipes(args.recipes)
+    
+    linker = IngredientLinker(ingredients, args.link_threshold)
+    if not args.incremental:
+        dishes = build_dishes(recipes, linker)
+        save_records(dishes, args.output, 'dishes')
+        print(f"✅ Đã tạo {len(dishes)} món ăn trong {args.output}")
+        print(linker.summary())
+        return
+    
+    existing = load_records(args.output) if os.path.exists(args.output) else []
+    registry = DishIdRegistry(args.registry, existing)
+    dishes, changes = merge_dishes(existing, recipes, linker, registry, args.delta)
+    
+    # Registry trước: crash giữa chừng chỉ để lại id chưa dùng, không bao giờ cấp lại id cũ
+    registry.save()
+    save_records(dishes, args.output, 'dishes')
+    changelog = args.changelog or changelog_path_for(args.output)
+    # run_id theo thời gian UTC: tăng dần giữa các lần chạy, so sánh được dạng chuỗi
+    run_id = datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+    save_changelog(changes, changelog, run_id)
+    
+    counts = {op: sum(change['op'] == op for change in changes) for op in ('add', 'update', 'remove')}
+    print(f"✅ {len(dishes)} món ăn trong {args.output}: +{counts['add']} mới, "
+          f"~{counts['update']} sửa, -{counts['remove']} xoá -> {changelog} (run {run_id})")
+    print(linker.summary())
 
-print(f"✅ Đã tạo {len(dishes)} món ăn trong dish_knowledge_base.json")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+So sánh các backend LLM (llm_backends.py) trên translate/classify của 6-build_ingredients_kb.py
+
+Với mỗi backend: thời gian load, số nguyên liệu/giây, tỉ lệ name_en/category giống backend
+đầu tiên (làm mốc) và tỉ lệ category khớp với ingredient_knowledge_base.json có sẵn.
+Chạy greedy để kết quả tất định.
+
+Usage:
+    python benchmarks/bench_backends.py --backends transformers gguf stub \\
+        --transformers-model Qwen/Qwen2.5-0.5B-Instruct \\
+        --gguf-model "Qwen/Qwen2.5-0.5B-Instruct-GGUF:*q4_k_m.gguf" --count 32
+"""
+import argparse
+import json
+import time
+
+from common import ROOT, load_script, sample_ingredient_names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark các backend LLM")
+    parser.add_argument("--backends", nargs='+', default=["transformers", "stub"],
+                        help="Các backend cần đo, backend đầu tiên làm mốc (default: transformers stub)")
+    parser.add_argument("--transformers-model", default="Qwen/Qwen2.5-0.5B-Instruct", help="Model cho backend transformers")
+    parser.add_argument("--gguf-model", default="Qwen/Qwen2.5-0.5B-Instruct-GGUF:*q4_k_m.gguf",
+                        help="File .gguf hoặc repo_id:filename cho backend gguf")
+    parser.add_argument("--count", type=int, default=32, help="Số nguyên liệu (default: 32)")
+    parser.add_argument("--batch-size", type=int, default=1, help="Batch size (default: 1)")
+    parser.add_argument("--classify-mode", choices=["generate", "score"], default="generate",
+                        help="Cách phân loại (default: generate)")
+    args = parser.parse_args()
+
+    models = {'transformers': args.transformers_model, 'gguf': args.gguf_model, 'stub': None}
+    kb = load_script("6-build_ingredients_kb.py")
+    names = sample_ingredient_names(args.count)
+    with open(ROOT / "ingredient_knowledge_base.json", 'r', encoding='utf-8') as f:
+        existing = {item['name_vi']: item['category'] for item in json.load(f)}
+
+    rows = []
+    reference = None
+    for name in args.backends:
+        kb.init_model(models[name], greedy=True, classify_mode=args.classify_mode, backend_name=name)
+        start = time.perf_counter()
+        kb.backend.load()
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = []
+        for i in range(0, len(names), args.batch_size):
+            chunk = names[i:i + args.batch_size]
+            results.extend(zip(kb.translate_batch(chunk), kb.classify_batch(chunk)))
+        elapsed = time.perf_counter() - start
+
+        reference = reference or results
+        rows.append((
+            name, load_time, len(names) / elapsed,
+            sum(a[0] == b[0] for a, b in zip(results, reference)),
+            sum(a[1] == b[1] for a, b in zip(results, reference)),
+            sum(existing.get(n) == category for n, (_, category) in zip(names, results)),
+        ))
+
+    n = len(names)
+    print(f"{'backend':<14}{'load (s)':>10}{'item/s':>10}{'name_en = mốc':>16}{'category = mốc':>16}{'category = KB':>15}")
+    for name, load_time, rate, same_en, same_category, same_kb in rows:
+        print(f"{name:<14}{load_time:>10.2f}{rate:>10.2f}{f'{same_en}/{n}':>16}{f'{same_category}/{n}':>16}{f'{same_kb}/{n}':>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+So sánh bản batch và bản từng item của translate/classify trong 6-build_ingredients_kb.py
+
+Chạy với decode tất định (greedy) để kiểm tra kết quả giống hệt nhau, và đo
+thời gian mỗi nguyên liệu. Dùng model nhỏ để chạy được trên CPU.
+
+Usage:
+    python benchmarks/bench_batched_kb.py --model Qwen/Qwen2.5-0.5B-Instruct --count 32 --batch-size 8
+"""
+import argparse
+import time
+
+from common import load_script, sample_ingredient_names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched vs per-item LLM inference")
+    parser.add_argument("--model", default="Qwen/Qwen2.5-0.5B-Instruct", help="Model nhỏ chạy được trên CPU")
+    parser.add_argument("--count", type=int, default=32, help="Số nguyên liệu (default: 32)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Batch size (default: 8)")
+    args = parser.parse_args()
+
+    kb = load_script("6-build_ingredients_kb.py")
+    kb.init_model(args.model, greedy=True)
+    kb.backend.load()
+    names = sample_ingredient_names(args.count)
+
+    start = time.perf_counter()
+    single = [(kb.translate_vi_to_en(name), kb.classify_category(name)) for name in names]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = []
+    for i in range(0, len(names), args.batch_size):
+        chunk = names[i:i + args.batch_size]
+        batched.extend(zip(kb.translate_batch(chunk), kb.classify_batch(chunk)))
+    batch_time = time.perf_counter() - start
+
+    mismatches = [(name, a, b) for name, a, b in zip(names, single, batched) if a != b]
+    print(f"{'mode':<22}{'giây':>8}{'ms/nguyên liệu':>18}")
+    print(f"{'từng item':<22}{single_time:>8.2f}{single_time / len(names) * 1000:>18.1f}")
+    print(f"{f'batch {args.batch_size}':<22}{batch_time:>8.2f}{batch_time / len(names) * 1000:>18.1f}")
+    print(f"\nTăng tốc: x{single_time / batch_time:.2f}")
+    print(f"Giống nhau: {len(names) - len(mismatches)}/{len(names)}")
+    for name, a, b in mismatches[:10]:
+        print(f"  - {name}: {a} != {b}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+So sánh 2 cách phân loại của 6-build_ingredients_kb.py
+
+- generate: model.generate tối đa 15 token rồi parse text (cách cũ)
+- score: chấm log-likelihood của 12 category sau prompt, lấy argmax
+
+Báo thời gian mỗi nguyên liệu, tỉ lệ 2 cách cho cùng kết quả, và tỉ lệ khớp với
+category trong ingredient_knowledge_base.json có sẵn.
+
+Usage:
+    python benchmarks/bench_classify_scoring.py --model Qwen/Qwen2.5-0.5B-Instruct --count 50
+"""
+import argparse
+import json
+import statistics
+import time
+
+from common import ROOT, load_script, sample_ingredient_names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark classify: generate vs scoring")
+    parser.add_argument("--model", default="Qwen/Qwen2.5-0.5B-Instruct", help="Model dùng để đo")
+    parser.add_argument("--count", type=int, default=50, help="Số nguyên liệu (default: 50)")
+    args = parser.parse_args()
+
+    kb = load_script("6-build_ingredients_kb.py")
+    kb.init_model(args.model, greedy=True)
+    kb.backend.load()
+    names = sample_ingredient_names(args.count)
+    with open(ROOT / "ingredient_knowledge_base.json", 'r', encoding='utf-8') as f:
+        existing = {item['name_vi']: item['category'] for item in json.load(f)}
+
+    start = time.perf_counter()
+    generated = [kb.classify_category(name) for name in names]
+    generate_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scored = [kb.score_category(name) for name in names]
+    score_time = time.perf_counter() - start
+
+    agree = sum(1 for g, (s, _) in zip(generated, scored) if g == s)
+    generate_kb = sum(1 for name, g in zip(names, generated) if existing.get(name) == g)
+    score_kb = sum(1 for name, (s, _) in zip(names, scored) if existing.get(name) == s)
+
+    print(f"{'mode':<12}{'ms/nguyên liệu':>16}{'khớp KB':>10}")
+    print(f"{'generate':<12}{generate_time / len(names) * 1000:>16.1f}{generate_kb / len(names):>10.1%}")
+    print(f"{'score':<12}{score_time / len(names) * 1000:>16.1f}{score_kb / len(names):>10.1%}")
+    print(f"\nTăng tốc: x{generate_time / score_time:.2f}")
+    print(f"2 cách cho cùng category: {agree}/{len(names)} ({agree / len(names):.1%})")
+    print(f"Độ tin cậy (score): median {statistics.median(c for _, c in scored):.2f}, "
+          f"min {min(c for _, c in scored):.2f}")
+
+
+if __name__ == "__main__":
+    main()
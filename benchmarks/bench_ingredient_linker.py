@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Đo ingredient_linker.IngredientLinker trên KB nguyên liệu có sẵn
+
+- Có file recipes (--recipes): nối mọi dòng nguyên liệu, in tỉ lệ nối được theo từng cách
+  khớp và thời gian mỗi dòng (lần đầu gặp tên / cả corpus có nhớ kết quả)
+- Luôn chạy thêm bộ tên biến thể sinh từ KB (biết record đúng): bỏ dấu, viết hoa + thừa
+  khoảng trắng, thêm từ mô tả, thiếu 1 ký tự. In coverage / accuracy theo ngưỡng để chọn
+  --link-threshold, thời gian mỗi tên ở ngưỡng --threshold, và so với quét cả KB (brute
+  force) trên 1 mẫu nhỏ: index phải cho đúng record mà brute force chọn
+
+Usage:
+    python benchmarks/bench_ingredient_linker.py
+    python benchmarks/bench_ingredient_linker.py --recipes data/recipes_detail.json
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from common import ROOT
+from ingredient_clusters import cluster_key
+from ingredient_linker import LINK_THRESHOLD, IngredientLinker, dice, trigrams
+from text_normalize import normalize
+
+DESCRIPTORS = ["tươi", "loại 1", "(cắt nhỏ)", "xay", "nhỏ"]
+
+
+def variants(name, rng):
+    """(loại biến thể, tên biến thể) từ 1 tên trong KB"""
+    yield 'bỏ dấu', normalize(name)
+    yield 'hoa + khoảng trắng', '  ' + name.upper().replace(' ', '  ') + ' '
+    yield 'thêm mô tả', f"{name} {rng.choice(DESCRIPTORS)}"
+    if len(name) > 4:
+        i = rng.randrange(1, len(name) - 1)
+        yield 'thiếu 1 ký tự', name[:i] + name[i + 1:]
+
+
+def key_trigram_sets(linker):
+    """Tập trigram của từng key, dựng lại từ inverted index"""
+    sets = [set() for _ in linker.keys]
+    for gram, candidates in linker.index.items():
+        for candidate in candidates:
+            sets[candidate].add(gram)
+    return sets
+
+
+def brute_force(key_sets, name):
+    """Điểm tốt nhất khi chấm mọi key trong KB"""
+    grams = trigrams(normalize(cluster_key(name)))
+    return max(dice(grams, key_grams) for key_grams in key_sets)
+
+
+def run_recipes(kb, path):
+    from recipe_stream import iter_recipes
+    lines = [ingredient['name'] for recipe in iter_recipes(path) for ingredient in recipe['ingredients']]
+    start = time.perf_counter()
+    linker = IngredientLinker(kb)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for line in lines:
+        linker.link(line)
+    elapsed = time.perf_counter() - start
+    print(f"Recipes {path}: {len(lines)} dòng, {len(linker.cache)} tên khác nhau")
+    print(f"  dựng index {build_time:.2f}s, nối {elapsed:.2f}s ({elapsed / max(1, len(lines)) * 1e6:.1f} µs/dòng)")
+    print(f"  {linker.summary()}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nối nguyên liệu công thức với KB")
+    parser.add_argument("--kb", default=str(ROOT / "ingredient_knowledge_base.json"), help="KB nguyên liệu")
+    parser.add_argument("--recipes", default=str(ROOT / "data/recipes_detail.json"),
+                        help="Recipes từ bước 2, bỏ qua nếu chưa có (default: data/recipes_detail.json)")
+    parser.add_argument("--count", type=int, default=2000, help="Số tên KB dùng để sinh biến thể (default: 2000)")
+    parser.add_argument("--brute-force", type=int, default=200, help="Số tên so với quét cả KB (default: 200)")
+    parser.add_argument("--thresholds", type=float, nargs='+', default=[0.4, 0.5, 0.6, 0.7, 0.8])
+    parser.add_argument("--threshold", type=float, default=LINK_THRESHOLD,
+                        help=f"Ngưỡng dùng để đo thời gian (default: {LINK_THRESHOLD})")
+    args = parser.parse_args()
+
+    with open(args.kb, 'r', encoding='utf-8') as f:
+        kb = json.load(f)
+    if os.path.exists(args.recipes):
+        run_recipes(kb, args.recipes)
+
+    start = time.perf_counter()
+    linker = IngredientLinker(kb, threshold=args.threshold)
+    build_time = time.perf_counter() - start
+    print(f"Index: {len(kb)} record, {len(linker.keys)} key không dấu, {len(linker.index)} trigram, "
+          f"dựng trong {build_time:.2f}s\n")
+    # Ngưỡng 0: điểm tốt nhất của mọi tên, để vẽ bảng theo ngưỡng
+    scorer = IngredientLinker(kb, threshold=0.0)
+
+    rng = random.Random(0)
+    queries = [(kind, query, record) for record in rng.sample(kb, min(args.count, len(kb)))
+               for kind, query in variants(record['name_vi'], rng)]
+
+    start = time.perf_counter()
+    for _, query, _ in queries:
+        linker._link(query)
+    elapsed = time.perf_counter() - start
+    print(f"{len(queries)} tên biến thể, ngưỡng {args.threshold}: {elapsed / len(queries) * 1e6:.1f} µs/tên "
+          f"(không nhớ kết quả)\n")
+
+    results = []
+    for kind, query, record in queries:
+        linked, score, method = scorer._link(query)
+        correct = linked is not None and cluster_key(linked['name_vi']) == cluster_key(record['name_vi'])
+        results.append((kind, score, method, correct))
+
+    print(f"{'biến thể':<22}{'exact':>8}{'không dấu':>11}{'fuzzy':>8}{'đúng':>8}")
+    for kind in dict.fromkeys(kind for kind, *_ in results):
+        rows = [row for row in results if row[0] == kind]
+        n = len(rows)
+        counts = [sum(method == m for _, _, method, _ in rows) / n for m in ('exact', 'khong-dau', 'fuzzy')]
+        correct = sum(row[3] for row in rows) / n
+        print(f"{kind:<22}{counts[0]:>8.1%}{counts[1]:>11.1%}{counts[2]:>8.1%}{correct:>8.1%}")
+
+    print(f"\n{'ngưỡng':<10}{'nối được':>10}{'đúng / nối':>12}")
+    for threshold in args.thresholds:
+        linked = [row for row in results if row[2] != 'fuzzy' or row[1] >= threshold]
+        correct = sum(row[3] for row in linked)
+        print(f"{threshold:<10.2f}{len(linked) / len(results):>10.1%}{correct / max(1, len(linked)):>12.1%}")
+
+    # Chỉ các tên phải tìm bằng trigram; dưới ngưỡng thì cả 2 cách đều không nối
+    sample = [query for (_, query, _), row in zip(queries, results) if row[2] in ('fuzzy', 'unknown')][:args.brute_force]
+    key_sets = key_trigram_sets(linker)
+    start = time.perf_counter()
+    indexed = [linker._link(query)[1] for query in sample]
+    indexed_time = time.perf_counter() - start
+    start = time.perf_counter()
+    brute = [brute_force(key_sets, query) for query in sample]
+    brute_time = time.perf_counter() - start
+    same = sum(abs(a - b) < 1e-9 or max(a, b) < args.threshold for a, b in zip(indexed, brute))
+    print(f"\nBrute force ({len(sample)} tên): {brute_time / len(sample) * 1e3:.2f} ms/tên, "
+          f"index: {indexed_time / len(sample) * 1e3:.3f} ms/tên (x{brute_time / indexed_time:.0f}), "
+          f"cùng kết quả {same}/{len(sample)}")
+
+
+if __name__ == "__main__":
+    main()
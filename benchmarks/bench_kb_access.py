@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+So sánh thời gian khởi động và bộ nhớ của kb_access.KnowledgeBase với json.load
+
+Mỗi cách chạy trong 1 tiến trình Python mới (như 1 worker RAG vừa khởi động), tính từ lúc
+import tới khi trả lời xong 1 truy vấn mỗi loại (id, tên, category, synonym):
+- json.load: đọc cả KB rồi dựng các dict id / name_normalized / category như các script
+  đang làm
+- kb_access (sidecar có sẵn): mmap các index đã dựng
+- kb_access (dựng sidecar): lần chạy đầu tiên, KB chưa có sidecar
+RSS = VmRSS sau - trước (đọc /proc/self/status), không tính phần của trình thông dịch.
+Trang mmap của file chỉ được tính khi đã chạm vào, và được chia sẻ giữa các worker.
+
+Usage:
+    python benchmarks/bench_kb_access.py
+    python benchmarks/bench_kb_access.py --kb dish_knowledge_base.json --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT
+
+PRELUDE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+
+def rss():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+
+path, index_dir, item_id, name, category = {args!r}
+before = rss()
+start = time.perf_counter()
+"""
+
+JSON_LOAD = """
+from text_normalize import normalize
+with open(path, 'r', encoding='utf-8') as f:
+    records = json.load(f)
+by_id = {r['id']: r for r in records}
+by_name, by_category, by_synonym = {}, {}, {}
+for r in records:
+    by_name.setdefault(normalize(r.get('name_normalized') or r['name_vi']), []).append(r)
+    by_category.setdefault(r.get('category'), []).append(r)
+    for synonym in r.get('synonyms') or []:
+        by_synonym.setdefault(normalize(synonym), []).append(r)
+result = (by_id.get(item_id), by_name.get(normalize(name)), len(by_category.get(category, [])),
+          by_synonym.get(normalize(name)))
+"""
+
+KB_ACCESS = """
+from kb_access import KnowledgeBase
+kb = KnowledgeBase(path, index_dir)
+result = (kb.get_by_id(item_id), kb.find_by_name(name), len(kb.by_category(category)), kb.synonyms_of(name))
+"""
+
+REPORT = """
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, rss() - before]))
+"""
+
+
+def run(code, args):
+    script = PRELUDE.format(root=str(ROOT), args=args) + code + REPORT
+    output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark khởi động kb_access vs json.load")
+    parser.add_argument("--kb", default="ingredient_knowledge_base.json", help="File KB (trong thư mục gốc)")
+    parser.add_argument("--runs", type=int, default=3, help="Số lần chạy mỗi cách, lấy trung vị (default: 3)")
+    args = parser.parse_args()
+
+    path = str(ROOT / args.kb)
+    with open(path, 'r', encoding='utf-8') as f:
+        record = json.load(f)[0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index_dir = f"{tmp}/kb.idx"
+        query = (path, index_dir, record['id'], record['name_vi'], record.get('category', ''))
+        cases = [("json.load + dict", JSON_LOAD, None), ("kb_access (sidecar có sẵn)", KB_ACCESS, None),
+                 ("kb_access (dựng sidecar)", KB_ACCESS, f"{tmp}/fresh.idx")]
+        run(KB_ACCESS, query)  # dựng sidecar cho các lần "có sẵn"
+
+        print(f"{args.kb}, trung vị {args.runs} lần\n")
+        print(f"{'cách':<30}{'khởi động (ms)':>16}{'RSS (MB)':>10}")
+        for label, code, fresh_dir in cases:
+            results = []
+            for i in range(args.runs):
+                case_query = (path, f"{fresh_dir}{i}", *query[2:]) if fresh_dir else query
+                results.append(run(code, case_query))
+            elapsed = statistics.median(r[0] for r in results)
+            memory = statistics.median(r[1] for r in results)
+            print(f"{label:<30}{elapsed * 1e3:>16.1f}{memory / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+So sánh 2 cách tách KB của split_data/split_knowledge_base.py
+
+- files: mỗi record 1 file <id>.json (indent=2)
+- bundle: vài shard JSON lines + index id -> (shard, offset, length) (split_data/kb_bundle.py)
+
+Đo thời gian ghi, số file, dung lượng thật trên đĩa (block đã cấp phát) và thời gian đọc
+ngẫu nhiên 1 record theo id (mở reader 1 lần, sau đó mỗi lần đọc chỉ tra index).
+
+Usage:
+    python benchmarks/bench_kb_bundle.py
+    python benchmarks/bench_kb_bundle.py --files ingredient_knowledge_base.json dish_knowledge_base.json --lookups 5000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import ROOT
+
+sys.path.insert(0, str(ROOT / "split_data"))
+
+from kb_bundle import BundleReader, write_bundle
+from split_knowledge_base import split_knowledge_base
+
+
+def disk_usage(directory):
+    """(số file, byte đã cấp phát trên đĩa)"""
+    files = list(Path(directory).iterdir())
+    return len(files), sum(os.stat(path).st_blocks * 512 for path in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark file-per-id vs bundle")
+    parser.add_argument("--files", nargs='+', default=["ingredient_knowledge_base.json", "dish_knowledge_base.json"],
+                        help="Các KB JSON (file không tồn tại thì bỏ qua)")
+    parser.add_argument("--shards", type=int, default=4, help="Số shard của bundle (default: 4)")
+    parser.add_argument("--lookups", type=int, default=2000, help="Số lần đọc ngẫu nhiên (default: 2000)")
+    args = parser.parse_args()
+
+    print(f"{'KB':<34}{'cách':<8}{'ghi (s)':>9}{'file':>8}{'trên đĩa':>12}{'µs/đọc':>10}")
+    for name in args.files:
+        path = ROOT / name
+        if not path.exists():
+            print(f"{name}: không có, bỏ qua")
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            items = json.load(f)
+        ids = random.Random(0).choices([item['id'] for item in items], k=args.lookups)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            files_dir, bundle_dir = Path(tmp) / "files", Path(tmp) / "bundle"
+
+            # split_knowledge_base đọc lại file JSON: tính cả json.load như khi chạy thật
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                split_knowledge_base(path, files_dir, "items")
+            files_write = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with open(path, 'r', encoding='utf-8') as f:
+                write_bundle(json.load(f), bundle_dir, args.shards)
+            bundle_write = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for item_id in ids:
+                with open(files_dir / f"{item_id}.json", 'r', encoding='utf-8') as f:
+                    json.load(f)
+            files_read = (time.perf_counter() - start) / len(ids)
+
+            with BundleReader(bundle_dir) as bundle:
+                start = time.perf_counter()
+                for item_id in ids:
+                    bundle.get(item_id)
+                bundle_read = (time.perf_counter() - start) / len(ids)
+                assert all(bundle.get(item_id) == item for item_id, item in
+                           ((item['id'], item) for item in items[:200]))
+
+            for label, directory, write_time, read_time in (("files", files_dir, files_write, files_read),
+                                                            ("bundle", bundle_dir, bundle_write, bundle_read)):
+                count, size = disk_usage(directory)
+                print(f"{name:<34}{label:<8}{write_time:>9.2f}{count:>8}{size / 2**20:>10.1f}MB{read_time * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
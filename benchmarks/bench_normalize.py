@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+So sánh các cách bỏ dấu tên nguyên liệu / món ăn
+
+- regex cũ của bước 7: 7 lần re.sub mỗi chuỗi
+- unidecode (bước 6 cũ)
+- text_normalize: 1 lần str.translate, không cache / có lru_cache / normalize_many cho cả cột
+
+Dữ liệu: tên trong KB nguyên liệu, mỗi tên lặp --repeat lần theo thứ tự ngẫu nhiên (giống
+các dòng nguyên liệu trong công thức: ít tên khác nhau, lặp lại rất nhiều).
+
+Usage:
+    python benchmarks/bench_normalize.py
+    python benchmarks/bench_normalize.py --repeat 20
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from common import ROOT
+import text_normalize
+
+
+def legacy_normalize(text):
+    """Bản cũ của 7-build_dishes_kb.py"""
+    text = text.lower().strip()
+    replacements = {
+        'à|á|ạ|ả|ã|â|ầ|ấ|ậ|ẩ|ẫ|ă|ằ|ắ|ặ|ẳ|ẵ': 'a',
+        'è|é|ẹ|ẻ|ẽ|ê|ề|ế|ệ|ể|ễ': 'e',
+        'ì|í|ị|ỉ|ĩ': 'i',
+        'ò|ó|ọ|ỏ|õ|ô|ồ|ố|ộ|ổ|ỗ|ơ|ờ|ớ|ợ|ở|ỡ': 'o',
+        'ù|ú|ụ|ủ|ũ|ư|ừ|ứ|ự|ử|ữ': 'u',
+        'ỳ|ý|ỵ|ỷ|ỹ': 'y',
+        'đ': 'd'
+    }
+    for pattern, replacement in replacements.items():
+        text = re.sub(pattern, replacement, text)
+    return text
+
+
+def timed(fn, texts):
+    start = time.perf_counter()
+    result = fn(texts)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bỏ dấu tiếng Việt")
+    parser.add_argument("--repeat", type=int, default=10, help="Số lần lặp mỗi tên (default: 10)")
+    args = parser.parse_args()
+
+    with open(ROOT / "ingredient_knowledge_base.json", 'r', encoding='utf-8') as f:
+        names = [item['name_vi'] for item in json.load(f)]
+    texts = names * args.repeat
+    random.Random(0).shuffle(texts)
+
+    methods = [
+        ("regex cũ (bước 7)", lambda texts: [legacy_normalize(t) for t in texts]),
+        ("translate, không cache", lambda texts: [text_normalize.normalize.__wrapped__(t) for t in texts]),
+        ("normalize (lru_cache)", lambda texts: [text_normalize.normalize(t) for t in texts]),
+        ("normalize_many", text_normalize.normalize_many),
+    ]
+    try:
+        from unidecode import unidecode
+        methods.insert(1, ("unidecode (bước 6)", lambda texts: [unidecode(t).lower() for t in texts]))
+    except ImportError:
+        pass
+
+    reference = [text_normalize.normalize.__wrapped__(t) for t in texts]
+    print(f"{len(texts)} chuỗi, {len(names)} tên khác nhau\n")
+    print(f"{'cách':<26}{'giây':>8}{'µs/chuỗi':>10}{'khác text_normalize':>22}")
+    for label, fn in methods:
+        text_normalize.normalize.cache_clear()
+        result, elapsed = timed(fn, texts)
+        different = sum(a != b for a, b in zip(result, reference))
+        print(f"{label:<26}{elapsed:>8.3f}{elapsed / len(texts) * 1e6:>10.2f}{different:>22}")
+
+
+if __name__ == "__main__":
+    main()
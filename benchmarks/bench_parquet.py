@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+So sánh JSON (indent=2) với Parquet: dung lượng file và thời gian load
+
+Với mỗi file JSON có sẵn: chuyển sang Parquet (file tạm), rồi đo
+- json.load cả file
+- đọc Parquet cả file / chỉ 1 cột / lọc theo category
+
+Usage:
+    python benchmarks/bench_parquet.py
+    python benchmarks/bench_parquet.py --files ingredient_knowledge_base.json dish_knowledge_base.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from kb_parquet import convert, guess_kind, read_table
+
+DEFAULT_FILES = ["ingredient_knowledge_base.json", "dish_knowledge_base.json", "data/recipes_detail.json"]
+
+
+def best_of(fn, repeat):
+    """Thời gian nhỏ nhất / trung vị qua `repeat` lần chạy"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs Parquet")
+    parser.add_argument("--files", nargs='+', default=DEFAULT_FILES, help="Các file JSON cần đo")
+    parser.add_argument("--repeat", type=int, default=5, help="Số lần đo mỗi phép (default: 5)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for path in args.files:
+            if not os.path.exists(path):
+                print(f"Bỏ qua {path} (không tồn tại)\n")
+                continue
+            kind = guess_kind(path)
+            parquet_path = os.path.join(tmp, Path(path).stem + '.parquet')
+            count = convert(path, parquet_path, kind)
+
+            json_size = os.path.getsize(path)
+            parquet_size = os.path.getsize(parquet_path)
+            category = load_json(path)[0].get('category')
+
+            cases = [
+                ("json.load", lambda: load_json(path)),
+                ("parquet: cả file", lambda: read_table(parquet_path).to_pylist()),
+                ("parquet: cột name_vi" if kind != 'recipes' else "parquet: cột dish_name",
+                 lambda: read_table(parquet_path, columns=['name_vi' if kind != 'recipes' else 'dish_name'])),
+                (f"parquet: category == {category!r}",
+                 lambda: read_table(parquet_path, filters=[('category', '=', category)]).to_pylist()),
+            ]
+
+            print(f"== {path} ({count} {kind}) ==")
+            print(f"Dung lượng: JSON {json_size / 1024:.0f} KB, Parquet {parquet_size / 1024:.0f} KB "
+                  f"(x{json_size / parquet_size:.1f} nhỏ hơn)")
+            print(f"{'phép đọc':<40}{'min (ms)':>10}{'median (ms)':>13}")
+            for name, fn in cases:
+                fastest, median = best_of(fn, args.repeat)
+                print(f"{name:<40}{fastest * 1000:>10.1f}{median * 1000:>13.1f}")
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark parser công thức trên các trang HTML đã lưu
+
+So sánh parse_recipe (chỉ parse div.staple) với parse_recipe_reference (parse cả trang):
+- kiểm tra kết quả giống hệt nhau (dish_name, servings, name/quantity/unit của nguyên liệu)
+- báo tốc độ pages/sec của từng cách và của parse_pages (process pool)
+
+Mặc định chạy trên các trang mẫu trong benchmarks/fixtures/recipe_pages (vài trang nhỏ,
+chủ yếu để kiểm tra kết quả); đo tốc độ thật thì trỏ --fixtures vào cache HTTP.
+
+Usage:
+    python benchmarks/bench_parse_recipe.py
+    python benchmarks/bench_parse_recipe.py --fixtures data/http_cache
+    python benchmarks/bench_parse_recipe.py --fixtures saved_pages/ --workers 8
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "recipe_pages"
+
+from recipe_parser import parse_pages, parse_recipe, parse_recipe_reference
+
+
+def load_fixtures(root, limit):
+    """Đọc các file .html / .body (body trong cache HTTP) dưới thư mục root"""
+    pages = []
+    for path in sorted(Path(root).rglob('*')):
+        if path.suffix in ('.html', '.body') and path.is_file():
+            pages.append((path.read_bytes(), path.name))
+            if limit and len(pages) >= limit:
+                break
+    return pages
+
+
+def timed(fn, pages):
+    start = time.perf_counter()
+    results = [fn(content, url) for content, url in pages]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parser công thức trên HTML đã lưu")
+    parser.add_argument("--fixtures", default=str(FIXTURES),
+                        help="Thư mục chứa file .html hoặc cache HTTP (default: benchmarks/fixtures/recipe_pages)")
+    parser.add_argument("--limit", type=int, default=0, help="Số trang tối đa (default: tất cả)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Số process cho parse_pages")
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures, args.limit)
+    if not pages:
+        print(f"Không tìm thấy file .html/.body nào trong {args.fixtures}")
+        return 1
+    print(f"Đọc {len(pages)} trang từ {args.fixtures}\n")
+
+    reference, reference_time = timed(parse_recipe_reference, pages)
+    fast, fast_time = timed(parse_recipe, pages)
+
+    start = time.perf_counter()
+    pooled = list(parse_pages(pages, args.workers))
+    pool_time = time.perf_counter() - start
+
+    mismatches = [url for (_, url), a, b, c in zip(pages, reference, fast, pooled) if not (a == b == c)]
+    parsed = sum(1 for r in reference if r)
+
+    print(f"{'parser':<28}{'giây':>10}{'pages/sec':>12}")
+    for name, elapsed in [("reference (cả trang)", reference_time),
+                          ("parse_recipe (div.staple)", fast_time),
+                          (f"parse_pages ({args.workers} process)", pool_time)]:
+        print(f"{name:<28}{elapsed:>10.2f}{len(pages) / elapsed:>12.1f}")
+
+    print(f"\nTrang có công thức: {parsed}/{len(pages)}")
+    print(f"Tăng tốc 1 process: x{reference_time / fast_time:.1f}, process pool: x{reference_time / pool_time:.1f}")
+    if mismatches:
+        print(f"\n✗ {len(mismatches)} trang cho kết quả khác bản reference:")
+        for url in mismatches[:20]:
+            print(f"  - {url}")
+        return 1
+    print("✓ Kết quả giống hệt bản reference")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+So sánh translate/classify của 6-build_ingredients_kb.py có và không dùng lại KV cache của prefix
+
+Không dùng lại: mỗi nguyên liệu prefill cả prompt (few-shot, danh sách 12 category).
+Dùng lại: prefix được encode 1 lần cho mỗi template, mỗi nguyên liệu chỉ prefill dòng cuối.
+Chạy greedy để kiểm tra 2 cách cho kết quả giống nhau. Dùng model nhỏ để chạy được trên CPU.
+
+Usage:
+    python benchmarks/bench_prefix_cache.py --model Qwen/Qwen2.5-0.5B-Instruct --count 32 --batch-size 1
+"""
+import argparse
+import time
+
+from common import load_script, sample_ingredient_names
+
+
+def run(kb, names, batch_size):
+    """(kết quả, số giây) khi dịch + phân loại `names` theo batch"""
+    start = time.perf_counter()
+    results = []
+    for i in range(0, len(names), batch_size):
+        chunk = names[i:i + batch_size]
+        results.extend(zip(kb.translate_batch(chunk), kb.classify_batch(chunk)))
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dùng lại KV cache của prefix prompt")
+    parser.add_argument("--model", default="Qwen/Qwen2.5-0.5B-Instruct", help="Model nhỏ chạy được trên CPU")
+    parser.add_argument("--count", type=int, default=32, help="Số nguyên liệu (default: 32)")
+    parser.add_argument("--batch-size", type=int, default=1, help="Batch size (default: 1)")
+    parser.add_argument("--classify-mode", choices=["generate", "score"], default="generate",
+                        help="Cách phân loại (default: generate)")
+    args = parser.parse_args()
+
+    kb = load_script("6-build_ingredients_kb.py")
+    kb.init_model(args.model, greedy=True, classify_mode=args.classify_mode, prefix_reuse=False)
+    kb.backend.load()
+    names = sample_ingredient_names(args.count)
+
+    full, full_time = run(kb, names, args.batch_size)
+
+    kb.backend.prefix_reuse = True
+    start = time.perf_counter()
+    prefixes = [kb.backend.prefix(kb.translate_prompt), kb.backend.prefix(kb.classify_prompt)]
+    prefix_time = time.perf_counter() - start
+    reused, reuse_time = run(kb, names, args.batch_size)
+
+    for name, prefix in zip(("translate", "classify"), prefixes):
+        print(f"Prefix {name}: {len(prefix)} token, khớp token hoá: {prefix.exact}")
+    print(f"Encode prefix (1 lần): {prefix_time:.2f}s\n")
+
+    mismatches = [(name, a, b) for name, a, b in zip(names, full, reused) if a != b]
+    print(f"{'mode':<22}{'giây':>8}{'ms/nguyên liệu':>18}")
+    print(f"{'cả prompt':<22}{full_time:>8.2f}{full_time / len(names) * 1000:>18.1f}")
+    print(f"{'dùng lại prefix':<22}{reuse_time:>8.2f}{reuse_time / len(names) * 1000:>18.1f}")
+    print(f"\nTăng tốc: x{full_time / reuse_time:.2f}")
+    print(f"Giống nhau: {len(names) - len(mismatches)}/{len(names)}")
+    for name, a, b in mismatches[:10]:
+        print(f"  - {name}: {a} != {b}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Đo split_knowledge_base() (split_data/split_knowledge_base.py) khi chạy lại sau 1 thay đổi nhỏ của KB
+
+Lần 1 ghi toàn bộ, lần 2 không đổi gì, lần 3 sửa --changed record và xoá --removed record.
+Mỗi lần in thời gian và số file ghi / giữ nguyên / xoá; sau lần 3 kiểm tra thư mục khớp KB.
+
+Usage:
+    python benchmarks/bench_split_incremental.py
+    python benchmarks/bench_split_incremental.py --kb dish_knowledge_base.json --changed 50 --removed 10
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import ROOT
+
+sys.path.insert(0, str(ROOT / "split_data"))
+
+from split_knowledge_base import serialize, split_knowledge_base
+
+
+def run(kb, output_dir, workers):
+    """(số giây, dòng tổng kết) của 1 lần split"""
+    with tempfile.NamedTemporaryFile('w', suffix='.json', encoding='utf-8', delete=False) as f:
+        json.dump(kb, f, ensure_ascii=False)
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        split_knowledge_base(f.name, output_dir, "items", workers)
+    elapsed = time.perf_counter() - start
+    Path(f.name).unlink()
+    summary = next(line for line in log.getvalue().splitlines() if line.startswith("Written"))
+    return elapsed, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark split KB incremental")
+    parser.add_argument("--kb", default=str(ROOT / "ingredient_knowledge_base.json"), help="KB JSON")
+    parser.add_argument("--changed", type=int, default=20, help="Số record bị sửa ở lần 3 (default: 20)")
+    parser.add_argument("--removed", type=int, default=5, help="Số record bị xoá ở lần 3 (default: 5)")
+    parser.add_argument("--workers", type=int, default=None, help="Số thread ghi")
+    args = parser.parse_args()
+
+    with open(args.kb, 'r', encoding='utf-8') as f:
+        kb = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp) / "items"
+        for label, step in (("lần đầu", kb), ("không đổi", kb)):
+            elapsed, summary = run(step, output_dir, args.workers)
+            print(f"{label:<12}{elapsed:>7.2f}s  {summary}")
+
+        updated = [dict(item, name_en=item.get('name_en', '') + " (sửa)") if i < args.changed else item
+                   for i, item in enumerate(kb[args.removed:])]
+        elapsed, summary = run(updated, output_dir, args.workers)
+        print(f"{'sửa + xoá':<12}{elapsed:>7.2f}s  {summary}")
+
+        files = {path.stem: path.read_bytes() for path in output_dir.glob("*.json") if path.stem != ".manifest"}
+        expected = {item['id']: serialize(item) for item in updated}
+        print(f"\nThư mục khớp KB: {files == expected}")
+
+
+if __name__ == "__main__":
+    main()
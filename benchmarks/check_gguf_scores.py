@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Kiểm tra GGUFBackend.score cho cùng điểm với TransformersBackend.score trên cùng 1 model
+
+GGUFBackend.score dùng API C của llama_cpp (context nhiều sequence, llama_batch, llama_memory_*),
+các API này đổi tên giữa các bản llama-cpp-python: chạy script này sau khi nâng bản trong
+requirements-gguf.txt. Cần model HF và bản GGUF convert từ chính model đó, nên dùng --outtype
+f32 / f16 (bản quantize lệch điểm nhiều hơn --tolerance), vd.:
+    python llama.cpp/convert_hf_to_gguf.py Qwen2.5-0.5B-Instruct --outtype f32 --outfile qwen-f32.gguf
+
+Với mỗi tên: chấm 12 category bằng prompt classify của bước 6, so chênh lệch log-prob lớn nhất
+và category được chọn (argmax). Exit code 1 nếu chênh quá --tolerance hoặc khác argmax.
+
+Usage:
+    python benchmarks/check_gguf_scores.py --hf-model Qwen/Qwen2.5-0.5B-Instruct --gguf-model qwen-f32.gguf
+    python benchmarks/check_gguf_scores.py --hf-model ... --gguf-model ... --count 32 --tolerance 0.05
+"""
+import argparse
+
+from common import load_script, sample_ingredient_names
+from llm_backends import GGUFBackend, TransformersBackend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So điểm của backend gguf với transformers")
+    parser.add_argument("--hf-model", required=True, help="Model HF (repo hoặc thư mục local)")
+    parser.add_argument("--gguf-model", required=True, help="File .gguf convert từ --hf-model")
+    parser.add_argument("--count", type=int, default=16, help="Số nguyên liệu (default: 16)")
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="Chênh lệch log-prob tối đa cho phép (default: 0.01)")
+    args = parser.parse_args()
+
+    kb = load_script("6-build_ingredients_kb.py")
+    labels = list(kb.CATEGORIES)
+    names = sample_ingredient_names(args.count)
+    gguf = GGUFBackend(args.gguf_model)
+    transformers = TransformersBackend(args.hf_model)
+
+    failures = 0
+    worst = 0.0
+    for name in names:
+        prompt = kb.classify_prompt(name)
+        expected = transformers.score(prompt, labels, template=kb.classify_prompt)
+        scores = gguf.score(prompt, labels, template=kb.classify_prompt)
+        diff = max(abs(a - b) for a, b in zip(expected, scores))
+        same_label = expected.index(max(expected)) == scores.index(max(scores))
+        worst = max(worst, diff)
+        ok = diff <= args.tolerance and same_label
+        failures += not ok
+        label = labels[scores.index(max(scores))]
+        print(f"{'✓' if ok else '✗'} {name:<30}{diff:>12.2e}  {label}{'' if same_label else ' (khác argmax)'}")
+
+    print(f"\n{len(names) - failures}/{len(names)} tên khớp, chênh lệch lớn nhất {worst:.2e}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Kiểm tra text_normalize.normalize trên mọi tên trong KB có sẵn
+
+- Với mọi record: normalize(name_vi) phải bằng name_normalized đã lưu (KB nguyên liệu được
+  tạo bằng unidecode, KB món ăn bằng bản regex cũ của bước 7)
+- Nếu có unidecode: so thêm với unidecode(name).lower().strip() để thấy các ký tự lạ chưa có
+  trong bảng dịch
+Exit code 1 nếu có tên không khớp name_normalized.
+
+Usage:
+    python benchmarks/check_normalize.py
+    python benchmarks/check_normalize.py --files ingredient_knowledge_base.json dish_knowledge_base.json
+"""
+import argparse
+import json
+import os
+
+from common import ROOT
+from text_normalize import normalize
+
+try:
+    from unidecode import unidecode
+except ImportError:
+    unidecode = None
+
+
+def kb_names(path):
+    """(name_vi, name_normalized) của mọi record, kể cả nguyên liệu trong món ăn"""
+    with open(path, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    for record in records:
+        yield record['name_vi'], record['name_normalized']
+        for ingredient in record.get('ingredients', []):
+            yield ingredient['name_vi'], ingredient['name_normalized']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So normalize() với name_normalized trong KB")
+    parser.add_argument("--files", nargs='+',
+                        default=[str(ROOT / "ingredient_knowledge_base.json"), str(ROOT / "dish_knowledge_base.json")],
+                        help="Các KB JSON cần kiểm tra (file không tồn tại thì bỏ qua)")
+    args = parser.parse_args()
+
+    failed = 0
+    for path in args.files:
+        if not os.path.exists(path):
+            print(f"{path}: không có, bỏ qua")
+            continue
+        names = list(kb_names(path))
+        mismatches = [(name, stored) for name, stored in names if normalize(name) != stored]
+        print(f"{path}: {len(names) - len(mismatches)}/{len(names)} khớp name_normalized")
+        for name, stored in mismatches[:10]:
+            print(f"  - {name!r}: {normalize(name)!r} != {stored!r}")
+        failed += len(mismatches)
+
+        if unidecode is not None:
+            different = [name for name, _ in names if normalize(name) != unidecode(name).lower().strip()]
+            print(f"  khác unidecode: {len(different)}")
+            for name in different[:10]:
+                print(f"  - {name!r}: {normalize(name)!r} != {unidecode(name).lower().strip()!r}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Kiểm tra parse_recipe cho kết quả giống hệt parse_recipe_reference trên các trang đã lưu
+
+Các trang mẫu trong benchmarks/fixtures/recipe_pages gồm các trường hợp dễ cắt sai:
+"</div>" trong <script> / <style> / comment, div.staple giả trong comment, trang
+windows-1252, utf-8 có BOM không có <meta charset>, trang không có công thức.
+Với mỗi trang: so cả recipe (kể cả content_hash) và báo trang nào đi đường cắt bytes
+(extract_staple_html), trang nào phải quay về SoupStrainer.
+Exit code 1 nếu có trang khác bản reference.
+
+Usage:
+    python benchmarks/check_parse_recipe.py
+    python benchmarks/check_parse_recipe.py --fixtures data/http_cache
+"""
+import argparse
+
+from common import ROOT
+from recipe_parser import extract_staple_html, page_encoding, parse_recipe, parse_recipe_reference
+
+FIXTURES = ROOT / "benchmarks" / "fixtures" / "recipe_pages"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So parse_recipe với parse_recipe_reference")
+    parser.add_argument("--fixtures", default=str(FIXTURES),
+                        help="Thư mục chứa file .html / .body (default: benchmarks/fixtures/recipe_pages)")
+    args = parser.parse_args()
+
+    paths = sorted(path for path in ROOT.joinpath(args.fixtures).rglob('*')
+                   if path.suffix in ('.html', '.body') and path.is_file())
+    if not paths:
+        print(f"Không tìm thấy file .html/.body nào trong {args.fixtures}")
+        return 1
+
+    mismatches = 0
+    for path in paths:
+        content = path.read_bytes()
+        reference = parse_recipe_reference(content, path.name)
+        fast = parse_recipe(content, path.name)
+        encoding = page_encoding(content)
+        route = "cắt bytes" if encoding and extract_staple_html(content) is not None else "strainer"
+        if fast == reference:
+            status = "✓"
+        else:
+            status = "✗"
+            mismatches += 1
+        found = f"{len(reference['ingredients'])} nguyên liệu" if reference else "không có công thức"
+        print(f"{status} {path.name:<40}{str(encoding):<14}{route:<11}{found}")
+        if fast != reference:
+            for key in sorted(set(reference or {}) | set(fast or {})):
+                a, b = (reference or {}).get(key), (fast or {}).get(key)
+                if a != b:
+                    print(f"    {key}: reference={a!r}\n    {' ' * len(key)}  parse_recipe={b!r}")
+
+    print(f"\n{len(paths) - mismatches}/{len(paths)} trang giống bản reference")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,27 @@
+"""
+Tiện ích dùng chung cho các script benchmark
+"""
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def load_script(filename):
+    """Import 1 script của pipeline (tên file có dấu '-' nên không import thường được)"""
+    path = ROOT / filename
+    spec = importlib.util.spec_from_file_location(path.stem.replace('-', '_'), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def sample_ingredient_names(count, kb_path=ROOT / "ingredient_knowledge_base.json"):
+    """Lấy `count` tên nguyên liệu trải đều trong KB có sẵn"""
+    with open(kb_path, 'r', encoding='utf-8') as f:
+        names = [item['name_vi'] for item in json.load(f)]
+    step = max(1, len(names) // count)
+    return names[::step][:count]
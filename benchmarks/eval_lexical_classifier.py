@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Đánh giá bộ phân loại theo từ vựng (ingredient_categories.LexicalClassifier) trên KB có sẵn
+
+Chia ingredient_knowledge_base.json thành tập học / tập kiểm tra theo hash của cluster_key
+(các tên cùng cụm luôn ở cùng 1 phía, tập kiểm tra chỉ gồm tên chưa gặp). Với mỗi ngưỡng:
+- coverage: tỉ lệ tên có confidence >= ngưỡng (không cần gọi model)
+- accuracy: tỉ lệ đúng với category trong KB trên các tên đó
+Dòng "từ khoá" là fallback cũ của parse_category (đoán mọi tên) để so sánh.
+--no-lexicon: đo như 6-build_ingredients_kb.py khi chưa có file lexicon (LexicalClassifier.from_kb
+trả None, mọi tên đều hỏi model).
+
+Usage:
+    python benchmarks/eval_lexical_classifier.py
+    python benchmarks/eval_lexical_classifier.py --no-lexicon
+    python benchmarks/eval_lexical_classifier.py --holdout 0.2 --thresholds 0.5 0.7 0.9
+"""
+import argparse
+import json
+import zlib
+
+from common import ROOT
+from ingredient_categories import LexicalClassifier, keyword_category
+from ingredient_clusters import cluster_key
+
+
+def is_holdout(name, fraction):
+    """Chia tất định theo cluster_key"""
+    return zlib.crc32(cluster_key(name).encode('utf-8')) % 1000 < fraction * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coverage / accuracy của bộ phân loại theo từ vựng")
+    parser.add_argument("--kb", default=str(ROOT / "ingredient_knowledge_base.json"), help="KB có category làm nhãn")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Tỉ lệ tập kiểm tra (default: 0.2)")
+    parser.add_argument("--thresholds", type=float, nargs='+', default=[0.0, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9],
+                        help="Các ngưỡng confidence cần đo")
+    parser.add_argument("--no-lexicon", action="store_true", help="Không có KB để học (như lần build đầu tiên)")
+    args = parser.parse_args()
+
+    with open(args.kb, 'r', encoding='utf-8') as f:
+        kb = [(item['name_vi'], item['category']) for item in json.load(f)]
+    train = [item for item in kb if not is_holdout(item[0], args.holdout)]
+    test = [item for item in kb if is_holdout(item[0], args.holdout)]
+    classifier = LexicalClassifier.from_kb(None) if args.no_lexicon else LexicalClassifier(train)
+    if classifier is None:
+        # Không có tầng từ vựng: tên nào cũng hỏi model
+        test = kb
+        predictions = [((None, 0.0), category) for name, category in test]
+        print(f"Không có lexicon: kiểm tra {len(test)} tên\n")
+    else:
+        predictions = [(classifier.classify(name), category) for name, category in test]
+        print(f"Học: {len(train)} tên, kiểm tra: {len(test)} tên chưa gặp, {len(classifier.grams)} cụm từ\n")
+
+    n = len(test)
+    print(f"{'ngưỡng':<12}{'coverage':>10}{'accuracy':>10}{'gọi model':>12}")
+    for threshold in args.thresholds:
+        covered = [(label, category) for (label, confidence), category in predictions
+                   if label is not None and confidence >= threshold]
+        correct = sum(label == category for label, category in covered)
+        accuracy = correct / len(covered) if covered else 0.0
+        print(f"{threshold:<12.2f}{len(covered) / n:>10.1%}{accuracy:>10.1%}{n - len(covered):>12}")
+
+    keyword_correct = sum(keyword_category(name) == category for name, category in test)
+    print(f"{'từ khoá':<12}{1:>10.1%}{keyword_correct / n:>10.1%}{0:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Cache response HTTP trên đĩa cho các bước crawl (1-crawl_dish_urls.py, 2-crawl_dish_recipe.py)
+
+- Key theo URL, lưu body + ETag + Last-Modified
+- Crawl lại thì gửi If-None-Match / If-Modified-Since, gặp 304 thì đọc body từ đĩa
+- Trong thời gian `ttl` (giây) trả thẳng từ đĩa, không gửi request
+- `offline=True`: chỉ đọc cache (replay parser mà không cần mạng)
+- Tổng dung lượng vượt `max_bytes` thì xoá các entry lâu không dùng nhất (LRU)
+- AsyncHttpCache: cùng cache cho code asyncio, I/O chạy trong 1 thread riêng
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_CACHE_DIR = "data/http_cache"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+class CacheMiss(Exception):
+    """URL chưa có trong cache khi chạy offline"""
+
+
+class HttpCache:
+    """Cache response HTTP: body lưu thành file, metadata lưu trong SQLite"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl=None, offline=False):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.offline = offline
+        self.stats = {'fresh': 0, 'revalidated': 0, 'stored': 0, 'evicted': 0}
+
+        os.makedirs(root, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, 'index.sqlite'), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)")
+        self.db.commit()
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ===== Lưu trữ =====
+    def _body_path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, key[:2], key + '.body')
+
+    def lookup(self, url):
+        """Metadata của URL trong cache (dict) hoặc None"""
+        row = self.db.execute(
+            "SELECT etag, last_modified, fetched_at FROM entries WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None or not os.path.exists(self._body_path(url)):
+            return None
+        return {'url': url, 'etag': row[0], 'last_modified': row[1], 'fetched_at': row[2]}
+
+    def read(self, url):
+        """Đọc body từ đĩa và cập nhật thời điểm truy cập (cho LRU)"""
+        with open(self._body_path(url), 'rb') as f:
+            body = f.read()
+        self.db.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        self.db.commit()
+        return body
+
+    def store(self, url, body, headers):
+        """Ghi body + ETag/Last-Modified của 1 response 200"""
+        path = self._body_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        old = self.db.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries (url, etag, last_modified, size, fetched_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, headers.get('ETag'), headers.get('Last-Modified'), len(body), now, now)
+        )
+        self.db.commit()
+        self.total_bytes += len(body) - (old[0] if old else 0)
+        self.stats['stored'] += 1
+        self.evict()
+
+    def forget(self, url):
+        """Xoá entry của URL (file body đã mất mà dòng SQLite còn)"""
+        row = self.db.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return
+        try:
+            os.remove(self._body_path(url))
+        except FileNotFoundError:
+            pass
+        self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+        self.db.commit()
+        self.total_bytes -= row[0]
+
+    def revalidated(self, url, headers=None):
+        """Server trả 304: làm mới fetched_at và trả body trên đĩa
+
+        ETag / Last-Modified mới gửi kèm 304 (headers) thay cho giá trị cũ, để lần sau gửi
+        đúng header điều kiện. File body đã bị xoá (evict giữa lúc gửi request và lúc nhận 304) thì bỏ entry và
+        trả None: người gọi phải tải lại không kèm header điều kiện.
+        """
+        try:
+            body = self.read(url)
+        except FileNotFoundError:
+            self.forget(url)
+            return None
+        headers = headers or {}
+        self.db.execute(
+            "UPDATE entries SET fetched_at = ?, etag = COALESCE(?, etag), "
+            "last_modified = COALESCE(?, last_modified) WHERE url = ?",
+            (time.time(), headers.get('ETag'), headers.get('Last-Modified'), url)
+        )
+        self.db.commit()
+        self.stats['revalidated'] += 1
+        return body
+
+    def evict(self):
+        """Xoá entry lâu không dùng nhất cho tới khi tổng dung lượng <= max_bytes"""
+        if self.max_bytes is None or self.total_bytes <= self.max_bytes:
+            return
+        rows = self.db.execute("SELECT url, size FROM entries ORDER BY accessed_at").fetchall()
+        for url, size in rows:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._body_path(url))
+            except FileNotFoundError:
+                pass
+            self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self.total_bytes -= size
+            self.stats['evicted'] += 1
+        self.db.commit()
+
+    # ===== Logic request có điều kiện =====
+    def is_fresh(self, entry):
+        """Entry còn trong TTL thì không cần hỏi lại server"""
+        return self.ttl is not None and time.time() - entry['fetched_at'] < self.ttl
+
+    def cached_body(self, url):
+        """Body dùng ngay không cần request (còn TTL hoặc đang offline), ngược lại None
+
+        Offline mà chưa có trong cache thì raise CacheMiss.
+        """
+        entry = self.lookup(url)
+        if entry and (self.offline or self.is_fresh(entry)):
+            try:
+                body = self.read(url)
+            except FileNotFoundError:
+                self.forget(url)
+            else:
+                self.stats['fresh'] += 1
+                return body
+        if self.offline:
+            raise CacheMiss(url)
+        return None
+
+    def conditional_headers(self, url):
+        """Header If-None-Match / If-Modified-Since cho lần crawl lại"""
+        entry = self.lookup(url)
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def get(self, url, headers=None, timeout=10, session=None):
+        """GET bằng requests có dùng cache, trả về body (bytes)"""
+        body = self.cached_body(url)
+        if body is not None:
+            return body
+
+        request_headers = dict(headers or {})
+        request_headers.update(self.conditional_headers(url))
+        response = (session or requests).get(url, headers=request_headers, timeout=timeout)
+        if response.status_code == 304:
+            body = self.revalidated(url, response.headers)
+            if body is not None:
+                return body
+            response = (session or requests).get(url, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        self.store(url, response.content, response.headers)
+        return response.content
+
+    def summary(self):
+        return (f"HTTP cache: {self.stats['fresh']} từ đĩa, {self.stats['revalidated']} revalidate (304), "
+                f"{self.stats['stored']} tải mới, {self.stats['evicted']} bị xoá, "
+                f"{self.total_bytes / 1024 ** 2:.1f} MB")
+
+
+class AsyncHttpCache:
+    """HttpCache cho code asyncio
+
+    SQLite và file body đều là I/O đồng bộ: chạy trong 1 thread riêng (tuần tự, dùng chung
+    1 connection an toàn) thay vì chặn event loop.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="http-cache")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def cached_body(self, url):
+        return await self._run(self.cache.cached_body, url)
+
+    async def conditional_headers(self, url):
+        return await self._run(self.cache.conditional_headers, url)
+
+    async def revalidated(self, url, headers=None):
+        return await self._run(self.cache.revalidated, url, headers)
+
+    async def store(self, url, body, headers):
+        return await self._run(self.cache.store, url, body, headers)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def add_cache_arguments(parser):
+    """Các option CLI dùng chung cho cache"""
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"Thư mục cache HTTP (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2,
+                        help="Dung lượng cache tối đa, MB (default: 2048)")
+    parser.add_argument("--cache-ttl", type=float, default=None,
+                        help="Trong bao nhiêu giây thì dùng thẳng cache, không gửi request (default: luôn revalidate)")
+    # --offline chỉ đọc cache: đi cùng --no-cache thì không lấy được gì
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--offline", action="store_true", help="Chỉ đọc từ cache, không truy cập mạng")
+    mode.add_argument("--no-cache", action="store_true", help="Không dùng cache HTTP")
+
+
+def cache_from_args(args):
+    """Tạo HttpCache từ các option CLI, None nếu --no-cache"""
+    if args.no_cache:
+        return None
+    return HttpCache(args.cache_dir, int(args.cache_max_mb * 1024 ** 2), args.cache_ttl, args.offline)
@@ -0,0 +1,178 @@
+"""
+Category nguyên liệu và bộ phân loại theo từ vựng (không cần LLM)
+
+- CATEGORIES: 12 category và mô tả (dùng trong prompt của bước 6)
+- keyword_category: đoán category theo từ khoá khi câu trả lời của model không dùng được
+- LexicalClassifier: khớp nhiều mẫu cùng lúc (Aho-Corasick) với từ vựng học từ KB có sẵn,
+  từ khoá và ví dụ trong mô tả category; trả về (label, confidence). Bước 6 chỉ gửi cho
+  model các tên có confidence dưới ngưỡng
+"""
+import json
+import os
+import re
+from collections import Counter, defaultdict, deque
+
+from ingredient_clusters import cluster_key
+
+CATEGORIES = {
+    'rau-thom': 'rau thơm như húng, ngò, rau mùi, thì là, lá',
+    'rau-cu': 'rau củ như cà chua, bí, củ cải, khoai, su hào, đậu, bắp, măng',
+    'trai-cay': 'trái cây như chuối, táo, cam, xoài, dứa, đu đủ, bưởi, nho',
+    'thit-ca': 'thịt và hải sản như thịt gà, heo, bò, cá, tôm, mực, sườn, tép, ghẹ',
+    'gia-vi': 'gia vị như muối, đường, bột, nước mắm, tương, hạt nêm, tiêu, ớt, tỏi, gừng, hành, me, sả',
+    'ngu-coc': 'ngũ cốc như gạo, bột mì, nui, miến, bún, phở, bánh mì, yến mạch',
+    'hat-dau': 'các loại hạt và đậu như đậu phộng, đậu nành, đậu đỏ, đậu xanh, hạt điều, óc chó',
+    'sua-trung': 'sữa, trứng và sản phẩm từ sữa như sữa tươi, sữa đặc, phô mai, bơ, trứng gà, trứng vịt',
+    'do-kho': 'đồ khô như nấm, mộc nhĩ, hải sâm, tôm khô, mực khô, cá khô',
+    'nuoc-cham': 'nước chấm và sốt như nước mắm pha, tương ớt, mayonnaise, sốt cà chua',
+    'dau-mo': 'dầu và mỡ như dầu ăn, dầu olive, mỏ heo, bơ thực vật',
+    'khac': 'các loại khác'
+}
+
+# Từ khoá theo thứ tự ưu tiên (substring của tên viết thường)
+KEYWORD_RULES = [
+    ('rau-thom', ['húng', 'ngò', 'rau', 'lá', 'mùi', 'thì']),
+    ('gia-vi', ['muối', 'đường', 'bột', 'tương', 'ớt', 'tỏi', 'gừng', 'hành']),
+    ('thit-ca', ['thịt', 'gà', 'heo', 'bò', 'cá', 'tôm', 'mực']),
+    ('rau-cu', ['cà', 'bí', 'củ', 'khoai', 'cải', 'đậu', 'bắp']),
+    ('ngu-coc', ['gạo', 'bột', 'mì', 'nui', 'miến', 'bún', 'phở']),
+]
+DEFAULT_CATEGORY = 'gia-vi'
+
+
+def keyword_category(name):
+    """Đoán category theo từ khoá, không khớp thì DEFAULT_CATEGORY"""
+    name_lower = name.lower()
+    for category, keywords in KEYWORD_RULES:
+        if any(k in name_lower for k in keywords):
+            return category
+    return DEFAULT_CATEGORY
+
+
+def description_examples():
+    """Các ví dụ sau chữ "như" trong mô tả category: (ví dụ, category)"""
+    for category, description in CATEGORIES.items():
+        _, _, examples = description.partition(' như ')
+        for example in re.split(r',\s*', examples):
+            if example:
+                yield example, category
+
+
+class AhoCorasick:
+    """Automaton Aho-Corasick: tìm mọi lần xuất hiện của nhiều mẫu trong 1 lượt quét text"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for pattern in patterns:
+            node = 0
+            for char in pattern:
+                if char not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][char] = len(self.goto) - 1
+                node = self.goto[node][char]
+            self.output[node].append(pattern)
+
+        # BFS: fail của 1 node = node dài nhất là hậu tố thực sự của nó
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        """Yield (start, pattern) cho mọi lần xuất hiện, kể cả chồng lên nhau"""
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for pattern in self.output[node]:
+                yield end - len(pattern), pattern
+
+
+class LexicalClassifier:
+    """Phân loại theo cụm từ: mỗi cụm 1-3 từ đã gặp trong KB mang phân bố category của nó
+
+    - Tên đã có trong KB (so theo cluster_key) -> phân bố category của chính tên đó (KB nhất
+      quán thì confidence = 1, nên build lại KB không gọi model cho các tên đã biết)
+    - Còn lại: cộng phân bố của các cụm từ khớp trong tên (Aho-Corasick, khớp theo ranh giới
+      từ), cụm dài hơn và cụm ở đầu tên (danh từ chính: "thịt", "bột", "rau") nặng hơn
+    - confidence = phần điểm của label thắng; cụm hiếm bị làm mờ bằng 1 lượt đếm "không biết"
+      nên tên chỉ khớp với cụm ít gặp có confidence thấp
+    """
+    HEAD_BONUS = 2.0
+    PRIOR_COUNT = 3
+
+    def __init__(self, examples=(), max_ngram=3, min_count=2):
+        self.exact = defaultdict(Counter)
+        grams = defaultdict(Counter)
+        for name, category in examples:
+            key = cluster_key(name)
+            if not key or category not in CATEGORIES:
+                continue
+            self.exact[key][category] += 1
+            words = key.split()
+            for n in range(1, min(max_ngram, len(words)) + 1):
+                for start in range(len(words) - n + 1):
+                    grams[' '.join(words[start:start + n])][category] += 1
+        self.grams = {gram: counts for gram, counts in grams.items() if sum(counts.values()) >= min_count}
+
+        # Từ khoá và ví dụ trong mô tả category: coi như đã gặp PRIOR_COUNT lần
+        for category, keywords in KEYWORD_RULES:
+            for keyword in keywords:
+                self.grams.setdefault(keyword, Counter())[category] += self.PRIOR_COUNT
+        for example, category in description_examples():
+            self.grams.setdefault(cluster_key(example), Counter())[category] += self.PRIOR_COUNT
+
+        # Mẫu có khoảng trắng 2 đầu, text cũng vậy -> chỉ khớp nguyên từ
+        self.automaton = AhoCorasick(f" {gram} " for gram in self.grams)
+
+    @classmethod
+    def from_kb(cls, path, **options):
+        """
+        Học từ ingredient KB có sẵn (name_vi, category); không có file thì None (không có tầng
+        từ vựng): chỉ riêng từ khoá (PRIOR_COUNT lượt) đã đủ vượt LEXICAL_THRESHOLD mà đoán sai
+        ~1/5 số tên, nên khi chưa có KB mọi tên đều hỏi model
+        """
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            kb = json.load(f)
+        return cls(((item['name_vi'], item['category']) for item in kb), **options)
+
+    def distribution(self, name):
+        """(category -> điểm, tổng trọng số) của 1 tên"""
+        key = cluster_key(name)
+        if key in self.exact:
+            # Tên đã được phân loại trước đó: không làm mờ
+            counts = self.exact[key]
+            return {category: count / sum(counts.values()) for category, count in counts.items()}, 1.0
+
+        scores = Counter()
+        total_weight = 0.0
+        for start, pattern in self.automaton.find(f" {key} "):
+            gram = pattern[1:-1]
+            counts = self.grams[gram]
+            weight = len(gram.split()) * (self.HEAD_BONUS if start == 0 else 1.0)
+            total = sum(counts.values()) + 1
+            for category, count in counts.items():
+                scores[category] += weight * count / total
+            total_weight += weight
+        return scores, total_weight
+
+    def classify(self, name):
+        """(label, confidence); không khớp cụm nào thì (None, 0.0)"""
+        scores, total_weight = self.distribution(name)
+        if not scores:
+            return None, 0.0
+        label, score = max(scores.items(), key=lambda item: item[1])
+        return label, score / total_weight
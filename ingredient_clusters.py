@@ -0,0 +1,81 @@
+"""
+Gom các tên nguyên liệu chỉ khác nhau về định dạng thành 1 cụm
+
+unique_ingredients.json coi "bột mì đa dụng", "bột mì   đa dụng", "bột mì đa dụng" (NFD)
+hay "dầu ăn." là các nguyên liệu khác nhau. Bước 5 và 6 chỉ gọi LLM 1 lần cho tên đại
+diện của mỗi cụm rồi chép kết quả cho mọi tên trong cụm.
+
+Hai tên cùng cụm nếu giống nhau sau khi: chuẩn hoá Unicode NFC, bỏ ký tự vô hình
+(zero-width space, ...), chữ thường, coi dấu câu như khoảng trắng và gộp khoảng trắng.
+"""
+import json
+import os
+import re
+import unicodedata
+
+CLUSTERS_FILE = "data/ingredient_clusters.json"
+
+SPACES = re.compile(r'\s+')
+PUNCTUATION = re.compile(r'[^\w\s]')
+# Dấu câu thừa ở cuối tên ("dầu ăn.", "cà chua:")
+TRAILING_PUNCTUATION = re.compile(r'[\s.,:;\-–]+$')
+
+
+def strip_invisible(text):
+    """Bỏ ký tự định dạng vô hình (Unicode category Cf: zero-width space, BOM, ...)"""
+    return ''.join(char for char in text if unicodedata.category(char) != 'Cf')
+
+
+def clean_name(name):
+    """Tên để hiển thị / gửi cho LLM: NFC, không ký tự vô hình, gộp khoảng trắng, bỏ dấu câu ở cuối"""
+    name = strip_invisible(unicodedata.normalize('NFC', name))
+    name = SPACES.sub(' ', name).strip()
+    return TRAILING_PUNCTUATION.sub('', name)
+
+
+def cluster_key(name):
+    """Key so sánh: 2 tên cùng key thì coi là 1 nguyên liệu"""
+    name = strip_invisible(unicodedata.normalize('NFC', name)).lower()
+    return SPACES.sub(' ', PUNCTUATION.sub(' ', name)).strip()
+
+
+def cluster_names(names, frequency=None):
+    """Gom names thành các cụm, theo thứ tự xuất hiện đầu tiên
+
+    Tên đại diện = clean_name của tên dùng nhiều nhất trong cụm (theo frequency:
+    tên -> số công thức), hoà thì lấy tên xuất hiện trước.
+    Trả về list {'canonical': tên đại diện, 'members': [các tên gốc]}.
+    """
+    frequency = frequency or {}
+    groups = {}
+    for name in names:
+        groups.setdefault(cluster_key(name), []).append(name)
+    clusters = []
+    for members in groups.values():
+        best = max(members, key=lambda name: frequency.get(name, 0))
+        clusters.append({'canonical': clean_name(best), 'members': members})
+    return clusters
+
+
+def save_clusters(clusters, path=CLUSTERS_FILE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(clusters, f, ensure_ascii=False, indent=2)
+
+
+def load_canonical_map(path=CLUSTERS_FILE):
+    """tên gốc -> tên đại diện của cụm; {} nếu chưa có file cụm (không gom)"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        clusters = json.load(f)
+    return {member: cluster['canonical'] for cluster in clusters for member in cluster['members']}
+
+
+def group_by_canonical(items, canonical_map, name=lambda item: item):
+    """Gom items theo tên đại diện (giữ thứ tự xuất hiện): canonical -> [item]"""
+    groups = {}
+    for item in items:
+        key = name(item)
+        groups.setdefault(canonical_map.get(key, key), []).append(item)
+    return groups
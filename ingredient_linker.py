@@ -0,0 +1,110 @@
+"""
+Nối tên nguyên liệu trong công thức với record của KB nguyên liệu (bước 7)
+
+Index dựng 1 lần trên name_vi, name_normalized và synonyms của mọi record:
+- exact: cluster_key của name_vi / synonym (chữ thường, bỏ dấu câu, gộp khoảng trắng) -> record
+- không dấu: text_normalize của key (cũng là name_normalized) -> record, chỉ dùng khi chỉ có
+  1 record ("ca" có thể là "cá" hoặc "cà" thì không)
+- fuzzy: inverted index trigram ký tự -> các key không dấu (mảng numpy). 1 tên chỉ chấm
+  các key có chung ít nhất 1 trigram: gộp posting list của các trigram của nó rồi đếm bằng
+  numpy, không quét cả KB. Điểm = hệ số Dice của 2 tập trigram; nhiều record cùng key /
+  cùng điểm thì chọn record có trigram có dấu giống nhất. Dưới ngưỡng thì không nối.
+Kết quả được nhớ theo tên (cùng 1 tên lặp lại trong rất nhiều công thức).
+"""
+from collections import Counter
+
+import numpy as np
+
+from ingredient_clusters import cluster_key
+from text_normalize import normalize
+
+LINK_THRESHOLD = 0.6
+
+
+def trigrams(text):
+    """Tập trigram ký tự, thêm khoảng trắng 2 đầu để đầu / cuối từ cũng là 1 trigram"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 0.0
+
+
+class IngredientLinker:
+    """link(tên) -> (record, điểm) hoặc (None, điểm tốt nhất) nếu dưới threshold"""
+
+    def __init__(self, records, threshold=LINK_THRESHOLD):
+        self.records = list(records)
+        self.threshold = threshold
+        self.exact = {}
+        loose = {}
+        # name_vi trước synonyms: tên chính của 1 record thắng synonym của record khác
+        names = [(i, record['name_vi']) for i, record in enumerate(self.records)]
+        names += [(i, name) for i, record in enumerate(self.records) for name in record.get('synonyms') or []]
+        for i, name in names:
+            key = cluster_key(name)
+            if not key:
+                continue
+            self.exact.setdefault(key, i)
+            loose.setdefault(normalize(key), {}).setdefault(i, key)
+        for i, record in enumerate(self.records):
+            key = cluster_key(record.get('name_normalized') or '')
+            if key:
+                loose.setdefault(key, {}).setdefault(i, key)
+
+        self.loose = {key: next(iter(owners)) for key, owners in loose.items() if len(owners) == 1}
+        # Mỗi key không dấu: [(record, trigram của tên có dấu)] để phân xử khi nhiều record cùng key
+        self.keys = []
+        self.key_trigrams = []
+        self.index = {}
+        for key, owners in loose.items():
+            grams = trigrams(key)
+            self.keys.append([(record, trigrams(name)) for record, name in owners.items()])
+            self.key_trigrams.append(len(grams))
+            for gram in grams:
+                self.index.setdefault(gram, []).append(len(self.keys) - 1)
+        self.index = {gram: np.array(postings, dtype=np.int32) for gram, postings in self.index.items()}
+        self.key_trigrams = np.array(self.key_trigrams, dtype=np.int32)
+
+        self.cache = {}
+        self.stats = Counter()
+
+    def link(self, name):
+        if name not in self.cache:
+            self.cache[name] = self._link(name)
+        record, score, method = self.cache[name]
+        self.stats[method] += 1
+        return record, score
+
+    def _link(self, name):
+        """(record hoặc None, điểm, cách khớp)"""
+        key = cluster_key(name)
+        if key in self.exact:
+            return self.records[self.exact[key]], 1.0, 'exact'
+        loose_key = normalize(key)
+        if loose_key in self.loose:
+            return self.records[self.loose[loose_key]], 1.0, 'khong-dau'
+        if not loose_key:
+            return None, 0.0, 'unknown'
+
+        grams = trigrams(loose_key)
+        postings = [self.index[gram] for gram in grams if gram in self.index]
+        if not postings:
+            return None, 0.0, 'unknown'
+        candidates, shared = np.unique(np.concatenate(postings), return_counts=True)
+        scores = 2 * shared / (len(grams) + self.key_trigrams[candidates])
+        best_score = scores.max()
+        if best_score < self.threshold:
+            return None, float(best_score), 'unknown'
+        best = candidates[scores == best_score]
+        accented = trigrams(key)
+        record, _ = max((owner for candidate in best for owner in self.keys[candidate]),
+                        key=lambda owner: dice(accented, owner[1]))
+        return self.records[record], float(best_score), 'fuzzy'
+
+    def summary(self):
+        total = sum(self.stats.values()) or 1
+        parts = ', '.join(f"{method} {self.stats[method]} ({self.stats[method] / total:.1%})"
+                          for method in ('exact', 'khong-dau', 'fuzzy', 'unknown'))
+        return f"Nối nguyên liệu: {parts}"
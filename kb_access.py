@@ -0,0 +1,275 @@
+"""
+Truy cập chỉ đọc KB nguyên liệu / món ăn, không json.load cả file ở mỗi lần khởi động
+
+    kb = KnowledgeBase("ingredient_knowledge_base.json")
+    kb.get_by_id("ingre00001")
+    kb.find_by_name("Hành Lá")      # không phân biệt dấu / hoa thường (name_normalized)
+    kb.by_category("rau-cu")
+    kb.synonyms_of("hanh la")
+
+Mỗi index chỉ dựng khi được dùng lần đầu và ghi thành file nhị phân trong thư mục sidecar
+<kb>.idx/ cạnh file KB; các lần sau (và các worker khác) mmap file có sẵn:
+- records/: bundle của split_data/kb_bundle.py (shard JSON lines + index id đã sắp xếp),
+  get_by_id tìm nhị phân rồi chỉ parse đúng 1 record
+- name.bin, category.bin, synonym.bin: bảng key -> danh sách vị trí record trong bundle,
+  key sắp xếp theo byte UTF-8, tra bằng tìm nhị phân trên mmap (xem write_table)
+Dựng bundle cần đọc KB (json / parquet qua kb_parquet.load_records) 1 lần, các bảng dựng từ
+bundle; sidecar ghi kèm kích thước + mtime của KB, KB đổi thì sidecar cũ bị xoá và dựng lại khi
+cần. Xoá / dựng / mở index đều giữ flock trên <kb>.idx.lock, nên nhiều worker không xoá file
+đang dựng dở của nhau. Worker mở từ bản KB cũ (KB đổi sau khi nó khởi động) dựng index còn
+thiếu vào thư mục tạm riêng, không ghi vào sidecar của bản mới.
+"""
+import fcntl
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+
+from split_data.kb_bundle import BundleReader, write_bundle
+from text_normalize import normalize
+
+SIDECAR_VERSION = 1
+META_FILE = "meta.json"
+RECORDS_DIR = "records"
+TABLE_MAGIC = b"KBX1"
+# magic, số key, số phần tử posting
+TABLE_HEADER = struct.Struct("<4sII")
+
+
+def name_key(text):
+    """Key tra tên: bỏ dấu, chữ thường, gộp khoảng trắng"""
+    return ' '.join(normalize(text or '').split())
+
+
+def table_keys(record, table):
+    """Các key của 1 record trong 1 bảng index"""
+    if table == "name":
+        return {name_key(record.get('name_normalized') or record.get('name_vi'))} - {''}
+    if table == "category":
+        return {record['category']} if record.get('category') else set()
+    return {name_key(name) for name in [record.get('name_vi')] + (record.get('synonyms') or [])} - {''}
+
+
+def write_table(path, table):
+    """
+    Ghi bảng key -> danh sách số nguyên (vị trí record)
+
+    Layout (uint32 theo thứ tự byte của máy, sidecar chỉ dùng tại chỗ):
+        header | key_offsets[n+1] | posting_offsets[n+1] | postings[m] | key bytes
+    key i là bytes[key_offsets[i]:key_offsets[i+1]], posting của nó là
+    postings[posting_offsets[i]:posting_offsets[i+1]].
+    """
+    keys = sorted((key.encode('utf-8'), sorted(set(values))) for key, values in table.items())
+    key_offsets, posting_offsets, postings = array('I', [0]), array('I', [0]), array('I')
+    blob = bytearray()
+    for key, values in keys:
+        blob += key
+        key_offsets.append(len(blob))
+        postings.extend(values)
+        posting_offsets.append(len(postings))
+    atomic_write(path, TABLE_HEADER.pack(TABLE_MAGIC, len(keys), len(postings))
+                 + key_offsets.tobytes() + posting_offsets.tobytes() + postings.tobytes() + bytes(blob))
+
+
+def atomic_write(path, data):
+    """Ghi file tạm rồi rename: worker khác không bao giờ mmap phải file ghi dở"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class KeyTable:
+    """Bảng do write_table ghi, mmap chỉ đọc"""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, total = TABLE_HEADER.unpack_from(self._map, 0)
+        if magic != TABLE_MAGIC:
+            raise ValueError(f"{path} is not a KB index table")
+        view = memoryview(self._map)
+        start = TABLE_HEADER.size
+        self._key_offsets = view[start:start + 4 * (self.count + 1)].cast('I')
+        start += 4 * (self.count + 1)
+        self._posting_offsets = view[start:start + 4 * (self.count + 1)].cast('I')
+        start += 4 * (self.count + 1)
+        self._postings = view[start:start + 4 * total].cast('I')
+        self._keys_start = start + 4 * total
+        view.release()
+
+    def _key(self, i):
+        return self._map[self._keys_start + self._key_offsets[i]:self._keys_start + self._key_offsets[i + 1]]
+
+    def get(self, key):
+        """Danh sách vị trí record của key ([] nếu không có)"""
+        key = key.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.count or self._key(low) != key:
+            return []
+        return self._postings[self._posting_offsets[low]:self._posting_offsets[low + 1]].tolist()
+
+    def keys(self):
+        for i in range(self.count):
+            yield self._key(i).decode('utf-8')
+
+    def close(self):
+        for view in (self._key_offsets, self._posting_offsets, self._postings):
+            view.release()
+        self._map.close()
+        self._file.close()
+
+
+class KnowledgeBase:
+    """KB chỉ đọc với index lười, lưu thành sidecar mmap được (xem docstring của module)"""
+
+    def __init__(self, path, index_dir=None):
+        self.path = Path(path)
+        self.index_dir = Path(index_dir) if index_dir else self.path.with_name(self.path.name + ".idx")
+        self._records = None
+        self._bundle = None
+        self._tables = {}
+        self._stamp = self._source_stamp()
+        self._check_sidecar()
+
+    def _source_stamp(self):
+        stat = self.path.stat()
+        return {"version": SIDECAR_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    @contextmanager
+    def _locked(self):
+        """flock độc quyền trên <index_dir>.lock (file lock nằm ngoài thư mục bị xoá)"""
+        self.index_dir.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.index_dir.with_name(self.index_dir.name + ".lock"), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _sidecar_current(self):
+        """Sidecar trên đĩa dựng từ đúng bản KB lúc mở instance này?"""
+        try:
+            with open(self.index_dir / META_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f) == self._stamp
+        except (OSError, ValueError):
+            return False
+
+    def _check_sidecar(self):
+        """Xoá sidecar dựng từ bản KB khác (so kích thước + mtime)"""
+        with self._locked():
+            if self._sidecar_current():
+                return
+            if self.index_dir.exists():
+                shutil.rmtree(self.index_dir)
+            self.index_dir.mkdir(parents=True)
+            atomic_write(self.index_dir / META_FILE, json.dumps(self._stamp).encode('utf-8'))
+
+    def _open_index(self, name, build, open_index):
+        """
+        Mở index `name` của sidecar, dựng (build(path)) trước nếu còn thiếu
+
+        KB đã đổi sau khi instance này mở: dựng vào thư mục tạm riêng rồi mở và xoá ngay
+        (file đã mở / mmap vẫn đọc được), để không trộn index của 2 bản KB.
+        """
+        with self._locked():
+            if self._sidecar_current():
+                path = self.index_dir / name
+                if not path.exists():
+                    build(path)
+                return open_index(path)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=self.index_dir.name))
+        try:
+            build(tmp_dir / name)
+            return open_index(tmp_dir / name)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _load_records(self):
+        """Đọc cả KB, chỉ khi phải dựng 1 index còn thiếu"""
+        if self._records is None:
+            # pyarrow chỉ được import khi phải dựng index (không tốn lúc khởi động bình thường)
+            from kb_parquet import load_records
+            self._records = [record for record in load_records(self.path) if record.get('id')]
+        return self._records
+
+    @property
+    def bundle(self):
+        if self._bundle is None:
+            self._bundle = self._open_index(
+                RECORDS_DIR, lambda path: write_bundle(self._load_records(), path, shards=1), BundleReader)
+        return self._bundle
+
+    def _build_table(self, path, table, bundle):
+        # Dựng từ bundle đang mở: vị trí record luôn khớp với bundle của instance này
+        keys = {}
+        for position in range(len(bundle)):
+            for key in table_keys(bundle.get_at(position), table):
+                keys.setdefault(key, []).append(position)
+        write_table(path, keys)
+
+    def _table(self, table):
+        if table not in self._tables:
+            # Mở bundle trước khi giữ lock (flock không lồng được trong cùng tiến trình)
+            bundle = self.bundle
+            self._tables[table] = self._open_index(
+                f"{table}.bin", lambda path: self._build_table(path, table, bundle), KeyTable)
+        return self._tables[table]
+
+    def _lookup(self, table, key):
+        return [self.bundle.get_at(position) for position in self._table(table).get(key)]
+
+    def get_by_id(self, item_id):
+        """Record của id, hoặc None"""
+        return self.bundle.get(item_id)
+
+    def find_by_name(self, name):
+        """Các record có name_normalized trùng tên (không phân biệt dấu, hoa thường, khoảng trắng)"""
+        return self._lookup("name", name_key(name))
+
+    def by_category(self, category):
+        """Mọi record thuộc 1 category (vd. "rau-cu")"""
+        return self._lookup("category", category)
+
+    def categories(self):
+        return list(self._table("category").keys())
+
+    def synonyms_of(self, name):
+        """
+        Tên đồng nghĩa của nguyên liệu có tên chính hoặc 1 synonym trùng `name` (không phân
+        biệt dấu): name_vi + synonyms của các record đó, trừ chính tên được hỏi
+        """
+        key = name_key(name)
+        names = []
+        for record in self._lookup("synonym", key):
+            names += [record['name_vi']] + (record.get('synonyms') or [])
+        return [other for other in dict.fromkeys(names) if name_key(other) not in ('', key)]
+
+    def __contains__(self, item_id):
+        return item_id in self.bundle
+
+    def __len__(self):
+        return len(self.bundle)
+
+    def close(self):
+        for table in self._tables.values():
+            table.close()
+        self._tables = {}
+        if self._bundle is not None:
+            self._bundle.close()
+            self._bundle = None
+        self._records = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
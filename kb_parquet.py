@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Lưu / đọc recipes_detail, ingredient KB và dish KB dạng Parquet (pyarrow)
+
+- Danh sách nguyên liệu lồng nhau lưu dạng list<struct>, synonyms/categories dạng list<string>
+- Đọc có chọn cột (columns) và lọc đẩy xuống file (filters), ví dụ:
+      read_records('ingredient_knowledge_base.parquet', columns=['id', 'name_vi'],
+                   filters=[('category', '=', 'thit-ca')])
+- Chuyển đổi 2 chiều JSON <-> Parquet:
+      python kb_parquet.py ingredient_knowledge_base.json            # -> .parquet
+      python kb_parquet.py ingredient_knowledge_base.parquet         # -> .json
+"""
+import argparse
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+RECIPE_SCHEMA = pa.schema([
+    ('dish_name', pa.string()),
+    ('url', pa.string()),
+    ('servings', pa.int32()),
+    ('ingredients', pa.list_(pa.struct([
+        ('name', pa.string()),
+        ('quantity', pa.float64()),
+        ('unit', pa.string()),
+    ]))),
+    ('content_hash', pa.string()),
+    ('category', pa.string()),
+    ('categories', pa.list_(pa.string())),
+])
+
+INGREDIENT_SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('name_vi', pa.string()),
+    ('name_normalized', pa.string()),
+    ('name_en', pa.string()),
+    ('category', pa.string()),
+    ('synonyms', pa.list_(pa.string())),
+    ('type', pa.string()),
+])
+
+DISH_SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('name_vi', pa.string()),
+    ('name_normalized', pa.string()),
+    ('category', pa.string()),
+    ('ingredients', pa.list_(pa.struct([
+        ('ingredient_id', pa.string()),
+        ('name_vi', pa.string()),
+        ('name_en', pa.string()),
+        ('quantity', pa.float64()),
+        ('unit', pa.string()),
+        ('required', pa.bool_()),
+        ('category', pa.string()),
+        ('name_normalized', pa.string()),
+        ('match_score', pa.float64()),
+    ]))),
+    ('type', pa.string()),
+])
+
+SCHEMAS = {'recipes': RECIPE_SCHEMA, 'ingredients': INGREDIENT_SCHEMA, 'dishes': DISH_SCHEMA}
+
+# Row group nhỏ để filters có thể bỏ qua cả row group dựa trên thống kê min/max
+ROW_GROUP_SIZE = 2000
+
+
+def guess_kind(path):
+    """Đoán loại dữ liệu từ tên file"""
+    name = os.path.basename(path)
+    if 'ingredient_knowledge_base' in name:
+        return 'ingredients'
+    if 'dish_knowledge_base' in name:
+        return 'dishes'
+    if 'recipes' in name:
+        return 'recipes'
+    raise ValueError(f"Không đoán được loại dữ liệu của {path}, dùng --kind")
+
+
+def write_parquet(records, path, kind):
+    """Ghi records (iterable dict) ra Parquet theo từng batch, không giữ cả file trong RAM"""
+    schema = SCHEMAS[kind]
+    count = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == ROW_GROUP_SIZE:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def read_table(path, columns=None, filters=None):
+    """Đọc Parquet thành pyarrow.Table, chỉ đọc các cột cần và lọc theo filters"""
+    return pq.read_table(path, columns=columns, filters=filters)
+
+
+def read_records(path, columns=None, filters=None):
+    """Đọc Parquet thành list dict (cùng dạng với file JSON)"""
+    return read_table(path, columns, filters).to_pylist()
+
+
+def iter_parquet(path, columns=None, batch_size=ROW_GROUP_SIZE):
+    """Yield từng record, đọc theo batch"""
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+        yield from batch.to_pylist()
+
+
+def load_records(path, columns=None, filters=None):
+    """Đọc KB/recipes từ .json hoặc .parquet"""
+    if str(path).endswith('.parquet'):
+        return read_records(path, columns, filters)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_records(records, path, kind):
+    """Ghi KB/recipes ra .json (indent=2 như cũ) hoặc .parquet theo đuôi file"""
+    if str(path).endswith('.parquet'):
+        return write_parquet(records, path, kind)
+    records = list(records)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    return len(records)
+
+
+def convert(input_path, output_path, kind):
+    """JSON -> Parquet hoặc Parquet -> JSON"""
+    from recipe_stream import iter_recipes
+
+    if input_path.endswith('.parquet'):
+        return save_records(iter_parquet(input_path), output_path, kind)
+    return save_records(iter_recipes(input_path), output_path, kind)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chuyển đổi recipes / KB giữa JSON và Parquet")
+    parser.add_argument("input", help="File .json/.jsonl hoặc .parquet")
+    parser.add_argument("-o", "--output", help="File kết quả (default: đổi đuôi file input)")
+    parser.add_argument("--kind", choices=sorted(SCHEMAS), help="Loại dữ liệu (default: đoán từ tên file)")
+    args = parser.parse_args()
+
+    kind = args.kind or guess_kind(args.input)
+    base, ext = os.path.splitext(args.input)
+    output = args.output or base + ('.json' if ext == '.parquet' else '.parquet')
+
+    count = convert(args.input, output, kind)
+    print(f"Đã chuyển {count} {kind}: {args.input} ({os.path.getsize(args.input) / 1024:.0f} KB) "
+          f"-> {output} ({os.path.getsize(output) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
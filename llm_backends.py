@@ -0,0 +1,263 @@
+"""
+Backend chạy LLM cho bước 5 và 6
+
+- transformers: model HF (GPU float16 / CPU float32), dùng lại KV cache của prefix prompt
+- gguf: model GGUF đã quantize (int4/int8, vd. Qwen/Qwen2.5-7B-Instruct-GGUF) chạy bằng
+  llama.cpp (llama-cpp-python) trên CPU; llama.cpp tự dùng lại KV cache của phần prompt
+  trùng với lần gọi trước. score dùng API C của llama_cpp (bản ghim trong
+  requirements-gguf.txt, kiểm tra bằng benchmarks/check_gguf_scores.py)
+- stub: không có model, kết quả tất định, để chạy thử pipeline / test
+
+Mọi backend chỉ import thư viện và load model ở lần gọi đầu tiên.
+"""
+import os
+import zlib
+
+BACKENDS = ('transformers', 'gguf', 'stub')
+DEFAULT_BACKEND = 'transformers'
+
+
+class TransformersBackend:
+    """Model HF qua transformers (llm_utils)"""
+    name = 'transformers'
+
+    def __init__(self, model_name, prefix_reuse=True):
+        self.model_name = model_name
+        self.prefix_reuse = prefix_reuse
+        self.tokenizer = None
+        self.model = None
+        self.prefixes = {}
+
+    @property
+    def cache_id(self):
+        """Tên model dùng trong key của cache LLM"""
+        return self.model_name
+
+    def load(self):
+        if self.model is None:
+            from llm_utils import load_model
+            self.tokenizer, self.model = load_model(self.model_name)
+
+    def prefix(self, template):
+        """KV cache phần đầu cố định của template, encode 1 lần; None nếu tắt"""
+        if template is None or not self.prefix_reuse:
+            return None
+        if template not in self.prefixes:
+            from llm_utils import PromptPrefix
+            self.load()
+            self.prefixes[template] = PromptPrefix(self.tokenizer, self.model, template)
+        return self.prefixes[template]
+
+    def generate(self, prompts, template=None, **gen_kwargs):
+        """Phần text sinh thêm cho từng prompt; template: hàm tạo ra các prompt (để dùng lại prefix)"""
+        from llm_utils import generate
+        self.load()
+        return generate(self.tokenizer, self.model, prompts, prefix=self.prefix(template), **gen_kwargs)
+
+    def score(self, prompt, candidates, template=None):
+        """Tổng log-prob của từng candidate khi trả lời prompt"""
+        from llm_utils import score_continuations
+        self.load()
+        return score_continuations(self.tokenizer, self.model, prompt, candidates, prefix=self.prefix(template))
+
+
+class GGUFBackend:
+    """Model GGUF quantize chạy trên CPU bằng llama.cpp
+
+    model_name: đường dẫn file .gguf, hoặc "repo_id:filename" trên HF Hub
+    (filename được phép có wildcard, vd. "Qwen/Qwen2.5-7B-Instruct-GGUF:*q4_k_m.gguf").
+    """
+    name = 'gguf'
+
+    def __init__(self, model_name, threads=None, n_ctx=4096):
+        self.model_name = model_name
+        self.threads = threads
+        self.n_ctx = n_ctx
+        self.llm = None
+        self.formatter = None
+        self.scorer = None
+        self.scorer_seqs = 0
+        self.scored_prompt = []
+
+    @property
+    def cache_id(self):
+        return f"gguf:{self.model_name}"
+
+    def load(self):
+        if self.llm is not None:
+            return
+        from llama_cpp import Llama
+        from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+
+        print(f"Loading {self.model_name}...")
+        options = dict(n_ctx=self.n_ctx, n_threads=self.threads or os.cpu_count(), verbose=False)
+        if os.path.exists(self.model_name) or ':' not in self.model_name:
+            self.llm = Llama(model_path=self.model_name, **options)
+        else:
+            repo_id, filename = self.model_name.split(':', 1)
+            self.llm = Llama.from_pretrained(repo_id=repo_id, filename=filename, **options)
+        token_text = lambda token: self.llm.detokenize([token], special=True).decode('utf-8', errors='ignore')
+        self.formatter = Jinja2ChatFormatter(
+            template=self.llm.metadata['tokenizer.chat_template'],
+            eos_token=token_text(self.llm.token_eos()),
+            bos_token=token_text(self.llm.token_bos()),
+        )
+        print("Model loaded.\n")
+
+    def chat_text(self, prompt):
+        return self.formatter(messages=[{"role": "user", "content": prompt}]).prompt
+
+    def generate(self, prompts, template=None, **gen_kwargs):
+        self.load()
+        options = {'max_tokens': gen_kwargs.get('max_new_tokens', 64)}
+        # do_sample=False -> temperature 0 (greedy)
+        if gen_kwargs.get('do_sample', True):
+            options['temperature'] = gen_kwargs.get('temperature', 1.0)
+        else:
+            options['temperature'] = 0.0
+        return [self.llm.create_completion(self.chat_text(prompt), **options)['choices'][0]['text']
+                for prompt in prompts]
+
+    def scoring_context(self, n_seq):
+        """Context riêng cho score, đủ `n_seq` sequence dùng chung KV cache (tạo lại nếu thiếu)
+
+        Llama chỉ có 1 sequence và API công khai chỉ trả logits của token cuối (trừ khi bật
+        logits_all cho cả context), nên score dùng thẳng API C của llama_cpp trên 1 context
+        thứ 2 của cùng model: sequence 0 giữ prompt, mỗi candidate 1 sequence copy từ đó.
+        """
+        import llama_cpp
+        if self.scorer is None or self.scorer_seqs < n_seq:
+            if self.scorer is not None:
+                llama_cpp.llama_free(self.scorer)
+            params = llama_cpp.llama_context_params.from_buffer_copy(self.llm.context_params)
+            params.n_seq_max = n_seq
+            params.kv_unified = True  # các sequence dùng chung ô KV của prompt, không chia n_ctx
+            params.n_batch = params.n_ubatch = params.n_ctx
+            self.scorer = llama_cpp.llama_init_from_model(self.llm.model, params)
+            if not self.scorer:
+                raise RuntimeError(f"Không tạo được context llama.cpp cho {n_seq} sequence")
+            self.scorer_seqs = n_seq
+            self.scored_prompt = []
+        return self.scorer
+
+    def decode(self, ctx, rows):
+        """Decode 1 batch (token, pos, seq_id, cần logits); trả về logits của các dòng cần logits"""
+        import llama_cpp
+        import numpy as np
+        batch = llama_cpp.llama_batch_init(len(rows), 0, 1)
+        try:
+            for i, (token, pos, seq_id, logits) in enumerate(rows):
+                batch.token[i] = token
+                batch.pos[i] = pos
+                batch.n_seq_id[i] = 1
+                batch.seq_id[i][0] = seq_id
+                batch.logits[i] = logits
+            batch.n_tokens = len(rows)
+            status = llama_cpp.llama_decode(ctx, batch)
+            if status != 0:
+                raise RuntimeError(f"llama_decode lỗi {status} ({len(rows)} token, n_ctx={self.n_ctx})")
+            outputs = sum(logits for *_, logits in rows)
+            return np.ctypeslib.as_array(llama_cpp.llama_get_logits(ctx), shape=(outputs, self.llm.n_vocab())).copy()
+        finally:
+            llama_cpp.llama_batch_free(batch)
+
+    def score(self, prompt, candidates, template=None):
+        """2 lần decode cho mọi candidate: phần prompt khác lần gọi trước, rồi mọi candidate trong 1 batch
+
+        Mỗi candidate là 1 sequence riêng copy KV của prompt (không tốn thêm ô KV), logits
+        sau prompt dự đoán token đầu, logits sau token i dự đoán token i + 1.
+        """
+        self.load()
+        import llama_cpp
+        import numpy as np
+
+        def log_probs(logits, tokens):
+            peak = logits.max(axis=-1, keepdims=True)
+            normalized = logits - peak - np.log(np.exp(logits - peak).sum(axis=-1, keepdims=True))
+            return normalized[np.arange(len(tokens)), tokens]
+
+        ctx = self.scoring_context(len(candidates) + 1)
+        memory = llama_cpp.llama_get_memory(ctx)
+        prompt_tokens = self.llm.tokenize(self.chat_text(prompt).encode('utf-8'), add_bos=True, special=True)
+        # Giữ phần đầu trùng với prompt trước trong sequence 0 (token cuối luôn decode lại để có logits)
+        common = 0
+        for old, new in zip(self.scored_prompt, prompt_tokens[:-1]):
+            if old != new:
+                break
+            common += 1
+        llama_cpp.llama_memory_seq_rm(memory, 0, common, -1)
+        self.scored_prompt = prompt_tokens[:common]
+        prompt_logits = self.decode(ctx, [(token, pos, 0, pos == len(prompt_tokens) - 1)
+                                          for pos, token in enumerate(prompt_tokens[common:], common)])[0]
+        self.scored_prompt = prompt_tokens
+
+        candidate_ids = [self.llm.tokenize(candidate.encode('utf-8'), add_bos=False, special=True)
+                         + [self.llm.token_eos()] for candidate in candidates]
+        rows = []
+        for seq_id, ids in enumerate(candidate_ids, 1):
+            llama_cpp.llama_memory_seq_cp(memory, 0, seq_id, -1, -1)
+            rows += [(token, pos, seq_id, True) for pos, token in enumerate(ids[:-1], len(prompt_tokens))]
+        try:
+            logits = self.decode(ctx, rows) if rows else np.empty((0, self.llm.n_vocab()), dtype=np.float32)
+        finally:
+            for seq_id in range(1, len(candidates) + 1):
+                llama_cpp.llama_memory_seq_rm(memory, seq_id, -1, -1)
+
+        scores = []
+        start = 0
+        for ids in candidate_ids:
+            end = start + len(ids) - 1
+            scores.append(float(log_probs(np.vstack([prompt_logits[None, :], logits[start:end]]), ids).sum()))
+            start = end
+        return scores
+
+
+class StubBackend:
+    """Backend giả, tất định, không load model
+
+    generate trả về dòng cuối của prompt (dòng chứa tên nguyên liệu), score là hash của
+    (prompt, candidate). Đủ để chạy thử bước 5, 6 và kiểm tra cache/shard/checkpoint.
+    """
+    name = 'stub'
+    cache_id = 'stub'
+
+    def __init__(self, model_name=None):
+        self.model_name = model_name
+
+    def load(self):
+        pass
+
+    def generate(self, prompts, template=None, **gen_kwargs):
+        return [prompt.strip().splitlines()[-1].strip() for prompt in prompts]
+
+    def score(self, prompt, candidates, template=None):
+        return [-(zlib.crc32(f"{prompt}\x00{candidate}".encode('utf-8')) % 10000) / 1000 for candidate in candidates]
+
+
+def make_backend(name, model_name, prefix_reuse=True, threads=None):
+    """Tạo backend (chưa load model)"""
+    if name == 'transformers':
+        return TransformersBackend(model_name, prefix_reuse)
+    if name == 'gguf':
+        if not (model_name.endswith('.gguf') or ':' in model_name):
+            raise ValueError(f"--backend gguf cần --model là file .gguf hoặc repo_id:filename, nhận được {model_name}")
+        return GGUFBackend(model_name, threads)
+    if name == 'stub':
+        return StubBackend(model_name)
+    raise ValueError(f"Backend không hỗ trợ: {name}")
+
+
+def add_backend_arguments(parser, default_model):
+    """Các option CLI dùng chung cho bước 5 và 6"""
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help=f"Cách chạy model (default: {DEFAULT_BACKEND})")
+    parser.add_argument("--model", default=default_model,
+                        help=f"Model HF, thư mục local, hoặc file .gguf / repo:file với --backend gguf "
+                             f"(default: {default_model})")
+    parser.add_argument("--threads", type=int, help="Số thread CPU cho --backend gguf (default: số core)")
+    parser.add_argument("--no-prefix-reuse", action="store_true",
+                        help="Encode lại cả prompt cho từng nguyên liệu thay vì dùng lại KV cache của phần đầu cố định")
+
+
+def backend_from_args(args):
+    return make_backend(args.backend, args.model, not args.no_prefix_reuse, args.threads)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Cache kết quả LLM trên đĩa (SQLite) dùng chung cho bước 5 và 6
+
+Key = (model, template, version của template, tham số generate, input). Đổi prompt thì
+tăng version của template đó, các kết quả cũ tự động không được dùng nữa và có thể xoá
+bằng --invalidate. SQLite ở chế độ WAL nên nhiều process worker đọc/ghi cùng lúc được.
+
+Usage:
+    python llm_cache.py --stats
+    python llm_cache.py --invalidate translate --keep-version 2
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_PATH = "data/llm_cache.sqlite"
+
+
+class LLMCache:
+    """Cache output của model theo prompt"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._pid = None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                template TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                input TEXT NOT NULL,
+                output TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._connect().execute("CREATE INDEX IF NOT EXISTS results_template ON results(template, version)")
+
+    def _connect(self):
+        """Mỗi process 1 connection riêng (connection SQLite không dùng chung qua fork được)"""
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._pid = os.getpid()
+        return self._conn
+
+    def __getstate__(self):
+        # Gửi sang process khác chỉ cần path, connection sẽ mở lại ở đó
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_pid'] = None
+        return state
+
+    @staticmethod
+    def make_key(model, template, version, params, text):
+        raw = json.dumps([model, template, version, params, text], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get_many(self, model, template, version, params, inputs):
+        """input -> output cho các input đã có trong cache"""
+        keys = {self.make_key(model, template, version, params, text): text for text in inputs}
+        found = {}
+        key_list = list(keys)
+        for start in range(0, len(key_list), 500):
+            chunk = key_list[start:start + 500]
+            rows = self._connect().execute(
+                f"SELECT key, output FROM results WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for key, output in rows:
+                found[keys[key]] = json.loads(output)
+        return found
+
+    def put_many(self, model, template, version, params, items):
+        """Lưu các cặp (input, output)"""
+        now = time.time()
+        rows = [
+            (self.make_key(model, template, version, params, text), model, template, version,
+             text, json.dumps(output, ensure_ascii=False), now)
+            for text, output in items
+        ]
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def cached(self, model, template, version, params, inputs, compute):
+        """Lấy output cho `inputs`, chỉ gọi compute(list input) cho các input chưa có trong cache"""
+        found = self.get_many(model, template, version, params, inputs)
+        hits = sum(1 for text in inputs if text in found)
+        self.hits += hits
+        self.misses += len(inputs) - hits
+        missing = list(dict.fromkeys(text for text in inputs if text not in found))
+        if missing:
+            outputs = compute(missing)
+            self.put_many(model, template, version, params, zip(missing, outputs))
+            found.update(zip(missing, outputs))
+        return [found[text] for text in inputs]
+
+    def invalidate(self, template, keep_version=None):
+        """Xoá kết quả của template (trừ version keep_version nếu có), trả về số dòng bị xoá"""
+        if keep_version is None:
+            cursor = self._connect().execute("DELETE FROM results WHERE template = ?", (template,))
+        else:
+            cursor = self._connect().execute(
+                "DELETE FROM results WHERE template = ? AND version != ?", (template, keep_version)
+            )
+        return cursor.rowcount
+
+    def table_stats(self):
+        """Số kết quả theo (model, template, version)"""
+        return self._connect().execute(
+            "SELECT model, template, version, COUNT(*) FROM results GROUP BY model, template, version"
+        ).fetchall()
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"LLM cache: {self.hits} hit, {self.misses} miss ({rate:.1%} hit)"
+
+
+def add_llm_cache_arguments(parser):
+    """Các option CLI dùng chung cho bước 5 và 6"""
+    parser.add_argument("--llm-cache", default=DEFAULT_PATH, help=f"File cache kết quả LLM (default: {DEFAULT_PATH})")
+    parser.add_argument("--no-llm-cache", action="store_true", help="Không dùng cache kết quả LLM")
+
+
+def llm_cache_from_args(args):
+    return None if args.no_llm_cache else LLMCache(args.llm_cache)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xem / xoá cache kết quả LLM")
+    parser.add_argument("--path", default=DEFAULT_PATH, help=f"File cache (default: {DEFAULT_PATH})")
+    parser.add_argument("--stats", action="store_true", help="In số kết quả theo model/template/version")
+    parser.add_argument("--invalidate", metavar="TEMPLATE", help="Xoá kết quả của template này")
+    parser.add_argument("--keep-version", type=int, help="Khi --invalidate: giữ lại version này")
+    args = parser.parse_args()
+
+    cache = LLMCache(args.path)
+    if args.invalidate:
+        removed = cache.invalidate(args.invalidate, args.keep_version)
+        print(f"Đã xoá {removed} kết quả của template {args.invalidate}")
+    if args.stats or not args.invalidate:
+        for model, template, version, count in cache.table_stats():
+            print(f"{model:<40}{template:<20}v{version:<5}{count:>8}")
+
+
+if __name__ == "__main__":
+    main()
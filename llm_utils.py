@@ -0,0 +1,166 @@
+"""
+Tiện ích chạy model Qwen (transformers) dùng chung cho bước 5 và 6
+"""
+import copy
+
+from transformers import AutoTokenizer, AutoModelForCausalLM, DynamicCache
+import torch
+import torch.nn.functional as F
+
+
+def load_model(model_name):
+    """Load tokenizer + model; GPU thì float16, CPU thì float32"""
+    print(f"Loading {model_name}...")
+    # Left padding để các prompt trong 1 batch cùng kết thúc ở 1 vị trí
+    tokenizer = AutoTokenizer.from_pretrained(model_name, padding_side="left")
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        device_map="auto",
+        dtype=torch.float16 if torch.cuda.is_available() else torch.float32
+    )
+    model.eval()
+    print("Model loaded.\n")
+    return tokenizer, model
+
+
+def chat_text(tokenizer, prompt):
+    """Bọc prompt bằng chat template của model"""
+    messages = [{"role": "user", "content": prompt}]
+    return tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+
+
+class PromptPrefix:
+    """KV cache của phần đầu cố định của 1 prompt template (few-shot, danh sách category, ...)
+
+    Template là hàm prompt(name). Prefix = chat text tính đến hết dòng cuối cùng trước
+    chỗ điền name; cắt ở đầu dòng nên token hoá prefix và phần còn lại riêng rẽ cho cùng
+    kết quả như token hoá cả câu. Prefix chỉ được encode 1 lần, mỗi item chỉ còn phải
+    prefill vài token của dòng cuối.
+    """
+    PLACEHOLDER = "\x00NAME\x00"
+
+    def __init__(self, tokenizer, model, prompt_fn):
+        text = chat_text(tokenizer, prompt_fn(self.PLACEHOLDER))
+        self.text = text[:text.rfind('\n', 0, text.index(self.PLACEHOLDER)) + 1]
+        self.input_ids = tokenizer(self.text, return_tensors="pt").input_ids.to(model.device)
+
+        # Tokenizer khác có thể gộp token qua chỗ cắt: khi đó không dùng prefix (suffix() trả None)
+        sample = chat_text(tokenizer, prompt_fn("cà chua"))
+        sample_suffix = tokenizer(sample[len(self.text):], add_special_tokens=False).input_ids
+        self.exact = tokenizer(sample).input_ids == self.input_ids[0].tolist() + sample_suffix
+        with torch.no_grad():
+            out = model(self.input_ids, past_key_values=DynamicCache(), use_cache=True)
+        self.past_key_values = out.past_key_values
+
+    def __len__(self):
+        return self.input_ids.shape[1]
+
+    def suffix(self, text):
+        """Phần chat text sau prefix, None nếu text không bắt đầu bằng prefix"""
+        return text[len(self.text):] if self.exact and text.startswith(self.text) else None
+
+    def cache_for(self, n):
+        """Bản copy của KV cache prefix cho batch n (generate ghi thêm vào cache)"""
+        return expand_cache(copy.deepcopy(self.past_key_values), n)
+
+
+def generate(tokenizer, model, prompts, prefix=None, **gen_kwargs):
+    """1 lần model.generate cho cả batch prompt, trả về phần text sinh thêm của từng prompt
+
+    prefix: PromptPrefix của template sinh ra các prompt; có thì dùng lại KV cache của nó.
+    """
+    texts = [chat_text(tokenizer, prompt) for prompt in prompts]
+    if prefix is not None:
+        suffixes = [prefix.suffix(text) for text in texts]
+        if all(suffix is not None for suffix in suffixes):
+            return generate_with_prefix(tokenizer, model, prefix, suffixes, **gen_kwargs)
+    inputs = tokenizer(texts, return_tensors="pt", padding=True).to(model.device)
+
+    with torch.no_grad():
+        outputs = model.generate(**inputs, pad_token_id=tokenizer.pad_token_id, **gen_kwargs)
+
+    # Left padding: phần sinh thêm của mọi dòng bắt đầu cùng 1 vị trí
+    new_tokens = outputs[:, inputs.input_ids.shape[1]:]
+    return [tokenizer.decode(tokens, skip_special_tokens=True) for tokens in new_tokens]
+
+
+def generate_with_prefix(tokenizer, model, prefix, suffixes, **gen_kwargs):
+    """Như generate, nhưng chỉ prefill phần suffix của từng prompt trên KV cache của prefix
+
+    Padding nằm giữa prefix và suffix (attention_mask = 0) để prefix của mọi dòng cùng
+    vị trí với cache; position_ids được generate tính từ attention_mask nên không bị lệch.
+    """
+    suffix_ids = [tokenizer(suffix, add_special_tokens=False).input_ids for suffix in suffixes]
+    n = len(suffixes)
+    prefix_len = len(prefix)
+    total_len = prefix_len + max(len(ids) for ids in suffix_ids)
+    input_ids = torch.full((n, total_len), tokenizer.pad_token_id, dtype=torch.long, device=model.device)
+    attention_mask = torch.zeros((n, total_len), dtype=torch.long, device=model.device)
+    input_ids[:, :prefix_len] = prefix.input_ids
+    attention_mask[:, :prefix_len] = 1
+    for i, ids in enumerate(suffix_ids):
+        input_ids[i, total_len - len(ids):] = torch.tensor(ids, device=model.device)
+        attention_mask[i, total_len - len(ids):] = 1
+
+    with torch.no_grad():
+        outputs = model.generate(input_ids=input_ids, attention_mask=attention_mask,
+                                 past_key_values=prefix.cache_for(n),
+                                 pad_token_id=tokenizer.pad_token_id, **gen_kwargs)
+
+    return [tokenizer.decode(tokens, skip_special_tokens=True) for tokens in outputs[:, total_len:]]
+
+
+def expand_cache(past_key_values, n):
+    """Nhân KV cache batch 1 thành batch n"""
+    if hasattr(past_key_values, 'batch_repeat_interleave'):
+        past_key_values.batch_repeat_interleave(n)
+        return past_key_values
+    return tuple(tuple(t.expand(n, *t.shape[1:]) for t in layer) for layer in past_key_values)
+
+
+def encode_prompt(tokenizer, model, prompt, prefix=None):
+    """1 forward cho prompt, trả về (output, số token của prompt); có prefix thì chỉ forward phần suffix"""
+    text = chat_text(tokenizer, prompt)
+    suffix = prefix.suffix(text) if prefix is not None else None
+    with torch.no_grad():
+        if suffix is None:
+            ids = tokenizer(text, return_tensors="pt").input_ids.to(model.device)
+            return model(ids, use_cache=True), ids.shape[1]
+        ids = tokenizer(suffix, return_tensors="pt", add_special_tokens=False).input_ids.to(model.device)
+        return model(ids, past_key_values=prefix.cache_for(1), use_cache=True), len(prefix) + ids.shape[1]
+
+
+def score_continuations(tokenizer, model, prompt, candidates, prefix=None):
+    """Log-likelihood của từng candidate khi trả lời `prompt`
+
+    1 forward cho prompt (lấy KV cache), rồi 1 forward cho cả batch candidate dùng chung
+    cache đó. Mỗi candidate được nối thêm eos để tính xác suất của cả câu trả lời.
+    Trả về list tổng log-prob theo thứ tự candidates.
+    """
+    prompt_out, prompt_len = encode_prompt(tokenizer, model, prompt, prefix)
+    eos = tokenizer.eos_token or ''
+    candidate_ids = [tokenizer(c + eos, add_special_tokens=False).input_ids for c in candidates]
+
+    n = len(candidates)
+    max_len = max(len(ids) for ids in candidate_ids)
+    input_ids = torch.full((n, max_len), tokenizer.pad_token_id, dtype=torch.long, device=model.device)
+    attention_mask = torch.zeros((n, prompt_len + max_len), dtype=torch.long, device=model.device)
+    attention_mask[:, :prompt_len] = 1
+    for i, ids in enumerate(candidate_ids):
+        input_ids[i, :len(ids)] = torch.tensor(ids, device=model.device)
+        attention_mask[i, prompt_len:prompt_len + len(ids)] = 1
+    position_ids = torch.arange(prompt_len, prompt_len + max_len, device=model.device).expand(n, -1)
+
+    with torch.no_grad():
+        past = expand_cache(prompt_out.past_key_values, n)
+        out = model(input_ids, attention_mask=attention_mask, position_ids=position_ids,
+                    past_key_values=past, use_cache=True)
+
+    # Token thứ j của candidate được dự đoán bởi logits ở vị trí j-1 (token 0 do prompt dự đoán)
+    logits = torch.cat([prompt_out.logits[:, -1:].expand(n, -1, -1), out.logits[:, :-1]], dim=1)
+    log_probs = F.log_softmax(logits.float(), dim=-1)
+    token_log_probs = log_probs.gather(-1, input_ids.unsqueeze(-1)).squeeze(-1)
+    mask = attention_mask[:, prompt_len:].to(token_log_probs.dtype)
+    return (token_log_probs * mask).sum(dim=1).tolist()
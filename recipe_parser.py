@@ -0,0 +1,194 @@
+"""
+Parse bài viết công thức của dienmayxanh (div.staple) thành recipe
+
+- parse_recipe_reference: cách cũ, dựng cây BeautifulSoup của cả trang
+- parse_recipe: chỉ parse đoạn HTML của div.staple (cắt thẳng từ bytes, hoặc
+  SoupStrainer nếu không cắt được), cho ra kết quả giống hệt bản reference. Khi cắt, nội
+  dung <script>, <style> và comment được bỏ qua (html.parser không coi "</div>" trong đó
+  là thẻ); encoding của trang được dò trên cả trang giống bản reference
+- parse_pages: parse nhiều trang song song bằng process pool (re-parse cache HTML)
+"""
+import codecs
+import hashlib
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from itertools import islice
+
+from bs4 import BeautifulSoup, SoupStrainer, UnicodeDammit
+
+# Thẻ mở <div ... class="... staple ...">
+STAPLE_OPEN_RE = re.compile(
+    rb'<div\b[^>]*\bclass\s*=\s*(?:"[^"]*(?<![\w-])staple(?![\w-])[^"]*"'
+    rb"|'[^']*(?<![\w-])staple(?![\w-])[^']*')[^>]*>",
+    re.IGNORECASE
+)
+# Thẻ mà html.parser đọc nội dung như text thô (script, style; bản Python mới có thêm vài thẻ)
+RAW_TEXT_TAGS = HTMLParser.CDATA_CONTENT_ELEMENTS + getattr(HTMLParser, 'RCDATA_CONTENT_ELEMENTS', ())
+# Comment / thẻ text thô (bỏ qua cả khối) và các thẻ div để đếm độ sâu
+DIV_TAG_RE = re.compile(
+    rb'(?P<skip><!--.*?-->|<(?P<raw>' + '|'.join(RAW_TEXT_TAGS).encode() + rb')\b.*?</(?P=raw)\s*>)'
+    rb'|<(?P<close>/?)div\b[^>]*>',
+    re.IGNORECASE | re.DOTALL
+)
+STAPLE_STRAINER = SoupStrainer('div', class_='staple')
+
+def parse_dish_name_and_servings(h2_tag):
+    """Lấy dish_name và servings từ h2 tag"""
+    # Lấy text trực tiếp của h2 (không bao gồm children)
+    dish_name = h2_tag.find(text=True, recursive=False)
+    if dish_name:
+        dish_name = dish_name.strip()
+        # Bỏ "Nguyên liệu làm"
+        dish_name = re.sub(r'^Nguyên\s+liệu\s+làm\s+', '', dish_name, flags=re.IGNORECASE).strip()
+    else:
+        dish_name = ""
+    
+    # Lấy servings từ small tag
+    servings = None
+    small = h2_tag.find('small')
+    if small:
+        match = re.search(r'(\d+)', small.text)
+        if match:
+            servings = int(match.group(1))
+    
+    return dish_name, servings
+
+def parse_quantity_unit(amount_text):
+    """Tách quantity và unit từ text"""
+    if not amount_text:
+        return None, None
+    
+    amount_text = amount_text.strip()
+    
+    # "500 gram" -> 500, "gram"
+    match = re.match(r'^(\d+(?:[.,]\d+)?)\s+(.+)$', amount_text)
+    if match:
+        return float(match.group(1).replace(',', '.')), match.group(2).strip()
+    
+    # "1/2 kg" -> 0.5, "kg"
+    match = re.match(r'^(\d+)/(\d+)\s+(.+)$', amount_text)
+    if match:
+        return float(match.group(1)) / float(match.group(2)), match.group(3).strip()
+    
+    # "500" -> 500, None
+    match = re.match(r'^(\d+(?:[.,]\d+)?)$', amount_text)
+    if match:
+        return float(match.group(1).replace(',', '.')), None
+    
+    # "ít" -> None, "ít"
+    return None, amount_text
+
+def parse_staple(staple_div, url):
+    """Parse div.staple thành recipe"""
+    # Parse h2
+    h2 = staple_div.find('h2')
+    dish_name, servings = parse_dish_name_and_servings(h2) if h2 else ("", None)
+    
+    # Parse ingredients
+    ingredients = []
+    for span in staple_div.find_all('span'):
+        # Lấy tên nguyên liệu (text trực tiếp, không bao gồm small và em)
+        ingredient_name_parts = []
+        for text in span.find_all(text=True, recursive=False):
+            ingredient_name_parts.append(text.strip())
+        ingredient_name = ' '.join(ingredient_name_parts).strip()
+        
+        # Lấy quantity từ small
+        small = span.find('small')
+        amount_text = small.text.strip() if small else ""
+        
+        # Parse quantity và unit
+        quantity, unit = parse_quantity_unit(amount_text)
+        
+        if ingredient_name:
+            ingredients.append({
+                'name': ingredient_name,
+                'quantity': quantity,
+                'unit': unit
+            })
+    
+    return {
+        'dish_name': dish_name,
+        'url': url,
+        'servings': servings,
+        'ingredients': ingredients,
+        # Dùng để bỏ các bài trùng nội dung dưới URL khác
+        'content_hash': hashlib.sha1(str(staple_div).encode('utf-8')).hexdigest()
+    }
+
+def parse_recipe_reference(content, url):
+    """Parse HTML của 1 bài viết thành recipe (dựng cây của cả trang)"""
+    soup = BeautifulSoup(content, 'html.parser')
+    
+    staple_div = soup.find('div', class_='staple')
+    if not staple_div:
+        return None
+    
+    return parse_staple(staple_div, url)
+
+def extract_staple_html(content):
+    """Cắt đoạn HTML của div.staple đầu tiên từ bytes, None nếu không cắt được"""
+    start = None
+    depth = 0
+    for tag in DIV_TAG_RE.finditer(content):
+        if tag.group('skip'):
+            continue
+        if start is None:
+            if not tag.group('close') and STAPLE_OPEN_RE.match(tag.group()):
+                start, depth = tag.start(), 1
+            continue
+        depth += -1 if tag.group('close') else 1
+        if depth == 0:
+            return content[start:tag.end()]
+    return None
+
+def page_encoding(content):
+    """Encoding BeautifulSoup chọn cho cả trang (BOM, <meta charset>, utf-8, ...)
+    
+    None nếu encoding không tương thích ASCII (utf-16, ...): không cắt theo byte được.
+    """
+    encoding = UnicodeDammit(content, is_html=True).original_encoding
+    if encoding is None or codecs.lookup(encoding).name.startswith(('utf-16', 'utf-32')):
+        return None
+    return encoding
+
+def parse_recipe(content, url):
+    """Parse HTML của 1 bài viết thành recipe, chỉ dựng cây cho div.staple"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    
+    encoding = page_encoding(content)
+    fragment = extract_staple_html(content) if encoding else None
+    if fragment is not None:
+        # Đoạn cắt ra không còn <meta charset> / BOM: dùng encoding đã dò trên cả trang
+        soup = BeautifulSoup(fragment, 'html.parser', from_encoding=encoding)
+    else:
+        soup = BeautifulSoup(content, 'html.parser', parse_only=STAPLE_STRAINER)
+    
+    staple_div = soup.find('div', class_='staple')
+    if not staple_div:
+        return None
+    
+    return parse_staple(staple_div, url)
+
+def _parse_page(page):
+    content, url = page
+    try:
+        return parse_recipe(content, url)
+    except Exception as e:
+        return e
+
+def parse_pages(pages, workers=None, batch_size=256):
+    """Parse nhiều trang (content, url) bằng process pool, trả kết quả theo đúng thứ tự
+    
+    Trang parse lỗi thì trả về chính exception đó thay vì làm dừng cả pool.
+    Mỗi lần chỉ gửi tối đa `batch_size` trang sang pool để RAM không phụ thuộc số trang.
+    """
+    pages = iter(pages)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = list(islice(pages, batch_size))
+            if not batch:
+                break
+            yield from executor.map(_parse_page, batch, chunksize=16)
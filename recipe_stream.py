@@ -0,0 +1,88 @@
+"""
+Đọc recipes từng bản ghi một, không json.load cả file
+
+- .json: mảng JSON (recipes_detail.json), parse dần bằng JSONDecoder.raw_decode
+- .jsonl: mỗi dòng 1 recipe, hoặc journal của 2-crawl_dish_recipe.py (chỉ lấy status 'ok')
+- .parquet: đọc theo batch (kb_parquet)
+"""
+import json
+
+CHUNK_SIZE = 1 << 16
+
+
+def iter_json_array(path, chunk_size=CHUNK_SIZE):
+    """Yield từng phần tử của mảng JSON ở top-level, RAM chỉ cỡ 1 phần tử + 1 chunk"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+
+        def next_char():
+            """Bỏ khoảng trắng, trả về ký tự tiếp theo ('' nếu hết file)"""
+            nonlocal buffer, pos, eof
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return buffer[pos:pos + 1]
+                buffer, pos = f.read(chunk_size), 0
+                eof = not buffer
+
+        if next_char() != '[':
+            raise ValueError(f"{path}: không phải mảng JSON")
+        pos += 1
+        if next_char() == ']':
+            return
+
+        while True:
+            next_char()
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # Số ở sát cuối buffer có thể còn chữ số trong chunk sau
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                more = f.read(chunk_size)
+                eof = not more
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield item
+            pos = end
+            # Dọn phần đã đọc để buffer không phình theo kích thước file
+            if pos > chunk_size:
+                buffer, pos = buffer[pos:], 0
+
+            char = next_char()
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"{path}: thiếu ',' hoặc ']' giữa các phần tử")
+            pos += 1
+
+
+def iter_jsonl(path):
+    """Yield recipe từ file JSONL (recipe thuần hoặc bản ghi journal)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'status' in record:
+                if record['status'] == 'ok':
+                    yield record['recipe']
+            else:
+                yield record
+
+
+def iter_recipes(path):
+    """Yield từng recipe từ recipes_detail.json, file .jsonl hoặc .parquet"""
+    if str(path).endswith('.jsonl'):
+        return iter_jsonl(path)
+    if str(path).endswith('.parquet'):
+        from kb_parquet import iter_parquet
+        return iter_parquet(path)
+    return iter_json_array(path)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Chạy pipeline 1-7 + split, bỏ qua các bước mà input không đổi
+
+- Mỗi bước khai báo input/output; bước B phụ thuộc bước A nếu B đọc output của A
+- Fingerprint của 1 bước = hash nội dung các file input + hash script + tham số.
+  Fingerprint trùng lần chạy thành công trước và output vẫn còn -> bỏ qua
+- Input tuỳ chọn (optional_inputs): có thể chưa có, nhưng thêm / sửa / xoá đều làm bước chạy lại
+- --dry-run: bước phụ thuộc 1 bước "would run" cũng "would run" (input của nó sẽ đổi)
+- Các bước độc lập (vd. 2 nửa của split_knowledge_base.py) chạy song song
+- Cuối cùng in bảng thời gian từng bước
+
+Usage:
+    python run_pipeline.py                       # chạy các bước có input thay đổi
+    python run_pipeline.py --dry-run             # chỉ xem bước nào sẽ chạy
+    python run_pipeline.py --force ingredients_kb
+    python run_pipeline.py --only extract_names dishes_kb
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = "data/.pipeline_state.json"
+# Từ vựng cho tầng phân loại 1 của bước 6: bản KB đã duyệt, tách khỏi output của chính bước 6
+# (học từ output của chính nó thì sửa nhãn không bao giờ làm bước chạy lại)
+LEXICON_FILE = "data/ingredient_lexicon.json"
+
+
+class Stage:
+    """1 bước của pipeline: script + tham số, các file input và output"""
+    def __init__(self, name, command, inputs, outputs, optional_inputs=()):
+        self.name = name
+        self.command = command
+        self.inputs = inputs
+        self.outputs = outputs
+        self.optional_inputs = list(optional_inputs)
+
+    @property
+    def script(self):
+        return self.command[0]
+
+
+# Bước 1, 2 không có input cục bộ (crawl từ web): chỉ chạy lại khi --force hoặc script đổi
+STAGES = [
+    Stage("crawl_urls", ["1-crawl_dish_urls.py"],
+          inputs=[], outputs=["recipe_urls.csv"]),
+    Stage("crawl_recipes", ["2-crawl_dish_recipe.py", "--async"],
+          inputs=["recipe_urls.csv"], outputs=["data/recipes_detail.json"]),
+    Stage("extract_names", ["3-extract_names.py"],
+          inputs=["data/recipes_detail.json"],
+          outputs=["data/unique_ingredients.json", "data/unique_dishes.json",
+                   "data/ingredient_frequency.json", "data/dish_frequency.json"]),
+    Stage("cluster_ingredients", ["4-cluster_ingredients.py"],
+          inputs=["data/unique_ingredients.json", "data/ingredient_frequency.json"],
+          outputs=["data/ingredient_clusters.json"]),
+    Stage("synonyms", ["5-crawl_synonyms.py", "--output", "data/ingredients_synonyms.json"],
+          inputs=["data/unique_ingredients.json", "data/ingredient_clusters.json"],
+          outputs=["data/ingredients_synonyms.json"]),
+    Stage("ingredients_kb", ["6-build_ingredients_kb.py", "--output", "ingredient_knowledge_base.json",
+                             "--lexicon", LEXICON_FILE],
+          inputs=["data/unique_ingredients.json", "data/ingredients_synonyms.json", "data/ingredient_clusters.json"],
+          optional_inputs=[LEXICON_FILE],
+          outputs=["ingredient_knowledge_base.json"]),
+    Stage("dishes_kb", ["7-build_dishes_kb.py", "--incremental"],
+          inputs=["ingredient_knowledge_base.json", "data/recipes_detail.json"],
+          outputs=["dish_knowledge_base.json", "data/dish_ids.json", "dish_knowledge_base.changelog.jsonl"]),
+    Stage("split_ingredients", ["split_data/split_knowledge_base.py", "--type", "ingredients"],
+          inputs=["ingredient_knowledge_base.json"], outputs=["data/ingredients"]),
+    Stage("split_dishes", ["split_data/split_knowledge_base.py", "--type", "dishes"],
+          inputs=["dish_knowledge_base.json"], outputs=["data/dishes"]),
+]
+
+
+# ===== Hash & state =====
+class FileHasher:
+    """sha256 nội dung file, nhớ theo (size, mtime) để không hash lại file lớn không đổi"""
+    def __init__(self, known):
+        self.known = known
+        self.lock = threading.Lock()
+
+    def hash(self, path):
+        full_path = os.path.join(ROOT, path)
+        if not os.path.isfile(full_path):
+            return None
+        stat = os.stat(full_path)
+        with self.lock:
+            entry = self.known.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+
+        digest = hashlib.sha256()
+        with open(full_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        with self.lock:
+            self.known[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+        return digest.hexdigest()
+
+
+def load_state(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'stages': {}, 'files': {}}
+
+
+def save_state(state, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def fingerprint(stage, hasher):
+    """Hash của script + tham số + nội dung các input; None nếu thiếu input"""
+    parts = {'command': stage.command, 'script': hasher.hash(stage.script), 'inputs': {}}
+    for path in stage.inputs:
+        digest = hasher.hash(path)
+        if digest is None:
+            return None
+        parts['inputs'][path] = digest
+    for path in stage.optional_inputs:
+        parts['inputs'][path] = hasher.hash(path)
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+# ===== Chạy =====
+def dependencies(stages):
+    """stage name -> tên các bước sinh ra input của nó"""
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    return {
+        stage.name: {producers[path] for path in stage.inputs + stage.optional_inputs if path in producers} - {stage.name}
+        for stage in stages
+    }
+
+
+def run_stage(stage):
+    """Chạy script, in output với prefix tên bước; trả về returncode"""
+    process = subprocess.Popen(
+        [sys.executable, *stage.command], cwd=ROOT,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace'
+    )
+    for line in process.stdout:
+        print(f"[{stage.name}] {line}", end='', flush=True)
+    return process.wait()
+
+
+def run_pipeline(stages, state, state_path, force, dry_run, workers):
+    deps = dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    hasher = FileHasher(state.setdefault('files', {}))
+    state_lock = threading.Lock()
+    results = {}  # name -> (status, seconds)
+
+    def execute(stage):
+        if dry_run and any(results[dep][0] == 'would run' for dep in deps[stage.name]):
+            # Fingerprint tính trên file hiện tại, nhưng bước trước sẽ ghi lại input của bước này
+            return 'would run', 0.0
+        digest = fingerprint(stage, hasher)
+        previous = state['stages'].get(stage.name, {})
+        outputs_exist = all(os.path.exists(os.path.join(ROOT, p)) for p in stage.outputs)
+        if digest is None:
+            missing = [p for p in stage.inputs if hasher.hash(p) is None]
+            print(f"[{stage.name}] thiếu input: {', '.join(missing)}")
+            return 'failed', 0.0
+        if stage.name not in force and previous.get('fingerprint') == digest and outputs_exist:
+            return 'skipped', 0.0
+        if dry_run:
+            return 'would run', 0.0
+
+        print(f"[{stage.name}] bắt đầu: python {' '.join(stage.command)}")
+        start = time.perf_counter()
+        returncode = run_stage(stage)
+        elapsed = time.perf_counter() - start
+        if returncode != 0:
+            print(f"[{stage.name}] lỗi (exit {returncode})")
+            return 'failed', elapsed
+
+        # Hash output ngay để bước sau dùng lại, và lưu fingerprint của lần chạy thành công
+        for path in stage.outputs:
+            hasher.hash(path)
+        with state_lock:
+            state['stages'][stage.name] = {'fingerprint': digest, 'seconds': round(elapsed, 2),
+                                           'finished_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+            save_state(state, state_path)
+        return 'ran', elapsed
+
+    pending = set(by_name)
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            for name in sorted(pending):
+                # Bước trước lỗi -> không chạy các bước phụ thuộc
+                if any(results.get(dep, ('',))[0] in ('failed', 'blocked') for dep in deps[name]):
+                    results[name] = ('blocked', 0.0)
+                    pending.discard(name)
+                elif all(dep in results for dep in deps[name]):
+                    running[executor.submit(execute, by_name[name])] = name
+                    pending.discard(name)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    return results
+
+
+def print_summary(stages, results, total):
+    print("\n" + "=" * 50)
+    print(f"{'Bước':<20}{'Trạng thái':<14}{'Thời gian':>12}")
+    print("-" * 50)
+    for stage in stages:
+        status, seconds = results[stage.name]
+        print(f"{stage.name:<20}{status:<14}{seconds:>11.1f}s")
+    print("-" * 50)
+    print(f"{'Tổng (wall clock)':<34}{total:>11.1f}s")
+    print("=" * 50)
+
+
+def main():
+    names = [stage.name for stage in STAGES]
+    parser = argparse.ArgumentParser(description="Chạy pipeline, bỏ qua các bước có input không đổi")
+    parser.add_argument("--only", nargs='+', choices=names, help="Chỉ xét các bước này")
+    parser.add_argument("--force", nargs='+', choices=names, default=[], help="Luôn chạy lại các bước này")
+    parser.add_argument("--force-all", action="store_true", help="Chạy lại tất cả các bước")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ in bước nào sẽ chạy")
+    parser.add_argument("--workers", type=int, default=2, help="Số bước chạy song song tối đa (default: 2)")
+    parser.add_argument("--state", default=STATE_FILE, help=f"File lưu hash giữa các lần chạy (default: {STATE_FILE})")
+    args = parser.parse_args()
+
+    stages = [stage for stage in STAGES if not args.only or stage.name in args.only]
+    force = set(names) if args.force_all else set(args.force)
+    state_path = os.path.join(ROOT, args.state)
+    state = load_state(state_path)
+
+    start = time.perf_counter()
+    results = run_pipeline(stages, state, state_path, force, args.dry_run, args.workers)
+    print_summary(stages, results, time.perf_counter() - start)
+
+    save_state(state, state_path)
+    return 1 if any(status in ('failed', 'blocked') for status, _ in results.values()) else 0
+
+
+if __name__ == "__main__":
+    exit(main())
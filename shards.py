@@ -0,0 +1,106 @@
+"""
+Chia unique_ingredients.json thành N shard cho bước 5 và 6
+
+- `--shard i/N` (i từ 0 đến N-1): chỉ xử lý cụm tên thứ k (bước 4, theo thứ tự xuất hiện
+  trong input) với k % N == i, ghi ra file riêng của shard (vd.
+  ingredients_synonyms.shard-0-of-4.json). Mọi tên của 1 cụm nằm trong cùng 1 shard nên LLM
+  chỉ chạy 1 lần cho mỗi cụm. Chạy được trên nhiều máy, sau đó gộp bằng `--merge N`
+- `--workers N`: tự chạy N process con `--shard 0/N` .. `--shard N-1/N` trên máy này
+  (mỗi process load model riêng, chia đều số thread CPU) rồi gộp kết quả
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+def shard_spec(value):
+    """argparse type cho `--shard i/N`"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"--shard phải có dạng i/N, nhận được {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"--shard {value}: cần 0 <= i < N")
+    return index, count
+
+
+def add_shard_arguments(parser):
+    """Các option CLI dùng chung cho bước 5 và 6"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--shard", type=shard_spec, metavar="i/N", help="Chỉ xử lý shard i trong N shard (i từ 0)")
+    group.add_argument("--workers", type=int, default=1,
+                       help="Chạy N process, mỗi process 1 shard, rồi gộp kết quả (default: 1)")
+    group.add_argument("--merge", type=int, metavar="N", help="Chỉ gộp output của N shard đã chạy xong")
+
+
+def select_shard(items, shard):
+    """Các phần tử của shard (index, count); shard None thì lấy hết
+
+    Bước 5, 6 truyền vào các cụm (group_by_canonical), không phải từng tên: chia theo tên
+    thì các tên của 1 cụm rơi vào các shard khác nhau và mỗi shard gọi LLM riêng cho cụm đó.
+    """
+    if shard is None:
+        return list(items)
+    index, count = shard
+    return [item for position, item in enumerate(items) if position % count == index]
+
+
+def shard_path(path, shard):
+    """data/x.json -> data/x.shard-0-of-4.json"""
+    if shard is None:
+        return path
+    base, ext = os.path.splitext(path)
+    index, count = shard
+    return f"{base}.shard-{index}-of-{count}{ext}"
+
+
+def worker_argv(argv, index, count):
+    """argv của process con: bỏ --workers, thêm --shard i/N"""
+    child = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg == '--workers':
+            skip = True
+        elif not arg.startswith('--workers='):
+            child.append(arg)
+    return child + ['--shard', f"{index}/{count}"]
+
+
+def run_workers(script, argv, count):
+    """Chạy `count` process con của script, mỗi process 1 shard; trả về list shard bị lỗi"""
+    env = os.environ.copy()
+    # Tránh N process cùng dùng hết các core: chia đều số thread của torch
+    env.setdefault('OMP_NUM_THREADS', str(max(1, (os.cpu_count() or 1) // count)))
+    processes = [
+        subprocess.Popen([sys.executable, script, *worker_argv(argv, index, count)], env=env)
+        for index in range(count)
+    ]
+    return [index for index, process in enumerate(processes) if process.wait() != 0]
+
+
+def load_shards(path, count):
+    """Đọc output (list JSON) của N shard theo thứ tự shard"""
+    outputs = []
+    for index in range(count):
+        with open(shard_path(path, (index, count)), 'r', encoding='utf-8') as f:
+            outputs.append(json.load(f))
+    return outputs
+
+
+def merge_in_order(outputs, keys, key):
+    """Ghép output của các shard theo thứ tự `keys` của input; key(record) -> key của record"""
+    by_key = {key(record): record for output in outputs for record in output}
+    missing = [k for k in keys if k not in by_key]
+    if missing:
+        raise ValueError(f"{len(missing)} phần tử không có trong output của shard nào (vd. {missing[0]!r}), "
+                         f"shard nào đó chưa chạy xong?")
+    return [by_key[k] for k in keys]
+
+
+def remove_shards(path, count):
+    for index in range(count):
+        os.remove(shard_path(path, (index, count)))
@@ -0,0 +1,6 @@
+"""
+Scripts that split the knowledge bases into per-id files or bundles
+
+The scripts are run from this directory (python3 split_knowledge_base.py); kb_bundle is also
+imported by the root modules as split_data.kb_bundle (see kb_access.py).
+"""
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Packed bundle layout for knowledge base items (alternative to one JSON file per id)
+
+A bundle directory contains:
+- shard-<generation>-000.jsonl, ...: one compact JSON record per line
+- index.bin: the generation, then fixed-width entries (id, shard, offset, length) sorted by id
+
+Rewriting a bundle writes shards of a new generation, swaps index.bin in with os.replace
+and only then deletes the shards of older generations. BundleReader mmaps the index and
+all the shards of its generation when it opens, so a reader keeps seeing the bundle it
+opened (unlinked files stay readable while mapped). It finds an id by binary search over
+the index entries and parses only the bytes of that record.
+
+Usage:
+    with BundleReader("data/ingredients.bundle") as bundle:
+        item = bundle.get("ingre00001")
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+
+INDEX_FILE = "index.bin"
+MAGIC = b"KBB2"
+# magic, id width, entry count, shard count, generation
+HEADER = struct.Struct("<4sHIHQ")
+# shard, offset, length (the id bytes come first, padded with NUL to the id width)
+LOCATION = struct.Struct("<HQI")
+
+
+def shard_name(generation, shard):
+    return f"shard-{generation:016x}-{shard:03d}.jsonl"
+
+
+def write_bundle(items, output_dir, shards=4):
+    """
+    Write items into `shards` shard files (contiguous runs, in input order) and the index
+
+    Args:
+        items (list): Records with an "id" field
+        output_dir (str): Bundle directory (created if missing, an existing bundle is replaced)
+        shards (int): Number of shard files
+
+    Returns:
+        int: Number of records written
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    generation = time.time_ns()
+
+    items = [item for item in items if item.get("id")]
+    per_shard = max(1, -(-len(items) // max(1, shards)))
+    # Every shard gets at least one record (an empty file cannot be mmapped)
+    shards = max(1, -(-len(items) // per_shard))
+
+    entries = []
+    for shard in range(shards):
+        with open(output_path / shard_name(generation, shard), "wb") as f:
+            for item in items[shard * per_shard:(shard + 1) * per_shard]:
+                line = json.dumps(item, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+                entries.append((item["id"].encode("utf-8"), shard, f.tell(), len(line) - 1))
+                f.write(line)
+
+    entries.sort()
+    width = max((len(key) for key, *_ in entries), default=0)
+    # Write the index last and rename it into place: a reader never sees a half-written index,
+    # and an index always points at shards of its own generation
+    tmp_path = output_path / f"{INDEX_FILE}.{generation:016x}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, width, len(entries), shards, generation))
+        for key, shard, offset, length in entries:
+            f.write(key.ljust(width, b"\0") + LOCATION.pack(shard, offset, length))
+    os.replace(tmp_path, output_path / INDEX_FILE)
+
+    current = {shard_name(generation, shard) for shard in range(shards)}
+    for old in output_path.glob("shard-*.jsonl"):
+        if old.name not in current:
+            old.unlink(missing_ok=True)
+    return len(entries)
+
+
+class BundleReader:
+    """Read-only random access to a bundle written by write_bundle()"""
+
+    def __init__(self, bundle_dir):
+        self.path = Path(bundle_dir)
+        self._shards = []
+        try:
+            self._open()
+        except FileNotFoundError:
+            # The bundle was rewritten between reading the index and opening its shards
+            self.close()
+            self._open()
+
+    def _open(self):
+        self._index_file = open(self.path / INDEX_FILE, "rb")
+        self.index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.count, shards, self.generation = HEADER.unpack_from(self.index, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path / INDEX_FILE} is not a bundle index")
+        self.entry_size = self.width + LOCATION.size
+        for shard in range(shards):
+            f = open(self.path / shard_name(self.generation, shard), "rb")
+            # An empty shard (empty bundle) cannot be mmapped and is never read
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+            self._shards.append((f, mapped))
+
+    def _key(self, position):
+        start = HEADER.size + position * self.entry_size
+        return self.index[start:start + self.width]
+
+    def _shard(self, shard):
+        return self._shards[shard][1]
+
+    def position(self, item_id):
+        """Position of an id in the sorted index, or None (binary search)"""
+        key = item_id.encode("utf-8")
+        if len(key) > self.width:
+            return None
+        key = key.ljust(self.width, b"\0")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.count or self._key(low) != key:
+            return None
+        return low
+
+    def locate(self, item_id):
+        """(shard, offset, length) of an id, or None"""
+        position = self.position(item_id)
+        if position is None:
+            return None
+        return LOCATION.unpack_from(self.index, HEADER.size + position * self.entry_size + self.width)
+
+    def get_bytes(self, item_id):
+        location = self.locate(item_id)
+        if location is None:
+            return None
+        shard, offset, length = location
+        return self._shard(shard)[offset:offset + length]
+
+    def get(self, item_id):
+        """Record of an id, or None"""
+        data = self.get_bytes(item_id)
+        return None if data is None else json.loads(data)
+
+    def get_at(self, position):
+        """Record at a position of the sorted index (0 <= position < len)"""
+        shard, offset, length = LOCATION.unpack_from(self.index, HEADER.size + position * self.entry_size + self.width)
+        return json.loads(self._shard(shard)[offset:offset + length])
+
+    def ids(self):
+        """All ids in sorted order"""
+        for position in range(self.count):
+            yield self._key(position).rstrip(b"\0").decode("utf-8")
+
+    def __contains__(self, item_id):
+        return self.locate(item_id) is not None
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        for f, mapped in self._shards:
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+            f.close()
+        self._shards = []
+        if getattr(self, "index", None) is not None:
+            self.index.close()
+            self._index_file.close()
+            self.index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
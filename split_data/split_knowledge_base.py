@@ -2,21 +2,61 @@
 """
 Combined script to split both ingredient and dish knowledge bases into separate JSON files
 Each item will be saved as a separate file named with its ID
+
+Re-runs only rewrite items whose content changed (see MANIFEST_FILE) and delete files
+of ids that were removed from the knowledge base.
+
+With --format bundle the items are packed into a few shard files plus a sorted id index
+instead (see kb_bundle.py), e.g. data/ingredients.bundle/
 """
 
+import hashlib
 import json
 import os
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-def split_knowledge_base(input_file, output_dir, item_type):
+from kb_bundle import write_bundle
+
+# sha256 of every <id>.json written by the last run, kept next to the files
+MANIFEST_FILE = ".manifest.json"
+
+def serialize(item):
+    """Exact bytes written to <id>.json"""
+    return json.dumps(item, ensure_ascii=False, indent=2).encode("utf-8")
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def load_manifest(output_path):
+    """id -> sha256 of the file content from the previous run ({} if none)"""
+    try:
+        with open(output_path / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def atomic_write(filepath, data):
+    """Write to a temp file in the same directory, then rename over the target"""
+    tmp_path = filepath.with_name(f".{filepath.name}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, filepath)
+
+def split_knowledge_base(input_file, output_dir, item_type, workers=None):
     """
     Split knowledge base into individual files
     
+    Only new or changed items are written (compared by hash against the manifest of the
+    previous run), in parallel with atomic rename; files of ids no longer in the knowledge
+    base are deleted.
+    
     Args:
         input_file (str): Path to input JSON file
         output_dir (str): Directory to save individual files
         item_type (str): Type of items ('ingredients' or 'dishes')
+        workers (int): Number of writer threads (default: ThreadPoolExecutor default)
     """
     
     # Create output directory
@@ -38,46 +78,112 @@ def split_knowledge_base(input_file, output_dir, item_type):
     
     print(f"Found {len(items)} {item_type} to process")
     
-    # Process each item
-    success_count = 0
+    previous = load_manifest(output_path)
+    manifest = {}
+    current_ids = set()
+    pending = []
+    unchanged_count = 0
     error_count = 0
     
     for idx, item in enumerate(items, 1):
-        try:
-            # Get item ID for filename
-            item_id = item.get("id")
-            
-            if not item_id:
-                print(f"Warning: {item_type[:-1].capitalize()} at index {idx} has no ID, skipping...")
+        # Get item ID for filename
+        item_id = item.get("id")
+        
+        if not item_id:
+            print(f"Warning: {item_type[:-1].capitalize()} at index {idx} has no ID, skipping...")
+            error_count += 1
+            continue
+        
+        current_ids.add(item_id)
+        filepath = output_path / f"{item_id}.json"
+        data = serialize(item)
+        manifest[item_id] = digest(data)
+        
+        # No manifest entry (first run): compare with the file left by an older run
+        old = previous.get(item_id)
+        if old is None and filepath.exists():
+            old = digest(filepath.read_bytes())
+        if old == manifest[item_id] and filepath.exists():
+            unchanged_count += 1
+        else:
+            pending.append((item_id, filepath, data))
+    
+    # Save changed items in parallel
+    success_count = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(atomic_write, filepath, data): item_id for item_id, filepath, data in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            item_id = futures[future]
+            try:
+                future.result()
+                success_count += 1
+            except Exception as e:
+                print(f"Error writing {item_type[:-1]} {item_id}: {e}")
+                # The old file is still on disk: keep describing it, so the next run retries the write
+                if item_id in previous:
+                    manifest[item_id] = previous[item_id]
+                else:
+                    del manifest[item_id]
                 error_count += 1
-                continue
-                
-            # Create filename
-            filename = f"{item_id}.json"
-            filepath = output_path / filename
-            
-            # Save item to individual file
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(item, f, ensure_ascii=False, indent=2)
-            
-            success_count += 1
             
             # Progress indicator
-            if idx % 1000 == 0:
-                print(f"Processed {idx}/{len(items)} {item_type}...")
-                
-        except Exception as e:
-            print(f"Error processing {item_type[:-1]} at index {idx}: {e}")
-            error_count += 1
-            continue
+            if done % 1000 == 0:
+                print(f"Processed {done}/{len(pending)} {item_type}...")
+    
+    # Remove files of ids that are no longer in the knowledge base (and temp files of a crashed run)
+    removed_count = 0
+    for filepath in output_path.glob("*.json"):
+        if filepath.stem not in current_ids and filepath.name != MANIFEST_FILE:
+            filepath.unlink()
+            removed_count += 1
+    for filepath in output_path.glob(".*.tmp"):
+        filepath.unlink()
+    
+    atomic_write(output_path / MANIFEST_FILE, json.dumps(manifest, indent=0).encode("utf-8"))
     
     print(f"\nCompleted splitting {item_type}!")
-    print(f"Successfully created {success_count} {item_type[:-1]} files")
+    print(f"Written: {success_count}, unchanged: {unchanged_count}, removed: {removed_count}")
     print(f"Errors: {error_count}")
     print(f"Files saved in: {output_path.absolute()}")
     
     return True
 
+def bundle_knowledge_base(input_file, output_dir, item_type, shards):
+    """
+    Pack knowledge base into a bundle (shard files + id index)
+    
+    Args:
+        input_file (str): Path to input JSON file
+        output_dir (str): Bundle directory
+        item_type (str): Type of items ('ingredients' or 'dishes')
+        shards (int): Number of shard files
+    """
+    print(f"Loading {item_type} knowledge base from {input_file}...")
+    
+    try:
+        with open(input_file, "r", encoding="utf-8") as f:
+            items = json.load(f)
+    except FileNotFoundError:
+        print(f"Error: File {input_file} not found!")
+        return False
+    except json.JSONDecodeError as e:
+        print(f"Error: Invalid JSON in {input_file}: {e}")
+        return False
+    
+    count = write_bundle(items, output_dir, shards)
+    print(f"\nCompleted packing {item_type}!")
+    print(f"Packed {count} {item_type} into {len(list(Path(output_dir).glob('shard-*.jsonl')))} shard(s)")
+    print(f"Skipped (no ID): {len(items) - count}")
+    print(f"Bundle saved in: {Path(output_dir).absolute()}")
+    
+    return True
+
+def split_or_bundle(args, input_file, item_type):
+    if args.format == "bundle":
+        return bundle_knowledge_base(input_file, os.path.join(args.output_dir, f"{item_type}.bundle"),
+                                     item_type, args.shards)
+    return split_knowledge_base(input_file, os.path.join(args.output_dir, item_type), item_type, args.workers)
+
 def main():
     parser = argparse.ArgumentParser(description="Split knowledge base files into individual JSON files")
     parser.add_argument("--type", choices=["ingredients", "dishes", "both"], default="both",
@@ -88,6 +194,12 @@ def main():
                        help="Path to dishes JSON file (default: dish_knowledge_base.json)")
     parser.add_argument("--output-dir", default="data",
                        help="Base output directory (default: data)")
+    parser.add_argument("--format", choices=["files", "bundle"], default="files",
+                       help="files: one JSON file per id; bundle: packed shards + id index (default: files)")
+    parser.add_argument("--workers", type=int, default=None,
+                       help="Writer threads for --format files (default: min(32, CPUs + 4))")
+    parser.add_argument("--shards", type=int, default=4,
+                       help="Number of shard files for --format bundle (default: 4)")
     
     args = parser.parse_args()
     
@@ -97,15 +209,13 @@ def main():
         print("=" * 50)
         print("SPLITTING INGREDIENTS")
         print("=" * 50)
-        ingredients_output = os.path.join(args.output_dir, "ingredients")
-        success &= split_knowledge_base(args.ingredients_input, ingredients_output, "ingredients")
+        success &= split_or_bundle(args, args.ingredients_input, "ingredients")
     
     if args.type in ["dishes", "both"]:
         print("=" * 50)
         print("SPLITTING DISHES")
         print("=" * 50)
-        dishes_output = os.path.join(args.output_dir, "dishes")
-        success &= split_knowledge_base(args.dishes_input, dishes_output, "dishes")
+        success &= split_or_bundle(args, args.dishes_input, "dishes")
     
     if success:
         print("\n" + "=" * 50)
@@ -0,0 +1,55 @@
+"""
+Bỏ dấu tiếng Việt cho cột name_normalized (bước 6 và 7)
+
+1 bảng dịch ký tự tính sẵn lúc import, mỗi chuỗi chỉ cần 1 lần str.translate:
+- chữ Latin có dấu (cả chữ hoa, cả tiếng Việt) -> chữ cơ bản viết thường, đ/Đ -> d
+- dấu kết hợp (chuỗi NFD, vd. "a" + U+0301) bị xoá
+- vài ký tự định dạng / dấu câu -> ASCII giống unidecode (khoảng trắng không ngắt, gạch ngang, ...)
+Ký tự khác giữ nguyên. Kết quả trùng với unidecode(text).lower() trên mọi tên trong KB
+hiện tại (benchmarks/check_normalize.py).
+
+normalize(text) nhớ kết quả của các chuỗi gặp gần đây (tên nguyên liệu lặp lại trong rất
+nhiều công thức); normalize_many(texts) cho cả 1 cột.
+"""
+import unicodedata
+from functools import lru_cache
+from itertools import chain
+
+CACHE_SIZE = 65536
+
+# Ký tự không tách được bằng NFD, đổi giống unidecode
+EXTRA = {
+    'đ': 'd', 'Đ': 'd',
+    '\xa0': ' ', '\u200b': ' ',
+    '–': '-', '—': '-', '‘': "'", '’': "'", '“': '"', '”': '"', '…': '...',
+    '⁰': '0', '¹': '1', '²': '2', '³': '3', '⁴': '4', '⁵': '5', '⁶': '6', '⁷': '7', '⁸': '8', '⁹': '9',
+}
+
+
+def _build_table():
+    table = {}
+    # Latin-1 Supplement, Latin Extended-A/B, Latin Extended Additional (ạ, ả, ấ, ...)
+    for code in chain(range(0x00C0, 0x0250), range(0x1E00, 0x1F00)):
+        base = unicodedata.normalize('NFD', chr(code))[0]
+        if base.isascii() and base != chr(code):
+            table[code] = base.lower()
+    # Dấu kết hợp
+    for code in range(0x0300, 0x0370):
+        table[code] = None
+    table.update(str.maketrans(EXTRA))
+    return table
+
+
+TABLE = _build_table()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize(text):
+    """Chữ thường, không dấu, bỏ khoảng trắng 2 đầu: "Thịt Bò " -> "thit bo\""""
+    return text.translate(TABLE).lower().strip()
+
+
+def normalize_many(texts):
+    """normalize cho cả 1 cột, mỗi giá trị khác nhau chỉ tính 1 lần"""
+    normalized = {text: normalize(text) for text in dict.fromkeys(texts)}
+    return [normalized[text] for text in texts]